@@ -0,0 +1,86 @@
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from xml.sax.saxutils import escape
+
+from src.data.match import Match
+
+TEAM_NAMES = ['Grótta', 'KR', 'Valur', 'Fram', 'Víkingur R.', 'Fylkir', 'Þróttur R.', 'Breiðablik',
+              'HK', 'Stjarnan', 'FH', 'Haukar', 'Afturelding', 'Fjölnir', 'ÍR', 'Leiknir R.']
+VENUES = ['Vivaldivöllurinn', 'Meistaravellir', 'Origo völlurinn', 'Kópavogsvöllur', 'Kaplakriki']
+START_DATE = datetime(2024, 4, 1, 10, 0)
+
+
+def _team(rng: random.Random) -> int:
+    return rng.randrange(len(TEAM_NAMES))
+
+
+def raw_matches(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """MotLeikur records as decoded from the SOAP API, a quarter of them not yet played."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        home, away = _team(rng), _team(rng)
+        played = rng.random() < 0.75
+        records.append({
+            'LeikurNumer': str(500000 + i),
+            'LeikDagur': (START_DATE + timedelta(hours=3 * i)).isoformat(),
+            'FelagHeimaNumer': str(100 + home),
+            'FelagUtiNumer': str(100 + away),
+            'FelagHeimaNafn': TEAM_NAMES[home],
+            'FelagUtiNafn': TEAM_NAMES[away],
+            'UrslitHeima': str(rng.randrange(1, 10)) if played else '',
+            'UrslitUti': str(rng.randrange(1, 10)) if played else '',
+            'VollurNafn': rng.choice(VENUES),
+        })
+    return records
+
+
+def soap_matches_xml(count: int, seed: int = 0) -> bytes:
+    """A MotLeikir SOAP response with the given number of matches."""
+    rows = []
+    for record in raw_matches(count, seed):
+        fields = ''.join(f'<{name}>{escape(value)}</{name}>' for name, value in record.items())
+        rows.append(f'<MotLeikur>{fields}</MotLeikur>')
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+        '<MotLeikirResponse xmlns="http://www2.ksi.is/vefthjonustur/mot/"><MotLeikirSvar>'
+        f'<ArrayMotLeikir>{"".join(rows)}</ArrayMotLeikir><Villubod/>'
+        '</MotLeikirSvar></MotLeikirResponse></soap:Body></soap:Envelope>'
+    ).encode('utf-8')
+
+
+def tournaments_html(count: int, seed: int = 0) -> bytes:
+    """A tournament list page with the given number of tournament rows, surrounded by site markup."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        tournament_id = 40000 + i
+        rows.append(
+            f'<tr><td><a href="/mot/mot?motnumer={tournament_id}">Íslandsmót 5. flokkur {i}</a></td>'
+            f'<td>2024</td><td>{rng.choice(["Lokið", "Í gangi", "Ekki hafið"])}</td>'
+            '<td>Íslandsmót</td><td>5. flokkur</td><td>KK</td></tr>'
+        )
+    navigation = ''.join(f'<li><a href="/frettir/{i}">Frétt {i}</a></li>' for i in range(200))
+    return (
+        '<!DOCTYPE html><html><head><title>Öll mót</title></head><body>'
+        f'<nav><ul>{navigation}</ul></nav>'
+        '<table><tr><th>Leit</th></tr><tr><td><input name="filter"></td></tr></table>'
+        '<table><thead><tr><th>Mót</th><th>Ár</th><th>Staða</th><th>Tegund</th><th>Flokkur</th><th>Kyn</th></tr></thead>'
+        f'<tbody>{"".join(rows)}</tbody></table>'
+        '<footer>Knattspyrnusamband Íslands</footer></body></html>'
+    ).encode('utf-8')
+
+
+def tournament(tournament_id: int = 40000) -> Dict[str, Any]:
+    """A tournament as returned by KSIWebScraper."""
+    return {'name': f'Íslandsmót 5. flokkur {tournament_id}', 'tournament_id': str(tournament_id),
+            'status': 'Lokið'}
+
+
+def matches(count: int, seed: int = 0, tournaments: int = 50) -> List[Match]:
+    """Match records spread over the given number of tournaments."""
+    records = raw_matches(count, seed)
+    tournament_list = [tournament(40000 + i) for i in range(tournaments)]
+    return [Match.from_raw(record, tournament_list[i % tournaments]) for i, record in enumerate(records)]
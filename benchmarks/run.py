@@ -0,0 +1,258 @@
+"""
+Benchmarks of the fetch -> convert -> analyse pipeline on synthetic data.
+
+Run from the repository root:
+
+    python -m benchmarks.run                 # full sizes, results in benchmarks/results/
+    python -m benchmarks.run --quick         # small sizes, for a fast sanity check
+    python -m benchmarks.run --compare benchmarks/results/<earlier run>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import main as cli
+from benchmarks import generators
+from src.api.ksi_client import KSIClient
+from src.api.soap_decoder import SoapRecordDecoder
+from src.api.web_scraper import KSIWebScraper
+from src.data.cache_manager import CacheManager
+from src.data.match_fetcher import MatchFetcher
+from src.data.match_table import MatchTable
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SIZES = {
+    'soap': [1_000, 10_000, 100_000],
+    'html': [100, 1_000, 5_000],
+    'matches': [10_000, 100_000, 1_000_000],
+}
+QUICK_SIZES = {
+    'soap': [1_000],
+    'html': [100],
+    'matches': [10_000],
+}
+
+TEAM_ID = 100
+
+
+def measure(func: Callable[[], Any], repeat: int) -> List[float]:
+    """Run func repeat times and return the wall time of each run in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_soap_decode(size: int) -> Callable[[], Any]:
+    """Decode a MotLeikir response fed in chunks the way KSIClient._make_soap_request receives it."""
+    content = generators.soap_matches_xml(size)
+    chunk_size = KSIClient().chunk_size
+
+    def run():
+        decoder = SoapRecordDecoder('MotLeikir')
+        records = []
+        for start in range(0, len(content), chunk_size):
+            records.extend(decoder.feed(content[start:start + chunk_size]))
+        records.extend(decoder.close())
+        assert len(records) == size
+    return run
+
+
+def bench_scraper_parse(size: int, html_parser: Optional[str] = None) -> Callable[[], Any]:
+    """Extract the tournaments from a tournament list page with a parser backend (default: the scraper's)."""
+    content = generators.tournaments_html(size)
+    scraper = KSIWebScraper(html_parser=html_parser)
+
+    def run():
+        tournaments = scraper.parse_tournaments_page(content)
+        assert len(tournaments) == size
+    return run
+
+
+def bench_convert(fetcher: MatchFetcher, size: int) -> Callable[[], Any]:
+    """Convert decoded SOAP records to Match records."""
+    records = generators.raw_matches(size)
+    tournament = generators.tournament()
+
+    def run():
+        for record in records:
+            fetcher._convert_match_data(record, tournament)
+    return run
+
+
+def bench_cache_set(cache: CacheManager, size: int) -> Callable[[], Any]:
+    """Serialize and store a list of matches."""
+    matches = generators.matches(size)
+
+    def run():
+        cache.set(f'benchmark_{size}', matches)
+    return run
+
+
+def bench_cache_get(cache: CacheManager, size: int) -> Callable[[], Any]:
+    """Read back and deserialize a stored list of matches."""
+    cache.set(f'benchmark_{size}', generators.matches(size))
+
+    def run():
+        assert len(cache.get(f'benchmark_{size}')) == size
+    return run
+
+
+def bench_result_stats(size: int) -> Callable[[], Any]:
+    """Win/draw/loss percentages over every match for one team, including building the table."""
+    matches = generators.matches(size)
+    return lambda: cli.format_result_stats(MatchTable(matches).result_counts(TEAM_ID))
+
+
+def bench_fairness_stats(size: int) -> Callable[[], Any]:
+    """Fairness percentages over every match, including building the table."""
+    matches = generators.matches(size)
+    return lambda: cli.format_fairness_stats(MatchTable(matches).fairness_counts())
+
+
+def bench_grouped_stats(size: int) -> Callable[[], Any]:
+    """The per-tournament breakdowns main computes, including building the table."""
+    matches = generators.matches(size)
+
+    def run():
+        table = MatchTable(matches, [2024] * len(matches))
+        table.fairness_counts(team_id=TEAM_ID, by=('year', 'tournament'))
+        table.result_counts(TEAM_ID, by=('year', 'tournament'))
+    return run
+
+
+def build_benchmarks(sizes: Dict[str, List[int]], work_dir: str) -> Dict[str, Dict[int, Callable[[], Callable[[], Any]]]]:
+    """
+    Benchmarks by name and size. Each entry is a setup function that prepares the
+    data and returns the function to time, so only the benchmarks selected to run
+    generate their data.
+    """
+    fetcher = MatchFetcher(None, None, cache_dir=os.path.join(work_dir, 'fetcher'))
+    # Without the memory tier every get reads and deserializes the disk entry
+    disk_cache = CacheManager(cache_dir=os.path.join(work_dir, 'disk'), memory_max_entries=0)
+
+    def sized(key: str, setup: Callable[[int], Callable[[], Any]]):
+        return {size: (lambda size=size: setup(size)) for size in sizes[key]}
+
+    return {
+        'soap_decode': sized('soap', bench_soap_decode),
+        'scraper_parse': sized('html', bench_scraper_parse),
+        # The pure Python backend used when lxml is not installed
+        'scraper_parse_html_parser': sized('html', lambda size: bench_scraper_parse(size, 'html.parser')),
+        'convert_match_data': sized('soap', lambda size: bench_convert(fetcher, size)),
+        'cache_set': sized('matches', lambda size: bench_cache_set(disk_cache, size)),
+        'cache_get': sized('matches', lambda size: bench_cache_get(disk_cache, size)),
+        'result_stats': sized('matches', bench_result_stats),
+        'fairness_stats': sized('matches', bench_fairness_stats),
+        'grouped_stats': sized('matches', bench_grouped_stats),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: Dict[str, List[int]], repeat: int, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Run the benchmarks.
+
+    Args:
+        sizes: Input sizes per data kind ('soap', 'html', 'matches')
+        repeat: Number of timed runs of each benchmark
+        only: Names of the benchmarks to run (default: all)
+
+    Returns:
+        Dict with run metadata under 'meta' and one entry per benchmark and size under 'results'
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix='ksi-bench-') as work_dir:
+        benchmarks = build_benchmarks(sizes, work_dir)
+        for name, by_size in benchmarks.items():
+            if only and name not in only:
+                continue
+            for size, setup in by_size.items():
+                func = setup()
+                func()  # Warm up
+                timings = measure(func, repeat)
+                best = min(timings)
+                results.append({
+                    'name': name,
+                    'size': size,
+                    'repeat': repeat,
+                    'min': best,
+                    'median': statistics.median(timings),
+                    'mean': statistics.fmean(timings),
+                    'per_item_us': best / size * 1e6,
+                })
+                print(f"{name:<26} {size:>9}  min {best * 1000:10.2f} ms  "
+                      f"median {statistics.median(timings) * 1000:10.2f} ms  {best / size * 1e6:8.3f} us/item")
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    """Print the change of every benchmark's best time relative to a previous run."""
+    before = {(r['name'], r['size']): r['min'] for r in previous['results']}
+    print(f"\nCompared with {previous['meta'].get('revision')} ({previous['meta'].get('timestamp')}):")
+    for result in current['results']:
+        key = (result['name'], result['size'])
+        if key in before and before[key] > 0:
+            change = (result['min'] / before[key] - 1) * 100
+            print(f"{result['name']:<26} {result['size']:>9}  {change:+7.1f}%")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the fetch, convert and analyse pipeline.')
+    parser.add_argument('--quick', action='store_true',
+                      help='Use small input sizes only')
+    parser.add_argument('--repeat', type=int, default=5,
+                      help='Number of timed runs of each benchmark')
+    parser.add_argument('--only', nargs='+', default=None,
+                      help='Names of the benchmarks to run')
+    parser.add_argument('--output', default=None,
+                      help='File to write the results to (default: a new file in benchmarks/results)')
+    parser.add_argument('--compare', metavar='FILE', default=None,
+                      help='Earlier results file to compare the timings with')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    report = run_benchmarks(QUICK_SIZES if args.quick else SIZES, args.repeat, args.only)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['meta']['revision'] or 'unknown'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
@@ -4,61 +4,28 @@
 # Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
 
 import argparse
-from src.api.ksi_client import KSIClient
-from src.api.web_scraper import KSIWebScraper
+import logging
+import threading
+from src.api.fixtures import FixtureStore, RecordingTransport
+from src.api.http_transport import HttpTransport
+from src.api.ksi_client import KSIClient, SOAP_URL
+from src.api.query_server import QueryServer
+from src.api.standin_server import StandInServer
+from src.api.web_scraper import KSIWebScraper, TOURNAMENTS_URL
+from src.data.cache_manager import CacheManager
+from src.data.backfill import BackfillConfig, backfill, plan_units
+from src.data.cache_warmer import CacheWarmer, load_warm_config
+from src.data.match_dataset import MatchDataset
 from src.data.match_fetcher import MatchFetcher
+from src.data.match_store import FORMATS, MatchStore
+from src.data.match_table import FAIRNESS, RESULTS, MatchTable
 from src.const import AgeGroup, Team, TournamentType
-from collections import defaultdict
+from src.metrics import metrics
 from datetime import datetime
 
-def get_match_result(match, team_id):
-    """Get if the team won, drew or lost the match"""
-    if not match['is_played']:
-        return None
-        
-    team_id = str(team_id)
-    home_score = match['home_score']
-    away_score = match['away_score']
-    is_home = str(match['home_team_id']) == team_id
-    
-    if home_score == away_score:
-        return 'draw'
-    elif (is_home and home_score > away_score) or (not is_home and away_score > home_score):
-        return 'win'
-    else:
-        return 'loss'
-
-def get_match_fairness(match):
-    """
-    Calculate match fairness based on goal difference.
-    Returns: 'fair' (0-2), 'uneven' (3-5), or 'devastating' (6+)
-    """
-    if not match['is_played']:
-        return None
-        
-    goal_diff = abs(match['home_score'] - match['away_score'])
-    
-    if goal_diff <= 2:
-        return 'fair'
-    elif goal_diff <= 5:
-        return 'uneven'
-    else:
-        return 'devastating'
-
-def calculate_result_stats(matches, team_id):
-    """Calculate win/draw/loss statistics for a team's matches"""
-    # Win/Draw/Loss stats
-    result_stats = {'win': 0, 'draw': 0, 'loss': 0, 'not_played': 0}
-    
-    for match in matches:
-        # Calculate result stats
-        result = get_match_result(match, team_id)
-        if result:
-            result_stats[result] += 1
-        else:
-            result_stats['not_played'] += 1
-    
-    played_matches = len(matches) - result_stats['not_played']
+def format_result_stats(result_stats):
+    """Format win/draw/loss counts as percentages of the played matches"""
+    played_matches = result_stats['win'] + result_stats['draw'] + result_stats['loss']
     if played_matches > 0:
         # Calculate result percentages
         win_pct = (result_stats['win'] / played_matches) * 100
@@ -70,20 +37,9 @@ def calculate_result_stats(matches, team_id):
         return "No matches played yet"
 
 
-def calculate_fairness_stats(matches):
-    """Calculate fairness statistics based on goal differences"""
-    # Fairness stats
-    fairness_stats = {'fair': 0, 'uneven': 0, 'devastating': 0, 'not_played': 0}
-
-    for match in matches:
-        # Calculate fairness stats
-        fairness = get_match_fairness(match)
-        if fairness:
-            fairness_stats[fairness] += 1
-        else:
-            fairness_stats['not_played'] += 1
-
-    played_matches = len(matches) - fairness_stats['not_played']
+def format_fairness_stats(fairness_stats):
+    """Format fairness counts as percentages of the played matches"""
+    played_matches = fairness_stats['fair'] + fairness_stats['uneven'] + fairness_stats['devastating']
     if played_matches > 0:
         # Calculate fairness percentages
         fair_pct = (fairness_stats['fair'] / played_matches) * 100
@@ -94,6 +50,13 @@ def calculate_fairness_stats(matches):
     else:
         return "No matches played yet"
 
+
+def add_counts(total, counts):
+    """Add grouped counts, such as those of MatchTable.result_counts, to running totals"""
+    for name, count in counts.items():
+        total[name] += count
+
+
 def parse_args():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description='Fetch and analyze football match data from KSÍ.')
@@ -107,20 +70,79 @@ def parse_args():
                       help='The age group ID to fetch matches for')
     parser.add_argument('--tournament-type', type=int, default=TournamentType.ISLANDSMOT.value,
                       help='The tournament type ID to filter by')
+    parser.add_argument('--workers', type=int, default=1,
+                      help='Number of tournaments to fetch concurrently')
+    parser.add_argument('--requests-per-second', type=float, default=2.0,
+                      help='Number of requests per second sent to KSÍ, halved whenever KSÍ throttles us')
+    parser.add_argument('--max-requests-per-second', type=float, default=None,
+                      help='Rate the request rate may grow to while KSÍ responds quickly (default: twice --requests-per-second)')
+    parser.add_argument('--latency-target', type=float, default=2.0,
+                      help='Seconds a KSÍ response may take before the request rate is halved (0 to only slow down when throttled)')
+    parser.add_argument('--max-attempts', type=int, default=4,
+                      help='Number of times a failed request is sent before giving up')
+    parser.add_argument('--stale-minutes', type=float, default=0,
+                      help='Serve cached data up to this many minutes past expiry while refreshing it in the background')
+    parser.add_argument('--migrate-cache', action='store_true',
+                      help='Rewrite all cache entries in the compact serialization format and exit')
+    parser.add_argument('--serve', metavar='[HOST:]PORT', default=None,
+                      help='Answer queries over HTTP/JSON from matches kept in memory until interrupted, '
+                           'preloading the age group, tournament type and years given')
+    parser.add_argument('--warm-cache', metavar='CONFIG', default=None,
+                      help='Keep the cache of the age groups and seasons listed in the JSON file CONFIG warm, '
+                           'refreshing it ahead of demand until interrupted')
+    parser.add_argument('--backfill', action='store_true',
+                      help='Fetch every season of the age groups and tournament types given into the cache, '
+                           'sharded across --processes worker processes')
+    parser.add_argument('--age-groups', type=int, nargs='+', default=None,
+                      help='Age group IDs to backfill (default: all known age groups)')
+    parser.add_argument('--tournament-types', type=int, nargs='+', default=None,
+                      help='Tournament type IDs to backfill (default: all known tournament types)')
+    parser.add_argument('--processes', type=int, default=4,
+                      help='Number of worker processes of a backfill')
+    parser.add_argument('--request-budget', type=int, default=None,
+                      help='Maximum number of requests a backfill sends to KSÍ, retries included')
+    parser.add_argument('--export', metavar='DIR', default=None,
+                      help='Export the tournaments and matches of the age group, tournament type and years given '
+                           'to a dataset in DIR partitioned by year, age group and tournament type')
+    parser.add_argument('--export-format', choices=list(FORMATS), default=None,
+                      help='File format of the exported dataset, arrow being Arrow IPC '
+                           '(default: the format of the files already in DIR, else parquet)')
+    parser.add_argument('--export-standings', action='store_true',
+                      help='Also export the standings of every tournament')
+    parser.add_argument('--offline', action='store_true',
+                      help='Use only cached data, rebuilding matches from cached KSÍ responses when needed')
+    parser.add_argument('--record', metavar='DIR', default=None,
+                      help='Save every KSÍ response received to this fixture directory')
+    parser.add_argument('--replay', metavar='DIR', default=None,
+                      help='Serve KSÍ responses from this fixture directory through a local stand-in server')
+    parser.add_argument('--replay-latency-ms', type=float, default=0,
+                      help='Milliseconds the stand-in server waits before each response')
+    parser.add_argument('--replay-error-rate', type=float, default=0,
+                      help='Fraction of requests the stand-in server fails with 503')
+    parser.add_argument('--replay-scale', type=int, default=1,
+                      help='Number of times the stand-in server repeats the records of each response')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                      help='Level of the progress messages logged while fetching')
+    parser.add_argument('--metrics-out', metavar='FILE', default=None,
+                      help='Write timings and counters of the run to FILE, in Prometheus text format '
+                           'if it ends in .prom, otherwise as JSON')
+    parser.add_argument('--connect-timeout', type=float, default=5.0,
+                      help='Seconds to wait for a connection to KSÍ')
+    parser.add_argument('--read-timeout', type=float, default=30.0,
+                      help='Seconds to wait for KSÍ to respond')
     
     return parser.parse_args()
 
-def format_date(date_str):
-    """Format ISO date string for display."""
-    if not date_str:
+def format_date(date):
+    """Format match date for display."""
+    if not date:
         return 'No date'
-    try:
-        date = datetime.fromisoformat(date_str)
-        return date.strftime('%Y-%m-%d %H:%M')
-    except (ValueError, TypeError):
-        return date_str
+    return date.strftime('%Y-%m-%d %H:%M')
 
-def main(start_year=2024, end_year=2024, team_id=None, age_group_id=AgeGroup.FIFTH_FLOKKUR.value, tournament_type=TournamentType.ISLANDSMOT.value):
+def main(start_year=2024, end_year=2024, team_id=None, age_group_id=AgeGroup.FIFTH_FLOKKUR.value, tournament_type=TournamentType.ISLANDSMOT.value,
+         workers=1, requests_per_second=2.0, max_requests_per_second=None, latency_target=2.0, max_attempts=4, connect_timeout=5.0, read_timeout=30.0, stale_minutes=0, offline=False,
+         record_dir=None, replay_dir=None, replay_latency_ms=0, replay_error_rate=0, replay_scale=1,
+         metrics_out=None):
     """
     Fetch and display match statistics for a youth team.
     
@@ -130,11 +152,47 @@ def main(start_year=2024, end_year=2024, team_id=None, age_group_id=AgeGroup.FIF
         team_id (int): The ID of the team to analyze
         age_group_id (int): The age group ID to fetch matches for
         tournament_type (int): The tournament type ID to filter by
+        workers (int): Number of tournaments to fetch concurrently
+        requests_per_second (float): Number of requests per second sent to KSÍ at first
+        max_requests_per_second (float): Rate the request rate may grow to while KSÍ keeps up
+        latency_target (float): Seconds a response may take before the request rate is halved
+        max_attempts (int): Number of times a failed request is sent before giving up
+        connect_timeout (float): Seconds to wait for a connection to KSÍ
+        read_timeout (float): Seconds to wait for KSÍ to respond
+        stale_minutes (float): Serve cached data up to this many minutes past expiry
+            while refreshing it in the background
+        offline (bool): Use only cached data, rebuilding matches from cached KSÍ responses
+        record_dir (str): Directory to save every KSÍ response received to
+        replay_dir (str): Directory of recorded responses to serve instead of ksi.is
+        replay_latency_ms (float): Milliseconds the stand-in server waits before each response
+        replay_error_rate (float): Fraction of requests the stand-in server fails
+        replay_scale (int): Number of times the stand-in server repeats the records of each response
+        metrics_out (str): File to write timings and counters of the run to (.prom for Prometheus text, else JSON)
     """
     # Initialize components
-    soap_client = KSIClient()
-    web_scraper = KSIWebScraper()
-    match_fetcher = MatchFetcher(soap_client, web_scraper)
+    transport_options = dict(pool_maxsize=max(workers, 10), connect_timeout=connect_timeout,
+                             read_timeout=read_timeout)
+    if record_dir:
+        transport = RecordingTransport(FixtureStore(record_dir), **transport_options)
+    else:
+        transport = HttpTransport(**transport_options)
+
+    server = None
+    soap_url, tournaments_url = SOAP_URL, TOURNAMENTS_URL
+    if replay_dir:
+        server = StandInServer(FixtureStore(replay_dir), latency=replay_latency_ms / 1000,
+                               error_rate=replay_error_rate, scale=replay_scale).start()
+        soap_url, tournaments_url = server.url_for(SOAP_URL), server.url_for(TOURNAMENTS_URL)
+        print(f"Replaying KSÍ responses from {replay_dir} at {server.base_url}")
+
+    soap_client = KSIClient(transport, base_url=soap_url)
+    web_scraper = KSIWebScraper(transport, base_url=tournaments_url)
+    match_fetcher = MatchFetcher(soap_client, web_scraper, max_workers=workers,
+                                 requests_per_second=requests_per_second,
+                                 max_requests_per_second=max_requests_per_second,
+                                 latency_target=latency_target,
+                                 max_attempts=max_attempts,
+                                 stale_while_revalidate_minutes=stale_minutes)
     
     # Get team name for display
     team_name = Team.get_name(team_id) if team_id else "Unknown Team"
@@ -142,73 +200,249 @@ def main(start_year=2024, end_year=2024, team_id=None, age_group_id=AgeGroup.FIF
     
     print(f"\nFetching matches for {team_name} in {age_group_name}")
     
-    result = match_fetcher.get_matches_for_years(
-        age_group_id=age_group_id,
-        start_year=start_year,
-        end_year=end_year,
-        tournament_type=tournament_type,
-    )
-    
-    print(f"\nTotal matches found: {result['total_matches']}")
-    
-    # Print matches by year
-    for year, matches in result['matches_by_year'].items():
-        print(f"\nYear {year}:")
-        print(f"- Total matches: {len(matches)}")
+    years = list(range(end_year, start_year - 1, -1))
+    remaining_years = iter(years)
+    current_year = None
+    year_total = 0
+    tournament_printed = False
+    total_matches = 0
+    failures = []
+    overall_fairness = dict.fromkeys(FAIRNESS, 0)
+    overall_results = dict.fromkeys(RESULTS, 0)
 
-        if not matches:
-            continue
+    def advance_to(year):
+        """Close the sections of the years before year, printing those without tournaments too."""
+        nonlocal current_year, year_total, tournament_printed
+        while current_year != year:
+            if current_year is not None:
+                print(f"\n- Total matches: {year_total}")
+            current_year = next(remaining_years, None)
+            if current_year is None:
+                return
+            print(f"\nYear {current_year}:")
+            year_total, tournament_printed = 0, False
 
-        if team_id:
-            matches = [
-                match for match in matches
-                if str(team_id) in [str(match['home_team_id']), str(match['away_team_id'])]
-            ]
+    # Print every tournament as soon as it is fetched, keeping only running totals
+    with metrics.timer('stage_seconds', stage='fetch'):
+        for year, tournament, matches in match_fetcher.iter_matches(
+            age_group_id=age_group_id,
+            start_year=start_year,
+            end_year=end_year,
+            tournament_type=tournament_type,
+            offline=offline,
+            failures=failures,
+        ):
+            advance_to(year)
+            year_total += len(matches)
+            total_matches += len(matches)
+            if not matches:
+                continue
 
-        # Group matches by tournament
-        matches_by_tournament = defaultdict(list)
-        for match in matches:
-            matches_by_tournament[match['tournament_name']].append(match)
+            table = MatchTable(matches)
+            add_counts(overall_fairness, table.fairness_counts())
+            if team_id:
+                # The fetch is streamed, so there is no index over the whole run to look
+                # the team up in; the tournament's table already has the team columns
+                matches = table.for_team(team_id)
+                if not matches:
+                    continue
 
-        print(f"\n{team_name}'s matches by tournament:")
-        for tournament_name, tournament_matches in matches_by_tournament.items():
-            print(f"\n{tournament_name}:")
+            if not tournament_printed:
+                print(f"\n{team_name}'s matches by tournament:")
+                tournament_printed = True
+            print(f"\n{matches[0].tournament_name}:")
 
             # Print matches sorted by date
-            for match in sorted(tournament_matches, key=lambda x: x['date'] or '9999-12-31'):
-                home_team = match['home_team_name']
-                away_team = match['away_team_name']
-                score = f"{match['home_score']}-{match['away_score']}" if match['is_played'] else 'Not played'
+            for match in sorted(matches, key=lambda x: x.date or datetime.max):
+                home_team = match.home_team_name
+                away_team = match.away_team_name
+                score = f"{match.home_score}-{match.away_score}" if match.is_played else 'Not played'
                 if team_id:
-                    date = format_date(match['date'])
+                    date = format_date(match.date)
                     print(f"  {date}: {home_team} {score} {away_team}")
 
             # Print tournament statistics
             if team_id:
-                result_stats = calculate_result_stats(tournament_matches, team_id)
-                print(f"\n  {result_stats}")
+                result_counts = table.result_counts(team_id)
+                add_counts(overall_results, result_counts)
+                print(f"\n  {format_result_stats(result_counts)}")
 
-            fairness_stats = calculate_fairness_stats(tournament_matches)
+            fairness_stats = format_fairness_stats(table.fairness_counts(team_id=team_id))
             print(f"  {fairness_stats}")
+        advance_to(None)
+
+    print(f"\nTotal matches found: {total_matches}")
+    if failures:
+        print(f"Warning: {len(failures)} fetches failed, results are incomplete:")
+        for failure in failures:
+            target = f"tournament {failure['tournament_id']}" if failure['tournament_id'] else 'tournament list'
+            print(f"  {failure['year']}, {target}: {failure['reason']}")
 
-    all_matches = result['all_matches']
     if team_id:
         print(f"\nOverall Results:")
-        result_stats = calculate_result_stats(all_matches, team_id)
+        result_stats = format_result_stats(overall_results)
         print(f"  {result_stats}")
 
     print(f"\nOverall Fairness:")
-    fairness_stats = calculate_fairness_stats(all_matches)
+    fairness_stats = format_fairness_stats(overall_fairness)
     print(f"  {fairness_stats}")
 
+    # Let background refreshes of stale entries finish before closing the connections
+    match_fetcher.cache.wait_for_refreshes()
+    stats = transport.stats
+    print(f"\nHTTP: {stats.requests} requests, {stats.connections_opened} connections opened, "
+          f"{stats.connections_reused} reused")
+    cache_stats = match_fetcher.cache.stats()
+    print(f"Cache: {cache_stats['memory_hits']} memory hits, {cache_stats['disk_hits']} disk hits, "
+          f"{cache_stats['disk_misses']} misses")
+    lookups = cache_stats['memory_hits'] + cache_stats['memory_misses']
+    if lookups:
+        metrics.set_gauge('cache_hit_ratio', (cache_stats['memory_hits'] + cache_stats['disk_hits']) / lookups)
+    if metrics_out:
+        metrics.write(metrics_out)
+        print(f"Metrics written to {metrics_out}")
+    transport.close()
+    if server is not None:
+        server.stop()
+
+def migrate_cache():
+    """Rewrite every cache entry with the current serializer."""
+    with CacheManager() as cache:
+        result = cache.migrate()
+    print(f"Migrated {result['migrated']} cache entries ({result['failed']} failed): "
+          f"{result['bytes_before'] / 1024:.0f} KB -> {result['bytes_after'] / 1024:.0f} KB")
+
+def warm_cache(config_path, connect_timeout=5.0, read_timeout=30.0):
+    """Keep the cache of the configured age groups and seasons warm until interrupted."""
+    config = load_warm_config(config_path)
+    transport = HttpTransport(connect_timeout=connect_timeout, read_timeout=read_timeout)
+    match_fetcher = MatchFetcher(KSIClient(transport), KSIWebScraper(transport),
+                                 requests_per_second=config.get('requests_per_second', 0.5),
+                                 max_requests_per_second=config.get('requests_per_second', 0.5))
+    warmer = CacheWarmer(match_fetcher, config['targets'], lead_time=config.get('lead_minutes', 15) * 60)
+    try:
+        warmer.run()
+    except KeyboardInterrupt:
+        print("Stopped warming the cache")
+    finally:
+        transport.close()
+
+def export(directory, age_group_id, tournament_type, start_year, end_year, export_format=None,
+           standings=False, workers=1, requests_per_second=2.0, max_requests_per_second=None, latency_target=2.0,
+           offline=False, connect_timeout=5.0, read_timeout=30.0):
+    """Export tournaments and matches to a partitioned dataset, adding to what was exported before."""
+    transport = HttpTransport(pool_maxsize=max(workers, 10), connect_timeout=connect_timeout,
+                              read_timeout=read_timeout)
+    match_fetcher = MatchFetcher(KSIClient(transport), KSIWebScraper(transport), max_workers=workers,
+                                 requests_per_second=requests_per_second,
+                                 max_requests_per_second=max_requests_per_second, latency_target=latency_target)
+    store = MatchStore(directory, export_format)
+    with metrics.timer('stage_seconds', stage='export'):
+        result = store.export(match_fetcher, age_group_id, start_year, end_year, tournament_type,
+                              standings=standings, offline=offline)
+    print(f"Exported {result['tournaments']} tournaments, {result['matches']} matches and "
+          f"{result['standings']} standings rows to {directory}")
+    if result['failures']:
+        print(f"Warning: {len(result['failures'])} fetches failed, run the export again to retry them")
+    transport.close()
+
+def run_backfill(age_group_ids, tournament_types, start_year, end_year, processes=4, workers=1,
+                 requests_per_second=2.0, max_requests_per_second=None, latency_target=2.0, max_attempts=4,
+                 request_budget=None, connect_timeout=5.0, read_timeout=30.0):
+    """Fetch many age groups, tournament types and seasons into the cache with a pool of processes."""
+    units = plan_units(age_group_ids, tournament_types, start_year, end_year)
+    print(f"Backfilling {len(units)} seasons with {processes} processes")
+    config = BackfillConfig(requests_per_second=requests_per_second, max_requests_per_second=max_requests_per_second,
+                            latency_target=latency_target, max_attempts=max_attempts, workers=workers,
+                            connect_timeout=connect_timeout, read_timeout=read_timeout, request_budget=request_budget)
+    with metrics.timer('stage_seconds', stage='backfill'):
+        results = backfill(units, processes=processes, config=config)
+
+    for (age_group_id, tournament_type), result in results.items():
+        tournaments = sum(len(t) for t in result['tournaments_by_year'].values())
+        print(f"{AgeGroup.get_name(age_group_id)}, {TournamentType.get_name(tournament_type)}: "
+              f"{tournaments} tournaments, {result['total_matches']} matches, "
+              f"{len(result['failures'])} failed fetches")
+    failures = sum(len(result['failures']) for result in results.values())
+    if failures:
+        print(f"Warning: {failures} fetches failed, run the backfill again to retry them")
+
+def serve(address, age_group_id, tournament_type, start_year, end_year, workers=1, requests_per_second=2.0,
+          max_requests_per_second=None, latency_target=2.0, connect_timeout=5.0, read_timeout=30.0):
+    """Answer queries over HTTP/JSON from a dataset kept in memory until interrupted."""
+    host, _, port = address.rpartition(':')
+    transport = HttpTransport(pool_maxsize=max(workers, 10), connect_timeout=connect_timeout,
+                              read_timeout=read_timeout)
+    match_fetcher = MatchFetcher(KSIClient(transport), KSIWebScraper(transport), max_workers=workers,
+                                 requests_per_second=requests_per_second,
+                                 max_requests_per_second=max_requests_per_second, latency_target=latency_target)
+    dataset = MatchDataset(match_fetcher)
+    dataset.snapshot(age_group_id, tournament_type, list(range(start_year, end_year + 1)))
+    server = QueryServer(dataset, host=host or '127.0.0.1', port=int(port)).start()
+    print(f"Serving queries at {server.base_url}/stats?start_year={start_year}&team=<team id>")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("Stopped serving")
+    finally:
+        server.stop()
+        transport.close()
+
 if __name__ == '__main__':
     args = parse_args()
+    latency_target = args.latency_target or None
+    logging.basicConfig(level=args.log_level, format='%(message)s')
+    if args.migrate_cache:
+        migrate_cache()
+        raise SystemExit(0)
+    if args.warm_cache:
+        warm_cache(args.warm_cache, connect_timeout=args.connect_timeout, read_timeout=args.read_timeout)
+        raise SystemExit(0)
+    if args.export:
+        export(args.export, args.age_group, args.tournament_type, args.start_year, args.end_year,
+               export_format=args.export_format, standings=args.export_standings, workers=args.workers,
+               requests_per_second=args.requests_per_second,
+               max_requests_per_second=args.max_requests_per_second, latency_target=latency_target,
+               offline=args.offline,
+               connect_timeout=args.connect_timeout, read_timeout=args.read_timeout)
+        raise SystemExit(0)
+    if args.backfill:
+        run_backfill(args.age_groups or [member.value for member in AgeGroup],
+                     args.tournament_types or [member.value for member in TournamentType],
+                     args.start_year, args.end_year, processes=args.processes, workers=args.workers,
+                     requests_per_second=args.requests_per_second,
+                     max_requests_per_second=args.max_requests_per_second, latency_target=latency_target,
+                     max_attempts=args.max_attempts,
+                     request_budget=args.request_budget,
+                     connect_timeout=args.connect_timeout, read_timeout=args.read_timeout)
+        raise SystemExit(0)
+    if args.serve:
+        serve(args.serve, args.age_group, args.tournament_type, args.start_year, args.end_year,
+              workers=args.workers, requests_per_second=args.requests_per_second,
+              max_requests_per_second=args.max_requests_per_second, latency_target=latency_target,
+              connect_timeout=args.connect_timeout, read_timeout=args.read_timeout)
+        raise SystemExit(0)
     main(
         start_year=args.start_year,
         end_year=args.end_year,
         team_id=args.team,
         age_group_id=args.age_group,
-        tournament_type=args.tournament_type
+        tournament_type=args.tournament_type,
+        workers=args.workers,
+        requests_per_second=args.requests_per_second,
+        max_requests_per_second=args.max_requests_per_second,
+        latency_target=latency_target,
+        max_attempts=args.max_attempts,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        stale_minutes=args.stale_minutes,
+        offline=args.offline,
+        record_dir=args.record,
+        replay_dir=args.replay,
+        replay_latency_ms=args.replay_latency_ms,
+        replay_error_rate=args.replay_error_rate,
+        replay_scale=args.replay_scale,
+        metrics_out=args.metrics_out
     )
 
 # pipenv run python main.py --start-year 2020 --end-year 2025 --team 170
\ No newline at end of file
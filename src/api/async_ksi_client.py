@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.api.async_transport import AsyncHttpTransport
+from src.api.ksi_client import SOAP_HEADERS, SOAP_URL, build_soap_request
+from src.api.soap_decoder import SoapRecordDecoder
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _decode(decode: Callable[..., Iterable[Dict]], *args: Any) -> Tuple[List[Dict], float]:
+    """Run a step of a SoapRecordDecoder, returning its records and the seconds it took."""
+    start = time.perf_counter()
+    records = list(decode(*args))
+    return records, time.perf_counter() - start
+
+
+class AsyncKSIClient:
+    """
+    Asyncio client for the KSÍ SOAP API.
+
+    Has the same methods as KSIClient as coroutines, building requests and
+    decoding responses with the same code. Responses are decoded in a worker
+    thread a chunk at a time, so the event loop keeps running meanwhile.
+    """
+
+    def __init__(self, transport: Optional[AsyncHttpTransport] = None, base_url: Optional[str] = None):
+        """
+        Initialize the client.
+
+        Args:
+            transport: Async HTTP transport to send requests with (default: a new transport)
+            base_url: URL of the SOAP service (default: the KSÍ service)
+        """
+        self.transport = transport or AsyncHttpTransport()
+        self.chunk_size = 64 * 1024
+        self.base_url = base_url or SOAP_URL
+        self.headers = SOAP_HEADERS.copy()
+
+    def _soap_request(self, action: str, body_content: str) -> Tuple[bytes, Dict[str, str]]:
+        """Build the body and headers of a request for a SOAP action."""
+        return build_soap_request(action, body_content, self.headers)
+
+    async def _iter_soap_request(self, action: str, body_content: str = "",
+                                 payload: Optional[List[bytes]] = None) -> AsyncIterator[Dict]:
+        """
+        Make a SOAP request to the KSÍ API and yield records while the response downloads.
+
+        Args:
+            action: SOAP action to call
+            body_content: Content of the SOAP body
+            payload: List to append the chunks of the undecoded response body to
+
+        Returns:
+            Async iterator over one dict per record in the response
+        """
+        data, headers = self._soap_request(action, body_content)
+        async with self.transport.stream('POST', self.base_url, data=data, headers=headers) as response:
+            response.raise_for_status()
+            decoder = SoapRecordDecoder(action)
+            decode_seconds = 0.0
+            rows = 0
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                metrics.inc('http_response_bytes_total', len(chunk), method='POST')
+                if payload is not None:
+                    payload.append(chunk)
+                records, seconds = await asyncio.to_thread(_decode, decoder.feed, chunk)
+                decode_seconds += seconds
+                rows += len(records)
+                for record in records:
+                    yield record
+            records, seconds = await asyncio.to_thread(_decode, decoder.close)
+            decode_seconds += seconds
+            rows += len(records)
+            for record in records:
+                yield record
+
+        metrics.observe('parse_seconds', decode_seconds, kind='soap', action=action)
+        metrics.inc('parse_rows_total', rows, kind='soap', action=action)
+        if not decoder.found_array:
+            logger.debug("No matching array element found in %s response", action)
+
+    async def _fetch_raw(self, action: str, body_content: str = "") -> bytes:
+        """Make a SOAP request to the KSÍ API and return the undecoded response body."""
+        data, headers = self._soap_request(action, body_content)
+        response = await self.transport.post(self.base_url, data=data, headers=headers)
+        response.raise_for_status()
+        return response.content
+
+    async def _make_soap_request(self, action: str, body_content: str = "") -> List[Dict]:
+        """Make a SOAP request to the KSÍ API."""
+        return [record async for record in self._iter_soap_request(action, body_content)]
+
+    async def get_age_groups(self) -> List[Dict[str, Any]]:
+        """Fetch all age groups/divisions (e.g., '1. flokkur', '2. flokkur', etc.)."""
+        body = '<tns:Flokkur />'
+        return await self._make_soap_request('Flokkur', body)
+
+    async def get_tournaments_in_age_group(self, age_group_id: int) -> List[Dict[str, Any]]:
+        """Fetch all tournaments within a specific age group."""
+        body = f'<tns:MotAflog><tns:FlokkurNumer>{age_group_id}</tns:FlokkurNumer></tns:MotAflog>'
+        return await self._make_soap_request('MotAflog', body)
+
+    async def get_tournament_standings(self, tournament_id: int) -> List[Dict[str, Any]]:
+        """Fetch standings for a specific tournament."""
+        body = f'<tns:MotStada><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotStada>'
+        return await self._make_soap_request('MotStada', body)
+
+    async def get_tournament_matches(self, tournament_id: int) -> List[Dict[str, Any]]:
+        """Fetch all matches for a specific tournament."""
+        body = f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>'
+        matches = await self._make_soap_request('MotLeikir', body)
+        logger.debug("Number of matches found: %d", len(matches))
+        return matches
+
+    async def get_tournament_matches_raw(self, tournament_id: int) -> bytes:
+        """Fetch the undecoded MotLeikir response for a specific tournament."""
+        body = f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>'
+        return await self._fetch_raw('MotLeikir', body)
+
+    async def get_tournament_matches_with_raw(self, tournament_id: int) -> Tuple[List[Dict[str, Any]], bytes]:
+        """Fetch all matches for a specific tournament along with the undecoded MotLeikir response."""
+        body = f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>'
+        payload = []
+        matches = [record async for record in self._iter_soap_request('MotLeikir', body, payload)]
+        return matches, b''.join(payload)
+
+    def iter_tournament_matches(self, tournament_id: int) -> AsyncIterator[Dict[str, Any]]:
+        """Fetch matches for a specific tournament, yielding each one as soon as it is received."""
+        body = f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>'
+        return self._iter_soap_request('MotLeikir', body)
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Optional
+
+from src.api.http_transport import TransportStats
+from src.api.resilience import Resilience
+from src.metrics import metrics
+
+try:
+    import aiohttp
+except ImportError:  # Optional, only needed by the async clients
+    aiohttp = None
+
+
+@dataclass
+class AsyncResponse:
+    """A fully read response of AsyncHttpTransport.request."""
+    status_code: int
+    headers: Any
+    content: bytes
+    url: str
+    _response: Any = field(default=None, repr=False)
+
+    def raise_for_status(self) -> None:
+        """Raise aiohttp.ClientResponseError for 4xx and 5xx responses."""
+        if self.status_code >= 400:
+            raise aiohttp.ClientResponseError(
+                self._response.request_info, self._response.history,
+                status=self.status_code, message=self._response.reason, headers=self.headers,
+            )
+
+
+class AsyncHttpTransport:
+    """Pooled, keep-alive asyncio HTTP transport shared by the async KSÍ clients."""
+
+    def __init__(self, pool_maxsize: int = 100, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 total_timeout: Optional[float] = None, resilience: Optional[Resilience] = None):
+        """
+        Initialize the transport.
+
+        Args:
+            pool_maxsize: Maximum number of open connections
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait for the server to send data
+            total_timeout: Seconds a whole request, including reading the body, may take
+                (default: no limit)
+            resilience: Rate limiting, retries and circuit breaking applied to every
+                request, may be shared with an HttpTransport (default: none)
+        """
+        if aiohttp is None:
+            raise ImportError("The async clients require the aiohttp package")
+        self.pool_maxsize = pool_maxsize
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout, sock_read=read_timeout)
+        self.stats = TransportStats()
+        self.resilience = resilience
+        self._session: Optional['aiohttp.ClientSession'] = None
+
+    async def _on_connection_created(self, session, context, params) -> None:
+        self.stats.record_connection()
+
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        # Created on first use, as aiohttp sessions belong to the running event loop
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(self._on_connection_created)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_maxsize),
+                timeout=self.timeout,
+                headers={'Accept-Encoding': 'gzip, deflate'},
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator['aiohttp.ClientResponse']:
+        """
+        Send a request and yield the response before its body has been read.
+
+        Requests are retried and rate limited like those of HttpTransport when
+        the transport has a resilience layer.
+
+        Args:
+            method: HTTP method
+            url: URL to request
+            **kwargs: Passed on to aiohttp.ClientSession.request
+
+        Returns:
+            Async context manager yielding the aiohttp response
+
+        Raises:
+            CircuitOpenError: If the endpoint's circuit is open
+        """
+        response = await self._send_resilient(method, url, **kwargs)
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def _send_resilient(self, method: str, url: str, **kwargs) -> 'aiohttp.ClientResponse':
+        """Send a request through the resilience layer, retrying it as needed."""
+        resilience = self.resilience
+        if resilience is None:
+            return await self._send(method, url, **kwargs)
+
+        endpoint = resilience.endpoint(method, url, kwargs.get('headers'))
+        resilience.before_request(endpoint)
+        try:
+            response = await self._send_with_retries(resilience, method, url, **kwargs)
+        except Exception:
+            resilience.record_result(endpoint)
+            raise
+        except BaseException:
+            # Cancelled, which says nothing about the endpoint
+            resilience.record_abandoned(endpoint)
+            raise
+        resilience.record_result(endpoint, response.status)
+        return response
+
+    async def _send_with_retries(self, resilience: Resilience, method: str, url: str,
+                                 **kwargs) -> 'aiohttp.ClientResponse':
+        """Send a request, retrying it as long as the resilience layer allows."""
+        retryable = resilience.is_retryable(method, kwargs.get('headers'))
+        attempt = 0
+        while True:
+            attempt += 1
+            await asyncio.sleep(resilience.before_attempt())
+            start = time.perf_counter()
+            try:
+                response = await self._send(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, TimeoutError):
+                resilience.record_attempt(time.perf_counter() - start)
+                if not retryable or not resilience.should_retry(method, attempt):
+                    raise
+                await asyncio.sleep(resilience.backoff(attempt))
+                continue
+            resilience.record_attempt(time.perf_counter() - start, response.status)
+            if not retryable or not resilience.should_retry(method, attempt, response.status):
+                return response
+            response.release()
+            await asyncio.sleep(resilience.backoff(attempt, response.headers.get('Retry-After')))
+
+    async def _send(self, method: str, url: str, **kwargs) -> 'aiohttp.ClientResponse':
+        """Send a request once, recording it in the stats and metrics."""
+        self.stats.record_request()
+        start = time.perf_counter()
+        try:
+            response = await self._get_session().request(method, url, **kwargs)
+        except (aiohttp.ClientError, TimeoutError):
+            metrics.inc('http_errors_total', method=method)
+            raise
+        # Time until the headers arrived, like streamed requests of HttpTransport
+        metrics.observe('http_request_seconds', time.perf_counter() - start, method=method)
+        metrics.inc('http_requests_total', method=method, status=response.status)
+        if kwargs.get('data'):
+            metrics.inc('http_request_bytes_total', len(kwargs['data']), method=method)
+        return response
+
+    async def request(self, method: str, url: str, **kwargs) -> AsyncResponse:
+        """
+        Send a request over a pooled connection and read the whole response.
+
+        Args:
+            method: HTTP method
+            url: URL to request
+            **kwargs: Passed on to aiohttp.ClientSession.request
+
+        Returns:
+            The response
+        """
+        async with self.stream(method, url, **kwargs) as response:
+            content = await response.read()
+        metrics.inc('http_response_bytes_total', len(content), method=method)
+        return AsyncResponse(response.status, response.headers, content, str(response.url), response)
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
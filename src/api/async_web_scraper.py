@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.api.async_transport import AsyncHttpTransport
+from src.api.web_scraper import TournamentPages
+from src.const import TournamentType
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncKSIWebScraper:
+    """
+    Asyncio scraper for the KSÍ website.
+
+    Has the same fetch methods as KSIWebScraper as coroutines. Pages are
+    built, revalidated and parsed by the same TournamentPages, and parsed in a
+    worker thread so the event loop keeps running meanwhile.
+    """
+
+    def __init__(self, transport: Optional[AsyncHttpTransport] = None, base_url: Optional[str] = None,
+                 html_parser: Optional[str] = None):
+        """
+        Initialize the scraper.
+
+        Args:
+            transport: Async HTTP transport to send requests with (default: a new transport)
+            base_url: URL of the tournament list page (default: the page on ksi.is)
+            html_parser: Parser backend, see TournamentPages
+        """
+        self.transport = transport or AsyncHttpTransport()
+        self.pages = TournamentPages(base_url, html_parser)
+
+    async def get_tournaments_in_age_group(self, age_group_id: int, year: int = 2025, gender: int = 1,
+                                           tournament_type: int = TournamentType.ISLANDSMOT.value) -> List[Dict[str, Any]]:
+        """Fetch tournaments for a specific age group from the KSÍ website."""
+        tournaments, _ = await self.get_tournaments_if_modified(age_group_id, year, gender, tournament_type)
+        return tournaments
+
+    async def get_tournaments_if_modified(self, age_group_id: int, year: int = 2025, gender: int = 1,
+                                          tournament_type: int = TournamentType.ISLANDSMOT.value,
+                                          validators: Optional[Dict[str, str]] = None) -> Tuple[Optional[List[Dict[str, Any]]], Dict[str, str]]:
+        """Fetch tournaments for a specific age group unless the page is unchanged."""
+        content, validators = await self.fetch_tournaments_page(age_group_id, year, gender, tournament_type, validators)
+        if content is None:
+            return None, validators
+        return await asyncio.to_thread(self.parse_tournaments_page, content), validators
+
+    async def fetch_tournaments_page(self, age_group_id: int, year: int = 2025, gender: int = 1,
+                                     tournament_type: int = TournamentType.ISLANDSMOT.value,
+                                     validators: Optional[Dict[str, str]] = None) -> Tuple[Optional[bytes], Dict[str, str]]:
+        """
+        Fetch the raw tournament list page unless it is unchanged.
+
+        Returns:
+            Tuple of the page content (None if unchanged since validators were
+            taken) and the validators of this response
+        """
+        validators = validators or {}
+        url = self.pages.url(age_group_id, year, gender, tournament_type)
+        logger.debug("Fetching tournaments from: %s", url)
+
+        response = await self.transport.get(url, headers=self.pages.conditional_headers(validators))
+        if response.status_code == 304:
+            logger.debug("Tournament list not modified")
+            return None, validators
+        response.raise_for_status()
+        return self.pages.modified_content(response.content, response.headers, validators)
+
+    def parse_tournaments_page(self, content: bytes) -> List[Dict[str, Any]]:
+        """
+        Extract the tournaments from a page returned by fetch_tournaments_page.
+
+        Parsing blocks, so call this from a worker thread when the event loop has other work.
+        """
+        return self.pages.parse(content)
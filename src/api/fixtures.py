@@ -0,0 +1,218 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+
+from src.api.http_transport import HttpTransport
+
+# Response headers kept with a recorded fixture
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def _soap_action(headers: Optional[Dict[str, str]]) -> str:
+    """SOAP action of a request, e.g. 'MotLeikir', or '' for a plain web page."""
+    for name, value in (headers or {}).items():
+        if name.lower() == 'soapaction':
+            return value.strip('"').rsplit('/', 1)[-1]
+    return ''
+
+
+def fixture_key(method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                body: Union[str, bytes, None] = None) -> str:
+    """
+    Key identifying a request independently of the host it is sent to.
+
+    The key is built from the method, path, query, SOAP action and body, so a
+    response recorded from ksi.is is found again when the same request is sent
+    to a stand-in server. Conditional request headers are ignored.
+
+    Returns:
+        Key that is safe to use as a file name, prefixed with the SOAP action
+        or the last path segment to keep fixture directories readable
+    """
+    parts = urlsplit(url)
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    action = _soap_action(headers)
+    digest = hashlib.sha256()
+    for part in (method.upper(), parts.path, parts.query, action):
+        digest.update(part.encode('utf-8') + b'\0')
+    digest.update(body or b'')
+
+    label = action or parts.path.rstrip('/').rsplit('/', 1)[-1] or 'root'
+    label = re.sub(r'[^A-Za-z0-9_-]', '_', label)
+    return f"{label}-{digest.hexdigest()[:16]}"
+
+
+class FixtureStore:
+    """
+    Directory of recorded KSÍ responses.
+
+    Every fixture is stored as two files: <key>.json holding the request URL,
+    SOAP action, status and headers, and <key>.body holding the response body
+    exactly as received.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory to read and write fixtures in, created if missing
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    @staticmethod
+    def _meta(response: requests.Response, action: str) -> Dict[str, Any]:
+        return {
+            'url': response.url,
+            'action': action,
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+        }
+
+    def _commit(self, key: str, meta: Dict[str, Any], body_path: str) -> None:
+        """Move a fully written body file into place and write its metadata."""
+        with self._lock:
+            os.replace(body_path, self._path(key, 'body'))
+            with open(self._path(key, 'json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def save(self, key: str, response: requests.Response, action: str = '') -> None:
+        """Write a response to the store, replacing any fixture with the same key."""
+        meta = self._meta(response, action)
+        with self._lock:
+            with open(self._path(key, 'body'), 'wb') as f:
+                f.write(response.content)
+            with open(self._path(key, 'json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def writer(self, key: str, response: requests.Response, action: str = '') -> 'FixtureWriter':
+        """
+        Start writing a response body that arrives in chunks.
+
+        Args:
+            key: Key to store the fixture under
+            response: Response whose status and headers to record
+            action: SOAP action of the request
+
+        Returns:
+            Writer that adds the fixture to the store when closed
+        """
+        return FixtureWriter(self, key, self._meta(response, action))
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a fixture from the store.
+
+        Returns:
+            Dict with url, action, status, headers and body, or None if there is no such fixture
+        """
+        try:
+            with open(self._path(key, 'json'), encoding='utf-8') as f:
+                fixture = json.load(f)
+            with open(self._path(key, 'body'), 'rb') as f:
+                fixture['body'] = f.read()
+        except FileNotFoundError:
+            return None
+        return fixture
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key, 'json'))
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.directory) if name.endswith('.json'))
+
+
+class FixtureWriter:
+    """
+    Body of a fixture being written a chunk at a time.
+
+    Chunks go to a temporary file in the store directory. The fixture only
+    appears in the store once close() is called, so a body that is not read to
+    the end never replaces an earlier recording.
+    """
+
+    def __init__(self, store: FixtureStore, key: str, meta: Dict[str, Any]):
+        self.store = store
+        self.key = key
+        self.meta = meta
+        fd, self._path = tempfile.mkstemp(prefix=f"{key}.", suffix='.part', dir=store.directory)
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def close(self) -> None:
+        """Add the fixture to the store."""
+        self._file.close()
+        self.store._commit(self.key, self.meta, self._path)
+
+    def abort(self) -> None:
+        """Discard the chunks written so far."""
+        self._file.close()
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+
+
+def _recording_iter_content(iter_content: Callable[..., Iterator], start_writer: Callable[[], FixtureWriter],
+                            encoding: Optional[str]) -> Callable[..., Iterator]:
+    """Wrap Response.iter_content to copy every chunk to a fixture writer as the caller reads it."""
+    def iter_content_and_record(*args, **kwargs):
+        writer = start_writer()
+        completed = False
+        try:
+            for chunk in iter_content(*args, **kwargs):
+                writer.write(chunk.encode(encoding or 'utf-8') if isinstance(chunk, str) else chunk)
+                yield chunk
+            completed = True
+        finally:
+            if completed:
+                writer.close()
+            else:
+                writer.abort()
+    return iter_content_and_record
+
+
+class RecordingTransport(HttpTransport):
+    """Transport that saves every successful response it receives to a fixture store."""
+
+    def __init__(self, store: FixtureStore, **kwargs):
+        """
+        Initialize the transport.
+
+        Args:
+            store: Store to record responses in
+            **kwargs: Passed on to HttpTransport
+        """
+        super().__init__(**kwargs)
+        self.store = store
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = super().request(method, url, **kwargs)
+        # Not Modified and error responses cannot be replayed as page content
+        if 200 <= response.status_code < 300:
+            headers = kwargs.get('headers')
+            key = fixture_key(method, url, headers, kwargs.get('data'))
+            if kwargs.get('stream'):
+                # Record the body as the caller reads it instead of downloading it here,
+                # so streaming callers still get the chunks as they arrive
+                start_writer = functools.partial(self.store.writer, key, response, _soap_action(headers))
+                response.iter_content = _recording_iter_content(response.iter_content, start_writer, response.encoding)
+            else:
+                self.store.save(key, response, _soap_action(headers))
+        return response
@@ -0,0 +1,204 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from src.api.resilience import Resilience
+from src.metrics import metrics
+
+
+class TransportStats:
+    """Thread-safe counters of requests sent and connections opened by a transport."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    @property
+    def connections_reused(self) -> int:
+        """Number of requests that were sent over an already open connection."""
+        return max(0, self.requests - self.connections_opened)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'requests': self.requests,
+            'connections_opened': self.connections_opened,
+            'connections_reused': self.connections_reused,
+        }
+
+
+def _counting_pool(pool_class, stats: TransportStats):
+    """Create a connection pool class that reports every new connection to stats."""
+
+    class CountingConnectionPool(pool_class):
+        def _new_conn(self):
+            stats.record_connection()
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTP adapter whose connection pools count the connections they open."""
+
+    def __init__(self, stats: TransportStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.stats),
+            'https': _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+
+class HttpTransport:
+    """Pooled, keep-alive HTTP transport shared by the KSÍ clients."""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 10,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 resilience: Optional[Resilience] = None):
+        """
+        Initialize the transport.
+
+        Args:
+            pool_connections: Number of hosts to keep connection pools for
+            pool_maxsize: Maximum number of open connections kept per host
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait for the server to send data
+            resilience: Rate limiting, retries and circuit breaking applied to every
+                request (default: none, every request is sent once)
+        """
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+        self.resilience = resilience
+        self.stats = TransportStats()
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        adapter = _CountingAdapter(self.stats, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request over a pooled connection.
+
+        With a resilience layer, the request waits for the rate limiter, fails
+        fast while its endpoint's circuit is open and is retried on connection
+        errors, timeouts and retryable statuses, if it is idempotent or one of
+        the read-only KSÍ SOAP actions (see RetryPolicy.is_retryable). The last
+        response is returned even if its status is an error.
+
+        Args:
+            method: HTTP method
+            url: URL to request
+            **kwargs: Passed on to requests.Session.request
+
+        Returns:
+            The response
+
+        Raises:
+            CircuitOpenError: If the endpoint's circuit is open
+            BudgetExhaustedError: If the request budget is used up
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        resilience = self.resilience
+        if resilience is None:
+            return self._send(method, url, **kwargs)
+
+        endpoint = resilience.endpoint(method, url, kwargs.get('headers'))
+        resilience.before_request(endpoint)
+        try:
+            response = self._send_with_retries(resilience, method, url, **kwargs)
+        except Exception:
+            resilience.record_result(endpoint)
+            raise
+        except BaseException:
+            resilience.record_abandoned(endpoint)
+            raise
+        resilience.record_result(endpoint, response.status_code)
+        return response
+
+    def _send_with_retries(self, resilience: Resilience, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, retrying it as long as the resilience layer allows."""
+        retryable = resilience.is_retryable(method, kwargs.get('headers'))
+        attempt = 0
+        while True:
+            attempt += 1
+            time.sleep(resilience.before_attempt())
+            start = time.perf_counter()
+            try:
+                response = self._send(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                resilience.record_attempt(time.perf_counter() - start)
+                if not retryable or not resilience.should_retry(method, attempt):
+                    raise
+                time.sleep(resilience.backoff(attempt))
+                continue
+            resilience.record_attempt(time.perf_counter() - start, response.status_code)
+            if not retryable or not resilience.should_retry(method, attempt, response.status_code):
+                return response
+            response.close()
+            time.sleep(resilience.backoff(attempt, response.headers.get('Retry-After')))
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request once, recording it in the stats and metrics."""
+        self.stats.record_request()
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            metrics.inc('http_errors_total', method=method)
+            raise
+        # For streamed responses this is the time until the headers arrived
+        metrics.observe('http_request_seconds', time.perf_counter() - start, method=method)
+        metrics.inc('http_requests_total', method=method, status=response.status_code)
+        if kwargs.get('data'):
+            metrics.inc('http_request_bytes_total', len(kwargs['data']), method=method)
+        if not kwargs.get('stream'):
+            metrics.inc('http_response_bytes_total', len(response.content), method=method)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_default_transport: Optional[HttpTransport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> HttpTransport:
+    """Get the process-wide transport used by clients that are not given one."""
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = HttpTransport()
+        return _default_transport
@@ -1,20 +1,38 @@
-import requests
-from typing import Dict, List, Any
-import xml.etree.ElementTree as ET
+import logging
+import time
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 
-class KSIClient:
-    """Client for interacting with the KSÍ SOAP API."""
-    
-    def __init__(self):
-        self.base_url = "https://www2.ksi.is/vefthjonustur/mot.asmx"
-        self.headers = {
-            'Content-Type': 'text/xml; charset=utf-8',
-            'SOAPAction': '"http://www2.ksi.is/vefthjonustur/mot/{action}"'
-        }
-
-    def _make_soap_request(self, action: str, body_content: str = "") -> Dict:
-        """Make a SOAP request to the KSÍ API."""
-        soap_envelope = f"""<?xml version="1.0" encoding="utf-8"?>
+from src.api.http_transport import HttpTransport, get_default_transport
+from src.api.soap_decoder import SoapRecordDecoder
+from src.metrics import metrics
+
+SOAP_URL = "https://www2.ksi.is/vefthjonustur/mot.asmx"
+
+# Headers of every SOAP request, SOAPAction being formatted with the action
+SOAP_HEADERS = {
+    'Content-Type': 'text/xml; charset=utf-8',
+    'SOAPAction': '"http://www2.ksi.is/vefthjonustur/mot/{action}"'
+}
+
+logger = logging.getLogger(__name__)
+
+
+def build_soap_request(action: str, body_content: str,
+                       headers: Optional[Dict[str, str]] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Build the body and headers of a request for a SOAP action.
+
+    Args:
+        action: SOAP action to call, e.g. 'MotLeikir'
+        body_content: Content of the SOAP body
+        headers: Headers to send, with a SOAPAction template (default: SOAP_HEADERS)
+
+    Returns:
+        Tuple of the encoded SOAP envelope and the headers of the request
+    """
+    headers = (headers or SOAP_HEADERS).copy()
+    headers['SOAPAction'] = headers['SOAPAction'].format(action=action)
+    envelope = f"""<?xml version="1.0" encoding="utf-8"?>
 <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
                xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
                xmlns:xsd="http://www.w3.org/2001/XMLSchema"
@@ -23,77 +41,88 @@ class KSIClient:
         {body_content}
     </soap:Body>
 </soap:Envelope>""".strip()
+    return envelope.encode('utf-8'), headers
+
+
+class KSIClient:
+    """Client for interacting with the KSÍ SOAP API."""
+    
+    def __init__(self, transport: Optional[HttpTransport] = None, base_url: Optional[str] = None):
+        """
+        Initialize the client.
+
+        Args:
+            transport: HTTP transport to send requests with (default: the shared transport)
+            base_url: URL of the SOAP service (default: the KSÍ service)
+        """
+        self.transport = transport or get_default_transport()
+        self.chunk_size = 64 * 1024
+        self.base_url = base_url or SOAP_URL
+        self.headers = SOAP_HEADERS.copy()
 
-        headers = self.headers.copy()
-        headers['SOAPAction'] = headers['SOAPAction'].format(action=action)
-        
-        # print(f"\nDebug - Making SOAP request for action: {action}")
-        # print(f"Debug - Request URL: {self.base_url}")
-        # print(f"Debug - Headers: {headers}")
-        # print(f"Debug - Request Body:\n{soap_envelope}")
-
-        response = requests.post(self.base_url, data=soap_envelope, headers=headers)
-        #
-        # print(f"Debug - Response Status: {response.status_code}")
-        # print(f"Debug - Response Headers: {dict(response.headers)}")
-        # print(f"Debug - Response Content Length: {len(response.text)}")
-        # print(f"Debug - First 500 chars of response:\n{response.text[:500]}")
+    def _soap_request(self, action: str, body_content: str) -> Tuple[bytes, Dict[str, str]]:
+        """Build the body and headers of a request for a SOAP action."""
+        return build_soap_request(action, body_content, self.headers)
 
+    def _iter_soap_request(self, action: str, body_content: str = "",
+                           payload: Optional[List[bytes]] = None) -> Iterator[Dict]:
+        """
+        Make a SOAP request to the KSÍ API and yield records while the response downloads.
+
+        Args:
+            action: SOAP action to call
+            body_content: Content of the SOAP body
+            payload: List to append the chunks of the undecoded response body to
+
+        Returns:
+            Iterator over one dict per record in the response
+        """
+        data, headers = self._soap_request(action, body_content)
+        response = self.transport.post(self.base_url, data=data, headers=headers, stream=True)
+        with response:
+            response.raise_for_status()
+            decoder = SoapRecordDecoder(action)
+            decode_seconds = 0.0
+            rows = 0
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                metrics.inc('http_response_bytes_total', len(chunk), method='POST')
+                if payload is not None:
+                    payload.append(chunk)
+                start = time.perf_counter()
+                records = list(decoder.feed(chunk))
+                decode_seconds += time.perf_counter() - start
+                rows += len(records)
+                yield from records
+            start = time.perf_counter()
+            records = list(decoder.close())
+            decode_seconds += time.perf_counter() - start
+            rows += len(records)
+            yield from records
+
+        metrics.observe('parse_seconds', decode_seconds, kind='soap', action=action)
+        metrics.inc('parse_rows_total', rows, kind='soap', action=action)
+        if not decoder.found_array:
+            logger.debug("No matching array element found in %s response", action)
+
+    def _fetch_raw(self, action: str, body_content: str = "") -> bytes:
+        """
+        Make a SOAP request to the KSÍ API and return the undecoded response body.
+
+        Args:
+            action: SOAP action to call
+            body_content: Content of the SOAP body
+
+        Returns:
+            The response body, decodable with soap_decoder.decode_soap_records
+        """
+        data, headers = self._soap_request(action, body_content)
+        response = self.transport.post(self.base_url, data=data, headers=headers)
         response.raise_for_status()
-        
-        # Parse XML response
-        root = ET.fromstring(response.content)
-        # Remove namespaces for easier parsing
-        for elem in root.iter():
-            if '}' in elem.tag:
-                elem.tag = elem.tag.split('}', 1)[1]
-        
-        # Find the response data based on the action
-        if action == 'Flokkur':
-            array_elem = root.find('.//ArrayFlokkur')
-            if array_elem is not None:
-                result = [self._xml_to_dict(item) for item in array_elem.findall('Flokkur')]
-                # print(f"\nDebug - Found {len(result)} items in ArrayFlokkur")
-                # if result:
-                #     print(f"Debug - First item: {result[0]}")
-                return result
-        elif action == 'MotAflog':  # Get tournaments within age group
-            array_elem = root.find('.//ArrayMotAflog')
-            if array_elem is not None:
-                result = [self._xml_to_dict(item) for item in array_elem.findall('MotAflog')]
-                # print(f"\nDebug - Found {len(result)} items in ArrayMotAflog")
-                # if result:
-                #     print(f"Debug - First item: {result[0]}")
-                return result
-        elif action == 'MotStada':
-            array_elem = root.find('.//ArrayMotStada')
-            if array_elem is not None:
-                result = [self._xml_to_dict(item) for item in array_elem.findall('MotStada')]
-                # print(f"\nDebug - Found {len(result)} items in ArrayMotStada")
-                # if result:
-                #     print(f"Debug - First item: {result[0]}")
-                return result
-        elif action == 'MotLeikir':
-            array_elem = root.find('.//ArrayMotLeikir')
-            if array_elem is not None:
-                result = [self._xml_to_dict(item) for item in array_elem.findall('MotLeikur')]
-                # print(f"\nDebug - Found {len(result)} items in ArrayMotLeikir")
-                # if result:
-                #     print(f"Debug - First item: {result[0]}")
-                return result
-        
-        print("Debug - No matching array element found in response")
-        return []
-
-    def _xml_to_dict(self, element: ET.Element) -> Dict:
-        """Convert XML element to dictionary."""
-        result = {}
-        for child in element:
-            if len(child) == 0:
-                result[child.tag] = child.text
-            else:
-                result[child.tag] = self._xml_to_dict(child)
-        return result
+        return response.content
+
+    def _make_soap_request(self, action: str, body_content: str = "") -> List[Dict]:
+        """Make a SOAP request to the KSÍ API."""
+        return list(self._iter_soap_request(action, body_content))
 
     def get_age_groups(self) -> List[Dict[str, Any]]:
         """Fetch all age groups/divisions (e.g., '1. flokkur', '2. flokkur', etc.)."""
@@ -114,6 +143,29 @@ class KSIClient:
         """Fetch all matches for a specific tournament."""
         body = f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>'
         matches = self._make_soap_request('MotLeikir', body)
-        if matches:
-            print(f"\nNumber of matches found: {len(matches)}")
-        return matches
\ No newline at end of file
+        logger.debug("Number of matches found: %d", len(matches))
+        return matches
+
+    def get_tournament_matches_raw(self, tournament_id: int) -> bytes:
+        """Fetch the undecoded MotLeikir response for a specific tournament."""
+        body = f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>'
+        return self._fetch_raw('MotLeikir', body)
+
+    def get_tournament_matches_with_raw(self, tournament_id: int) -> Tuple[List[Dict[str, Any]], bytes]:
+        """
+        Fetch all matches for a specific tournament along with the undecoded MotLeikir response.
+
+        The matches are decoded while the response downloads, as by get_tournament_matches.
+
+        Returns:
+            Tuple of the matches and the response body
+        """
+        body = f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>'
+        payload = []
+        matches = list(self._iter_soap_request('MotLeikir', body, payload))
+        return matches, b''.join(payload)
+
+    def iter_tournament_matches(self, tournament_id: int) -> Iterator[Dict[str, Any]]:
+        """Fetch matches for a specific tournament, yielding each one as soon as it is received."""
+        body = f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>'
+        return self._iter_soap_request('MotLeikir', body)
\ No newline at end of file
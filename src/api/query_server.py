@@ -0,0 +1,178 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from src.const import AgeGroup, TournamentType
+from src.data.match_dataset import MatchDataset
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryError(ValueError):
+    """A query with missing or invalid parameters, answered with 400 Bad Request."""
+
+
+def _int_param(params: Dict[str, List[str]], name: str, default: Optional[int] = None) -> Optional[int]:
+    values = params.get(name)
+    if not values or values[0] == '':
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise QueryError(f"{name} must be an integer, got {values[0]!r}")
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """Request handler answering queries from the dataset of its server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server: 'QueryServer' = self.server.query_server
+        parts = urlsplit(self.path)
+        start = time.perf_counter()
+        try:
+            if parts.path in server.PATHS:
+                status, payload = 200, server.handle(parts.path, parse_qs(parts.query))
+            else:
+                status, payload = 404, {'error': f"Unknown path {parts.path}", 'paths': list(server.PATHS)}
+        except QueryError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            logger.exception("Error answering %s", self.path)
+            status, payload = 500, {'error': str(e)}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        metrics.observe('query_seconds', time.perf_counter() - start, path=parts.path, status=status)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class QueryServer:
+    """
+    Local HTTP/JSON server answering match queries from a resident MatchDataset.
+
+    Endpoints (all GET, parameters in the query string):
+        /stats    The results and fairness breakdowns main prints.
+                  Parameters: age_group, tournament_type, start_year, end_year, team
+        /matches  Matches of the years, optionally only one team's
+        /health   Loaded age groups, tournament types and years
+
+    age_group and tournament_type default to 5. flokkur and Íslandsmót, and
+    end_year to start_year. Years must lie between min_year and next year,
+    at most max_years of them per query. Years not loaded yet are fetched on first use,
+    later queries are answered from memory. The dataset is refreshed in the
+    background as cache entries expire.
+    """
+
+    PATHS = ('/stats', '/matches', '/health')
+
+    def __init__(self, dataset: MatchDataset, host: str = '127.0.0.1', port: int = 8080,
+                 refresh_interval: float = 60.0, min_year: int = 2000, max_years: int = 10):
+        """
+        Initialize the server.
+
+        Args:
+            dataset: Dataset to answer queries from
+            host: Interface to listen on
+            port: Port to listen on (0 for any free port)
+            refresh_interval: Seconds between checks for expired tournaments
+            min_year: Earliest season a query may ask for
+            max_years: Largest number of seasons a query may ask for
+        """
+        self.dataset = dataset
+        self.refresh_interval = refresh_interval
+        self.min_year = min_year
+        self.max_years = max_years
+        self._httpd = ThreadingHTTPServer((host, port), _QueryHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.query_server = self
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _years(self, params: Dict[str, List[str]]) -> List[int]:
+        start_year = _int_param(params, 'start_year')
+        if start_year is None:
+            raise QueryError("start_year is required")
+        end_year = _int_param(params, 'end_year', start_year)
+        if end_year < start_year:
+            raise QueryError("end_year must not be before start_year")
+        # Every year asked for is loaded, bound what a single query can make the server fetch
+        max_year = datetime.now().year + 1
+        if start_year < self.min_year or end_year > max_year:
+            raise QueryError(f"years must be between {self.min_year} and {max_year}")
+        if end_year - start_year + 1 > self.max_years:
+            raise QueryError(f"at most {self.max_years} years can be queried at once")
+        return list(range(start_year, end_year + 1))
+
+    def handle(self, path: str, params: Dict[str, List[str]]) -> Any:
+        """
+        Answer a query.
+
+        Args:
+            path: Path of the request, one of PATHS
+            params: Query string parameters, as parsed by parse_qs
+
+        Returns:
+            JSON-serializable answer
+
+        Raises:
+            QueryError: If a parameter is missing or invalid
+        """
+        if path == '/health':
+            return {'status': 'ok', 'datasets': self.dataset.groups()}
+
+        age_group_id = _int_param(params, 'age_group', AgeGroup.FIFTH_FLOKKUR.value)
+        tournament_type = _int_param(params, 'tournament_type', TournamentType.ISLANDSMOT.value)
+        team_id = _int_param(params, 'team')
+        years = self._years(params)
+        snapshot = self.dataset.snapshot(age_group_id, tournament_type, years)
+        if path == '/matches':
+            return snapshot.matches(years, team_id)
+        answer = snapshot.stats(years, team_id)
+        answer.update(age_group=age_group_id, tournament_type=tournament_type, team=team_id)
+        return answer
+
+    def start(self) -> 'QueryServer':
+        """Start serving and refreshing in background threads."""
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._httpd.serve_forever, daemon=True),
+            threading.Thread(target=self.dataset.run_refreshes, args=(self._stop, self.refresh_interval), daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and refreshing and close the listening socket."""
+        self._stop.set()
+        if self._threads:
+            self._httpd.shutdown()
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,67 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how often requests are sent to KSÍ."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        Initialize the token bucket.
+
+        Args:
+            rate: Number of tokens added per second
+            capacity: Maximum number of tokens that can be saved up for bursts
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket, blocking until they are available.
+
+        Args:
+            tokens: Number of tokens to take
+
+        Returns:
+            Number of seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Take tokens from the bucket without blocking, borrowing from future refills.
+
+        For callers that cannot block, such as coroutines, which sleep for the
+        returned time themselves before sending their request.
+
+        Args:
+            tokens: Number of tokens to take
+
+        Returns:
+            Number of seconds to wait before the tokens may be used
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
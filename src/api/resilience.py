@@ -0,0 +1,337 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Mapping, Optional
+from urllib.parse import urlsplit
+
+from diskcache import Cache
+
+from src.api.rate_limiter import TokenBucket
+from src.metrics import metrics
+
+# Responses telling us to slow down
+THROTTLE_STATUSES = frozenset({429, 503})
+
+# Methods whose requests can be sent again without changing anything on the server
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+# SOAP actions of the KSÍ API the clients call. They only look data up, so
+# sending one of these POST requests twice is as safe as sending a GET twice.
+READ_ONLY_SOAP_ACTIONS = frozenset({'Flokkur', 'MotAflog', 'MotStada', 'MotLeikir'})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to an endpoint whose circuit breaker is open."""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"Circuit open for {endpoint}, retrying in {retry_in:.1f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class BudgetExhaustedError(Exception):
+    """Raised instead of sending a request once the shared request budget is used up."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Request budget of {limit} requests used up")
+        self.limit = limit
+
+
+class RequestBudget:
+    """
+    Total number of requests that may be sent, shared by every process using the same directory.
+
+    The count is kept in a diskcache directory and taken with its atomic
+    increment, so processes of a pool can enforce one budget together.
+    """
+
+    def __init__(self, directory: str, limit: int, key: str = "request_budget"):
+        """
+        Initialize the budget.
+
+        Args:
+            directory: diskcache directory holding the count
+            limit: Number of requests that may be sent
+            key: Key of the count, to keep several budgets in one directory
+        """
+        self.directory = directory
+        self.limit = limit
+        self.key = key
+        self._cache = Cache(directory)
+
+    @property
+    def used(self) -> int:
+        return self._cache.get(self.key, 0)
+
+    def take(self) -> None:
+        """Count one request, raising BudgetExhaustedError if the budget is used up."""
+        if self._cache.incr(self.key) > self.limit:
+            raise BudgetExhaustedError(self.limit)
+
+    def close(self) -> None:
+        self._cache.close()
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Token bucket whose rate adapts to the server (AIMD).
+
+    The rate grows additively while responses are fast and successful, and is
+    cut multiplicatively on 429/503 responses or slow responses. It never
+    drops below min_rate or grows above max_rate.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1, min_rate: Optional[float] = None,
+                 max_rate: Optional[float] = None, increase: float = 0.1, decrease: float = 0.5,
+                 latency_target: Optional[float] = None):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate: Initial number of requests per second
+            capacity: Maximum number of tokens that can be saved up for bursts
+            min_rate: Lowest rate the limiter backs off to (default: a tenth of rate)
+            max_rate: Highest rate the limiter grows to (default: twice rate)
+            increase: Requests per second added for every second of successful responses
+            decrease: Factor the rate is multiplied by when the server pushes back
+            latency_target: Seconds above which a response counts as the server
+                being overloaded (default: only 429/503 responses do)
+        """
+        super().__init__(rate, capacity)
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.max_rate = max(rate, max_rate if max_rate is not None else 2 * rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self._last_decrease = 0.0
+
+    def _set_rate(self, rate: float) -> None:
+        self._refill(time.monotonic())
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        metrics.set_gauge('rate_limit_rps', self.rate)
+
+    def record_response(self, latency: float, status: Optional[int] = None) -> None:
+        """
+        Adapt the rate to a response.
+
+        Args:
+            latency: Seconds the request took
+            status: HTTP status of the response (None if the request failed)
+        """
+        throttled = status in THROTTLE_STATUSES
+        slow = self.latency_target is not None and latency > self.latency_target
+        with self._lock:
+            now = time.monotonic()
+            if throttled or slow:
+                # Only back off once per round trip, as concurrent requests report the same overload
+                if now - self._last_decrease >= max(latency, 1 / self.rate):
+                    self._last_decrease = now
+                    self._set_rate(self.rate * self.decrease)
+            elif status is not None and status < 400:
+                self._set_rate(self.rate + self.increase / self.rate)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """When and how long to wait before retrying a failed request."""
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+    # POST requests are only retried for these SOAP actions, other methods only if idempotent
+    retry_soap_actions: FrozenSet[str] = READ_ONLY_SOAP_ACTIONS
+
+    def is_retryable(self, method: str, soap_action: str = '') -> bool:
+        """Whether a request may be sent more than once: idempotent, or a read-only SOAP action."""
+        method = method.upper()
+        if method == 'POST':
+            return soap_action in self.retry_soap_actions
+        return method in IDEMPOTENT_METHODS
+
+    def should_retry(self, attempt: int, status: Optional[int] = None) -> bool:
+        """
+        Whether to retry after the given attempt.
+
+        Args:
+            attempt: Number of attempts made so far (starting at 1)
+            status: HTTP status of the response, None if the request raised a connection error or timeout
+        """
+        if attempt >= self.max_attempts:
+            return False
+        return status is None or status in self.retry_statuses
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Seconds to wait before the next attempt: exponential backoff with full jitter.
+
+        A Retry-After header given in seconds is respected as a lower bound.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after:
+            try:
+                delay = max(delay, min(self.max_delay, float(retry_after)))
+            except ValueError:
+                pass  # HTTP dates are not worth parsing here
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker of one endpoint.
+
+    After failure_threshold consecutive failures the circuit opens and requests
+    fail immediately. After reset_timeout one trial request is let through: if
+    it succeeds the circuit closes, otherwise it opens again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError if a request may not be sent now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            retry_in = self._opened_at + self.reset_timeout - now
+            if retry_in <= 0:
+                # Let a trial request through, or another one if the last trial never reported back
+                self._opened_at = now
+                self._set_state(self.HALF_OPEN)
+                return
+            # Open, or half open with the trial request still running
+            raise CircuitOpenError(self.name, retry_in)
+
+    def release_trial(self) -> None:
+        """Let another trial request through right away, the running one was given up before it completed."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._opened_at = time.monotonic() - self.reset_timeout
+                self._set_state(self.OPEN)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self.state != self.OPEN:
+                    metrics.inc('circuit_opened_total', endpoint=self.name)
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.set_gauge('circuit_open', 1 if state != self.CLOSED else 0, endpoint=self.name)
+
+
+class Resilience:
+    """
+    Rate limiting, retries and circuit breaking shared by all requests of a transport.
+
+    HttpTransport and AsyncHttpTransport call before_request once per request
+    and before_attempt and record_attempt around every attempt, retry as long
+    as should_retry allows, waiting backoff seconds in between, and finally
+    report the outcome of the request to record_result, whatever it raised.
+    A request given up before it completed, e.g. cancelled, is reported to
+    record_abandoned instead.
+    """
+
+    def __init__(self, rate_limiter: Optional[TokenBucket] = None, retry: Optional[RetryPolicy] = None,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, budget: Optional[RequestBudget] = None):
+        """
+        Initialize the resilience layer.
+
+        Args:
+            rate_limiter: Limiter every attempt, including retries, waits for (default: no limit)
+            retry: Retry policy (default: RetryPolicy())
+            failure_threshold: Consecutive failed requests, after all their retries,
+                that open an endpoint's circuit
+            reset_timeout: Seconds an open circuit rejects requests before a trial request
+            budget: Total number of requests, including retries, that may be sent (default: no limit)
+        """
+        self.rate_limiter = rate_limiter
+        self.budget = budget
+        self.retry = retry or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def soap_action(headers: Optional[Mapping[str, str]] = None) -> str:
+        """Name of the SOAP action of a request, empty if it is not a SOAP request."""
+        return (headers or {}).get('SOAPAction', '').strip('"').rsplit('/', 1)[-1]
+
+    @staticmethod
+    def endpoint(method: str, url: str, headers: Optional[Mapping[str, str]] = None) -> str:
+        """Name of the endpoint of a request: method, host and path, and the SOAP action if any."""
+        parts = urlsplit(url)
+        name = f"{method} {parts.netloc}{parts.path}"
+        action = Resilience.soap_action(headers)
+        return f"{name} {action}" if action else name
+
+    def is_retryable(self, method: str, headers: Optional[Mapping[str, str]] = None) -> bool:
+        """Whether a request may be retried at all, see RetryPolicy.is_retryable."""
+        return self.retry.is_retryable(method, self.soap_action(headers))
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+            return self._breakers[endpoint]
+
+    def before_request(self, endpoint: str) -> None:
+        """Raise CircuitOpenError if the endpoint's circuit is open."""
+        self.breaker(endpoint).before_request()
+
+    def before_attempt(self) -> float:
+        """
+        Take a rate limit token for one attempt and return the seconds to wait before sending it.
+
+        Raises:
+            BudgetExhaustedError: If the request budget is used up
+        """
+        if self.budget is not None:
+            self.budget.take()
+        return self.rate_limiter.reserve() if self.rate_limiter is not None else 0.0
+
+    def record_attempt(self, latency: float, status: Optional[int] = None) -> None:
+        """Adapt the rate to an attempt, status None meaning a connection error or timeout."""
+        if isinstance(self.rate_limiter, AdaptiveRateLimiter):
+            self.rate_limiter.record_response(latency, status)
+
+    def should_retry(self, method: str, attempt: int, status: Optional[int] = None) -> bool:
+        """Whether to retry an attempt, counting the retry in the metrics."""
+        if not self.retry.should_retry(attempt, status):
+            return False
+        metrics.inc('http_retries_total', method=method, reason=str(status) if status else 'error')
+        return True
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        return self.retry.backoff(attempt, retry_after)
+
+    def record_abandoned(self, endpoint: str) -> None:
+        """Record a request given up before it completed, which says nothing about the endpoint."""
+        self.breaker(endpoint).release_trial()
+
+    def record_result(self, endpoint: str, status: Optional[int] = None) -> None:
+        """Record the outcome of a request after its last attempt, status None meaning it raised."""
+        # A 429 is the endpoint working and asking us to slow down, which the rate limiter handles
+        if status is None or status >= 500:
+            self.breaker(endpoint).record_failure()
+        else:
+            self.breaker(endpoint).record_success()
@@ -0,0 +1,132 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import xml.etree.ElementTree as ET
+
+from src.metrics import metrics
+
+SOAP_NAMESPACE = "http://www2.ksi.is/vefthjonustur/mot/"
+
+# Array element and record element returned by each SOAP action
+RESPONSE_ELEMENTS: Dict[str, Tuple[str, str]] = {
+    'Flokkur': ('ArrayFlokkur', 'Flokkur'),
+    'MotAflog': ('ArrayMotAflog', 'MotAflog'),
+    'MotStada': ('ArrayMotStada', 'MotStada'),
+    'MotLeikir': ('ArrayMotLeikir', 'MotLeikur'),
+}
+
+
+def _qualified(name: str) -> Tuple[str, str]:
+    """Both spellings of a tag: in the KSÍ namespace and without a namespace."""
+    return f"{{{SOAP_NAMESPACE}}}{name}", name
+
+
+class SoapRecordDecoder:
+    """
+    Incremental decoder turning a SOAP response into one dict per record element.
+
+    Bytes are fed in as they arrive and records are yielded as soon as their
+    closing tag has been read. Only direct children of the array element are
+    records, and each is removed from the array once converted, so memory use
+    does not grow with the number of records in the response.
+    """
+
+    def __init__(self, action: str):
+        """
+        Initialize the decoder.
+
+        Args:
+            action: SOAP action of the response, e.g. 'MotLeikir'
+        """
+        if action not in RESPONSE_ELEMENTS:
+            raise ValueError(f"Unknown SOAP action: {action}")
+        array_name, record_name = RESPONSE_ELEMENTS[action]
+        self._array_tags = _qualified(array_name)
+        self._record_tags = _qualified(record_name)
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._local_names: Dict[str, str] = {}
+        self._depth = 0
+        self._array: Optional[ET.Element] = None
+        self._array_depth = 0
+        self.found_array = False
+
+    def _local_name(self, tag: str) -> str:
+        name = self._local_names.get(tag)
+        if name is None:
+            name = tag.split('}', 1)[1] if '}' in tag else tag
+            self._local_names[tag] = name
+        return name
+
+    def _to_dict(self, element: ET.Element) -> Dict:
+        """Convert a record element to a dictionary keyed by tag names without namespace."""
+        local_names = self._local_names
+        result = {}
+        for child in element:
+            name = local_names.get(child.tag) or self._local_name(child.tag)
+            if len(child) == 0:
+                result[name] = child.text
+            else:
+                result[name] = self._to_dict(child)
+        return result
+
+    def _read_events(self) -> Iterator[Dict]:
+        record_tags = self._record_tags
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                self._depth += 1
+                if self._array is None and elem.tag in self._array_tags:
+                    self._array = elem
+                    self._array_depth = self._depth
+                    self.found_array = True
+                continue
+
+            depth = self._depth
+            self._depth -= 1
+            if elem is self._array:
+                self._array = None
+                elem.clear()
+            elif self._array is not None and depth == self._array_depth + 1 and elem.tag in record_tags:
+                yield self._to_dict(elem)
+                # Detach the record so the array does not keep every converted record
+                self._array.remove(elem)
+
+    def feed(self, data: bytes) -> Iterator[Dict]:
+        """
+        Feed a chunk of the response body.
+
+        Args:
+            data: Next chunk of the response body
+
+        Returns:
+            Iterator over the records completed by this chunk
+        """
+        self._parser.feed(data)
+        return self._read_events()
+
+    def close(self) -> Iterator[Dict]:
+        """Signal the end of the response and return any remaining records."""
+        self._parser.close()
+        return self._read_events()
+
+
+def iter_soap_records(chunks: Iterable[bytes], action: str) -> Iterator[Dict]:
+    """
+    Decode records from a SOAP response body delivered in chunks.
+
+    Args:
+        chunks: Chunks of the response body
+        action: SOAP action of the response
+
+    Returns:
+        Iterator over one dict per record element
+    """
+    decoder = SoapRecordDecoder(action)
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+def decode_soap_records(content: bytes, action: str) -> List[Dict]:
+    """Decode all records of a complete SOAP response body."""
+    with metrics.timer('parse_seconds', kind='soap', action=action):
+        records = list(iter_soap_records([content], action))
+    metrics.inc('parse_rows_total', len(records), kind='soap', action=action)
+    return records
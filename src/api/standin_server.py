@@ -0,0 +1,173 @@
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from src.api.fixtures import FixtureStore, fixture_key
+from src.api.soap_decoder import RESPONSE_ELEMENTS
+
+
+def _repeat(body: bytes, start: int, end: int, times: int) -> bytes:
+    """Repeat body[start:end] so it appears the given number of times in a row."""
+    if times <= 1 or start < 0 or end <= start:
+        return body
+    return body[:start] + body[start:end] * times + body[end:]
+
+
+def scale_payload(body: bytes, action: str, times: int) -> bytes:
+    """
+    Multiply the number of records in a recorded response.
+
+    For SOAP responses, the records of the action are repeated. For the
+    tournament list page, the table rows linking to tournaments are repeated.
+
+    Args:
+        body: Recorded response body
+        action: SOAP action of the response, '' for a web page
+        times: Number of copies of the records to return
+
+    Returns:
+        Response body with every record repeated, unchanged if times <= 1
+    """
+    if times <= 1:
+        return body
+    if action in RESPONSE_ELEMENTS:
+        tag = re.escape(RESPONSE_ELEMENTS[action][1].encode())
+        first = re.search(rb'<(?:\w+:)?' + tag + rb'[\s>]', body)
+        ends = list(re.finditer(rb'</(?:\w+:)?' + tag + rb'>', body))
+        if first is None or not ends:
+            return body
+        return _repeat(body, first.start(), ends[-1].end(), times)
+
+    first = body.find(b'motnumer=')
+    last = body.rfind(b'motnumer=')
+    if first < 0:
+        return body
+    end = body.find(b'</tr>', last)
+    return _repeat(body, body.rfind(b'<tr', 0, first), end + len(b'</tr>') if end >= 0 else -1, times)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Request handler answering from the fixture store of its server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+    def _respond(self):
+        server: 'StandInServer' = self.server.standin
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        if server.latency:
+            time.sleep(server.latency)
+        if server.should_fail():
+            self._send(503, b'Simulated failure', {'Content-Type': 'text/plain'})
+            return
+
+        key = fixture_key(self.command, self.path, dict(self.headers), body)
+        fixture = server.store.load(key)
+        if fixture is None:
+            self._send(404, f"No fixture recorded for {key}".encode(), {'Content-Type': 'text/plain'})
+            return
+
+        headers = dict(fixture['headers'])
+        etag = headers.get('ETag')
+        if etag and self.headers.get('If-None-Match') == etag:
+            self._send(304, b'', {'ETag': etag})
+            return
+        payload = scale_payload(fixture['body'], fixture['action'], server.scale)
+        self._send(fixture['status'], payload, headers)
+
+    def _send(self, status: int, payload: bytes, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Keep the output of load tests readable
+        pass
+
+
+class StandInServer:
+    """
+    Local HTTP server replaying recorded KSÍ responses.
+
+    Serves the SOAP API and the tournament list pages from a FixtureStore with
+    configurable latency, error rate and payload size, so the fetch pipeline
+    can be benchmarked and load tested without network access. Requests are
+    matched to fixtures by path, query, SOAP action and body, so clients only
+    need their base URL pointed at the server (see url_for).
+    """
+
+    def __init__(self, store: FixtureStore, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, error_rate: float = 0.0, scale: int = 1, seed: Optional[int] = None):
+        """
+        Initialize the server.
+
+        Args:
+            store: Recorded responses to serve
+            host: Interface to listen on
+            port: Port to listen on (default: any free port)
+            latency: Seconds to wait before answering each request
+            error_rate: Fraction of requests answered with 503 Service Unavailable
+            scale: Number of times the records of each response are repeated
+            seed: Seed for choosing which requests fail
+        """
+        self.store = store
+        self.latency = latency
+        self.error_rate = error_rate
+        self.scale = scale
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _StandInHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, url: str) -> str:
+        """Rewrite a ksi.is URL to point at this server, e.g. for KSIClient(base_url=...)."""
+        parts = urlsplit(url)
+        server = urlsplit(self.base_url)
+        return urlunsplit((server.scheme, server.netloc, parts.path, parts.query, parts.fragment))
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def start(self) -> 'StandInServer':
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -1,17 +1,221 @@
-import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional
+import hashlib
+import logging
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+from html import unescape
+from typing import List, Dict, Any, Optional, Tuple, Union
 from urllib.parse import urlencode
 from datetime import datetime
 
+from src.api.http_transport import HttpTransport, get_default_transport
 from src.const import TournamentType
+from src.metrics import metrics
+
+
+# Version of the tournament list parsing, bump when the extracted fields change
+TOURNAMENTS_PARSER_VERSION = 1
+
+TOURNAMENTS_URL = "https://www.ksi.is/mot/leikir-og-mot/oll-mot/"
+
+try:
+    import lxml.html
+    DEFAULT_HTML_PARSER = 'lxml'
+except ImportError:  # Optional, BeautifulSoup's pure Python parser is used without it
+    lxml = None
+    DEFAULT_HTML_PARSER = 'html.parser'
+
+_TABLE_RE = re.compile(r'<table\b.*?</table\s*>', re.IGNORECASE | re.DOTALL)
+_NESTED_TABLE_RE = re.compile(r'<table\b', re.IGNORECASE)
+_HEADER_RE = re.compile(r'<th\b[^>]*>(.*?)</th\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+logger = logging.getLogger(__name__)
+
+# Link text, link URL and text of every cell of a tournament table row
+TableRow = Tuple[str, str, List[str]]
+
+
+def _soup_table_rows(table: Any) -> List[TableRow]:
+    """Rows of a BeautifulSoup table that link to a tournament, skipping the header row."""
+    rows = []
+    for row in table.find_all('tr')[1:]:
+        cells = row.find_all(['td', 'th'])  # Look for both td and th cells
+        if cells:
+            link = cells[0].find('a')
+            if link:
+                rows.append((link.text.strip(), link.get('href', ''), [cell.text.strip() for cell in cells]))
+    return rows
+
+
+def _lxml_table_rows(table: Any) -> List[TableRow]:
+    """Rows of an lxml table that link to a tournament, skipping the header row."""
+    rows = []
+    for row in list(table.iter('tr'))[1:]:
+        cells = row.xpath('.//td|.//th')
+        if cells:
+            link = next(cells[0].iter('a'), None)
+            if link is not None:
+                rows.append((link.text_content().strip(), link.get('href', ''),
+                             [cell.text_content().strip() for cell in cells]))
+    return rows
+
+
+def _slice_tournament_table(html: Union[str, bytes]) -> Optional[str]:
+    """
+    Cut the markup of the tournament table out of the page without parsing the rest.
+
+    Returns:
+        Markup of the first table with a header mentioning 'mót', or None if there
+        is no such table or the page cannot be sliced safely (nested tables or an
+        encoding other than UTF-8), in which case the page has to be parsed
+    """
+    if isinstance(html, bytes):
+        try:
+            html = html.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+    for match in _TABLE_RE.finditer(html):
+        table = match.group(0)
+        if _NESTED_TABLE_RE.search(table, 1):
+            return None
+        headers = (unescape(_TAG_RE.sub('', header)).strip().lower() for header in _HEADER_RE.findall(table))
+        if any('mót' in header for header in headers):
+            return table
+    return None
+
+
+class TournamentPages:
+    """
+    Tournament list pages of the KSÍ website, without sending any requests.
+
+    Builds the page URLs, makes requests conditional on the validators of the
+    previous response and parses the pages. Shared by KSIWebScraper and
+    AsyncKSIWebScraper, which only differ in how they send the requests.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, html_parser: Optional[str] = None):
+        """
+        Initialize the pages.
+
+        Args:
+            base_url: URL of the tournament list page (default: the page on ksi.is)
+            html_parser: 'lxml' to extract the tournament table with lxml directly, or the name of
+                a BeautifulSoup parser such as 'html.parser' (default: 'lxml' if installed)
+        """
+        self.base_url = base_url or TOURNAMENTS_URL
+        self.html_parser = html_parser or DEFAULT_HTML_PARSER
+        if self.html_parser == 'lxml' and lxml is None:
+            raise ImportError("The lxml parser requires the lxml package")
+
+    def url(self, age_group_id: int, year: int, gender: int, tournament_type: int) -> str:
+        """Build the URL of the tournament list page."""
+        params = {
+            'filter': '',
+            'flokkur': age_group_id,
+            'tegund': tournament_type,
+            'ar': year,
+            'kyn': gender
+        }
+        return f"{self.base_url}?{urlencode(params)}"
+
+    def _parse_tournaments(self, html: Union[str, bytes]) -> List[Dict[str, Any]]:
+        """Extract the tournaments from the tournament list page."""
+        tournaments = []
+
+        # Only build a tree of the tournament table, not of the whole page
+        table_html = _slice_tournament_table(html)
+        if table_html is None:
+            rows = self._find_tournament_rows(html)
+        elif self.html_parser == 'lxml':
+            rows = _lxml_table_rows(lxml.html.fragment_fromstring(table_html))
+        else:
+            rows = _soup_table_rows(BeautifulSoup(table_html, self.html_parser).find('table'))
+        
+        if rows is not None:
+            for name, tournament_url, cells in rows:
+                tournament_id = None
+                if 'motnumer=' in tournament_url:
+                    tournament_id = tournament_url.split('motnumer=')[1]
+
+                tournament = {
+                    'name': name,
+                    'tournament_id': tournament_id,
+                    'url': tournament_url,
+                    'year': cells[1] if len(cells) > 1 else None,
+                    'status': cells[2] if len(cells) > 2 else None,
+                    'category': cells[3] if len(cells) > 3 else None,
+                    'age_group': cells[4] if len(cells) > 4 else None,
+                    'gender': cells[5] if len(cells) > 5 else None
+                }
+                tournaments.append(tournament)
+            logger.debug("Found %d tournaments in the tournament table", len(tournaments))
+        else:
+            logger.warning("Could not find tournament table in the page")
+            # Debug: Save the HTML for inspection
+            with open('debug_page.html', 'wb' if isinstance(html, bytes) else 'w') as f:
+                f.write(html)
+            logger.warning("Saved HTML to debug_page.html for inspection")
+        
+        return tournaments
+
+    def _find_tournament_rows(self, html: Union[str, bytes]) -> Optional[List[TableRow]]:
+        """Find the tournament table by parsing every table of the page, for pages that cannot be sliced."""
+        # BeautifulSoup detects the encoding of pages that are not UTF-8
+        soup = BeautifulSoup(html, self.html_parser, parse_only=SoupStrainer('table'))
+        for table in soup.find_all('table'):
+            # Look for table headers that might indicate this is the tournament table
+            header_texts = [h.text.strip() for h in table.find_all('th')]
+            if any('mót' in h.lower() for h in header_texts):
+                return _soup_table_rows(table)
+        return None
+
+    def conditional_headers(self, validators: Dict[str, str]) -> Dict[str, str]:
+        """Headers making a request conditional on the validators of the previous response."""
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def modified_content(self, content: bytes, response_headers: Any,
+                         validators: Dict[str, str]) -> Tuple[Optional[bytes], Dict[str, str]]:
+        """Validators of a 200 response, and its content unless it hashes the same as before."""
+        new_validators = {'content_hash': hashlib.sha256(content).hexdigest()}
+        if response_headers.get('ETag'):
+            new_validators['etag'] = response_headers['ETag']
+        if response_headers.get('Last-Modified'):
+            new_validators['last_modified'] = response_headers['Last-Modified']
+
+        if validators.get('content_hash') == new_validators['content_hash']:
+            logger.debug("Tournament list unchanged")
+            return None, new_validators
+        
+        return content, new_validators
+
+    def parse(self, content: bytes) -> List[Dict[str, Any]]:
+        """Extract the tournaments from a fetched tournament list page."""
+        with metrics.timer('parse_seconds', kind='html'):
+            tournaments = self._parse_tournaments(content)
+        metrics.inc('parse_rows_total', len(tournaments), kind='html')
+        return tournaments
 
 
 class KSIWebScraper:
     """Scraper for fetching tournament data from the KSÍ website."""
     
-    def __init__(self):
-        self.base_url = "https://www.ksi.is/mot/leikir-og-mot/oll-mot/"
+    def __init__(self, transport: Optional[HttpTransport] = None, base_url: Optional[str] = None,
+                 html_parser: Optional[str] = None):
+        """
+        Initialize the scraper.
+
+        Args:
+            transport: HTTP transport to send requests with (default: the shared transport)
+            base_url: URL of the tournament list page (default: the page on ksi.is)
+            html_parser: Parser backend, see TournamentPages
+        """
+        self.transport = transport or get_default_transport()
+        self.pages = TournamentPages(base_url, html_parser)
         self.matches_base_url = "https://www.ksi.is/mot/leikir-og-mot/leiksedill/"
     
     def _parse_date(self, date_str: str) -> Optional[str]:
@@ -59,70 +263,63 @@ class KSIWebScraper:
         Returns:
             List of tournaments with their details
         """
-        params = {
-            'filter': '',
-            'flokkur': age_group_id,
-            'tegund': tournament_type,
-            'ar': year,
-            'kyn': gender
-        }
+        tournaments, _ = self.get_tournaments_if_modified(age_group_id, year, gender, tournament_type)
+        return tournaments
+
+    def get_tournaments_if_modified(self, age_group_id: int, year: int = 2025, gender: int = 1,
+                                    tournament_type: int = TournamentType.ISLANDSMOT.value,
+                                    validators: Optional[Dict[str, str]] = None) -> Tuple[Optional[List[Dict[str, Any]]], Dict[str, str]]:
+        """
+        Fetch tournaments for a specific age group unless the page is unchanged.
         
-        url = f"{self.base_url}?{urlencode(params)}"
-        print(f"Fetching tournaments from: {url}")
+        Args:
+            age_group_id: The ID of the age group (flokkur)
+            year: The year to fetch tournaments for (default: 2025)
+            gender: 1 for men's tournaments, 2 for women's tournaments (default: 1)
+            tournament_type: The tournament type ID to filter by
+            validators: Validators returned with the previously fetched tournaments
+            
+        Returns:
+            Tuple of the tournaments (None if unchanged since validators were
+            taken) and the validators of this response
+        """
+        content, validators = self.fetch_tournaments_page(age_group_id, year, gender, tournament_type, validators)
+        if content is None:
+            return None, validators
+        return self.parse_tournaments_page(content), validators
+
+    def fetch_tournaments_page(self, age_group_id: int, year: int = 2025, gender: int = 1,
+                               tournament_type: int = TournamentType.ISLANDSMOT.value,
+                               validators: Optional[Dict[str, str]] = None) -> Tuple[Optional[bytes], Dict[str, str]]:
+        """
+        Fetch the raw tournament list page unless it is unchanged.
+
+        The request is made conditional on the ETag and Last-Modified validators
+        of the previous response. If the server answers 304 Not Modified, or the
+        body hashes to the same value as before, no content is returned.
+
+        Args:
+            age_group_id: The ID of the age group (flokkur)
+            year: The year to fetch tournaments for (default: 2025)
+            gender: 1 for men's tournaments, 2 for women's tournaments (default: 1)
+            tournament_type: The tournament type ID to filter by
+            validators: Validators returned with the previously fetched page
+
+        Returns:
+            Tuple of the page content (None if unchanged since validators were
+            taken) and the validators of this response
+        """
+        validators = validators or {}
+        url = self.pages.url(age_group_id, year, gender, tournament_type)
+        logger.debug("Fetching tournaments from: %s", url)
         
-        response = requests.get(url)
+        response = self.transport.get(url, headers=self.pages.conditional_headers(validators))
+        if response.status_code == 304:
+            logger.debug("Tournament list not modified")
+            return None, validators
         response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        tournaments = []
-        
-        # Debug: Print all tables found
-        tables = soup.find_all('table')
-        print(f"Found {len(tables)} tables on the page")
-        
-        # Try to find the tournament table
-        tournament_table = None
-        for table in tables:
-            # Look for table headers that might indicate this is the tournament table
-            headers = table.find_all('th')
-            if headers:
-                header_texts = [h.text.strip() for h in headers]
-                print(f"Found table with headers: {header_texts}")
-                if any('mót' in h.lower() for h in header_texts):
-                    tournament_table = table
-                    break
-        
-        if tournament_table:
-            print("Found tournament table, processing rows...")
-            # Process each row (skipping header row)
-            for row in tournament_table.find_all('tr')[1:]:
-                cells = row.find_all(['td', 'th'])  # Look for both td and th cells
-                if cells:
-                    # Find the tournament link and extract the ID
-                    link = cells[0].find('a')
-                    if link:
-                        tournament_url = link.get('href', '')
-                        tournament_id = None
-                        if 'motnumer=' in tournament_url:
-                            tournament_id = tournament_url.split('motnumer=')[1]
-                        
-                        tournament = {
-                            'name': link.text.strip(),
-                            'tournament_id': tournament_id,
-                            'url': tournament_url,
-                            'year': cells[1].text.strip() if len(cells) > 1 else None,
-                            'status': cells[2].text.strip() if len(cells) > 2 else None,
-                            'category': cells[3].text.strip() if len(cells) > 3 else None,
-                            'age_group': cells[4].text.strip() if len(cells) > 4 else None,
-                            'gender': cells[5].text.strip() if len(cells) > 5 else None
-                        }
-                        tournaments.append(tournament)
-                        print(f"Found tournament: {tournament['name']}")
-        else:
-            print("Could not find tournament table in the page")
-            # Debug: Save the HTML for inspection
-            with open('debug_page.html', 'w', encoding='utf-8') as f:
-                f.write(soup.prettify())
-            print("Saved HTML to debug_page.html for inspection")
-        
-        return tournaments 
\ No newline at end of file
+        return self.pages.modified_content(response.content, response.headers, validators)
+
+    def parse_tournaments_page(self, content: bytes) -> List[Dict[str, Any]]:
+        """Extract the tournaments from a page returned by fetch_tournaments_page."""
+        return self.pages.parse(content)
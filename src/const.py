@@ -68,4 +68,16 @@ class TournamentType(Enum):
         for member in cls:
             if member.value == value:
                 return member.name.replace('_', ' ').title()
-        return f"Unknown Tournament type ({value})"
\ No newline at end of file
+        return f"Unknown Tournament type ({value})"
+
+
+class TournamentStatus(Enum):
+    """Tournament statuses shown in the status column of KSÍ's tournament list"""
+    NOT_STARTED = 'Ekki hafið'
+    IN_PROGRESS = 'Í gangi'
+    FINISHED = 'Lokið'
+
+    @classmethod
+    def is_finished(cls, status):
+        """Check if a scraped status text says the tournament is finished"""
+        return bool(status) and cls.FINISHED.value.lower() in status.lower()
@@ -0,0 +1,389 @@
+import asyncio
+import concurrent.futures
+import logging
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from xml.etree.ElementTree import ParseError
+
+from src.api.async_ksi_client import AsyncKSIClient
+from src.api.async_transport import aiohttp
+from src.api.async_web_scraper import AsyncKSIWebScraper
+from src.api.resilience import BudgetExhaustedError, CircuitOpenError
+from src.data.cache_manager import CacheEntry
+from src.data.match import Match
+from src.data.match_fetcher import MatchFetcher
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean a fetch failed, as opposed to KSÍ having no data
+ASYNC_FETCH_ERRORS = (TimeoutError, ParseError, CircuitOpenError, BudgetExhaustedError) + ((aiohttp.ClientError,) if aiohttp is not None else ())
+
+
+class AsyncMatchFetcher:
+    """
+    Asyncio counterpart of MatchFetcher.
+
+    get_matches_for_years is a coroutine running up to max_concurrency
+    fetches at once in the event loop. Caching, parsing, conversion and the
+    result are done by a MatchFetcher, only the requests are awaited. Its
+    cache reads and writes, leases, parsing and conversion block, so they are
+    run in worker threads to keep the event loop free for the requests.
+    """
+
+    def __init__(self, soap_client: AsyncKSIClient, web_scraper: AsyncKSIWebScraper,
+                 max_concurrency: int = 16, refresh_timeout: float = 120, **kwargs: Any):
+        """
+        Initialize the match fetcher.
+
+        Args:
+            soap_client: Async client for the KSÍ SOAP API
+            web_scraper: Async scraper for the KSÍ website
+            max_concurrency: Maximum number of tournament lists and tournaments fetched at once
+            refresh_timeout: Seconds a background refresh of a stale entry waits for the event loop to run it
+            **kwargs: Cache, TTL, rate limit and retry options of MatchFetcher (max_workers is not used)
+        """
+        self.soap_client = soap_client
+        self.web_scraper = web_scraper
+        # Only the cache, its keys and the parsing and conversion of this fetcher are used,
+        # never its own fetches, which would call the async clients without awaiting them
+        self.fetcher = MatchFetcher(soap_client, web_scraper, **kwargs)
+        self.cache = self.fetcher.cache
+        self.cache_policy = self.fetcher.cache_policy
+        self.resilience = self.fetcher.resilience
+        self.rate_limiter = self.fetcher.rate_limiter
+        self.max_concurrency = max(1, max_concurrency)
+        self.refresh_timeout = refresh_timeout
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+
+    async def _coalesce(self, key: str, fetch: Callable[[], Awaitable[Any]], force: bool = False) -> Any:
+        """
+        Run fetch for a key once, however many coroutines and processes need it at the same time.
+
+        The asyncio counterpart of CacheManager.coalesce, sharing its leases.
+        The fetch runs in a task of its own that every caller awaits, so a
+        cancelled caller does not cancel it for the others. It is cancelled
+        only once no caller is waiting for it any more.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._fetch_with_lease(key, fetch, force))
+            task.add_done_callback(lambda _: self._forget_fetch(key, task))
+        else:
+            metrics.inc('cache_coalesced_total', scope='task')
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Every caller was cancelled, nobody needs the result any more
+                    self._forget_fetch(key, task)
+                    task.cancel()
+
+    def _forget_fetch(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _fetch_with_lease(self, key: str, fetch: Callable[[], Awaitable[Any]], force: bool) -> Any:
+        delay = 0.05
+        while True:
+            token = await self._acquire_lease(key)
+            if token is not None:
+                try:
+                    # The previous holder may have stored the key just before we took over
+                    entry = None if force else await asyncio.to_thread(self.cache.get_fresh_disk_entry, key)
+                    return entry.value if entry is not None else await fetch()
+                finally:
+                    # Shielded so that a cancelled fetch still gives up its lease
+                    await asyncio.shield(asyncio.to_thread(self.cache.release_lease, key, token))
+
+            # Another process is fetching the key, wait for it to store it
+            while await asyncio.to_thread(self.cache.is_leased, key):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+            entry = await asyncio.to_thread(self.cache.get_fresh_disk_entry, key)
+            if entry is not None:
+                metrics.inc('cache_coalesced_total', scope='process')
+                return entry.value
+
+    async def _acquire_lease(self, key: str) -> Optional[str]:
+        """Try to take the lease of a key in a worker thread, as CacheManager.acquire_lease."""
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.cache.acquire_lease, key))
+        try:
+            return await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The thread may still take the lease, which nobody would then release or stop renewing
+            loop = asyncio.get_running_loop()
+
+            def release(future: asyncio.Future) -> None:
+                if not future.cancelled() and future.exception() is None and future.result() is not None:
+                    loop.run_in_executor(None, self.cache.release_lease, key, future.result())
+
+            acquiring.add_done_callback(release)
+            raise
+
+    def _refresh_in_loop(self, fetch: Callable[[], Awaitable[Any]]) -> Callable[[], Any]:
+        """
+        Wrap a fetch coroutine so the cache's background refresh threads can run it in this event loop.
+
+        The refresh is skipped once the loop has been closed, and given up after
+        refresh_timeout seconds if the loop has stopped running, so waiting for
+        the cache's refreshes never hangs on a loop that is gone.
+        """
+        loop = asyncio.get_running_loop()
+
+        def refresh() -> Any:
+            if loop.is_closed():
+                logger.debug("Skipping refresh, the event loop is closed")
+                return None
+            coroutine = fetch()
+            try:
+                future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+            except RuntimeError:
+                # The loop was closed in the meantime
+                coroutine.close()
+                return None
+            try:
+                return future.result(timeout=self.refresh_timeout)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                raise TimeoutError(f"refresh not run by the event loop within {self.refresh_timeout} seconds")
+
+        return refresh
+
+    async def _get_tournaments(self, age_group_id: int, year: int, tournament_type: int = None,
+                               offline: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """Get the tournaments of one year, from cache if possible."""
+        cache_key, raw_key = self.fetcher._tournaments_keys(age_group_id, year, tournament_type)
+        entry = await asyncio.to_thread(self.cache.get_entry, cache_key)
+        if entry is not None and entry.is_fresh():
+            return entry.value
+
+        if offline:
+            return await asyncio.to_thread(self.fetcher._rebuild_tournaments, cache_key, raw_key)
+
+        def fetch():
+            return self._coalesce(cache_key, lambda: self._fetch_tournaments(
+                cache_key, raw_key, entry, age_group_id, year, tournament_type))
+
+        if entry is not None and self.cache.is_servable_stale(entry):
+            # Serve the stale list and revalidate it in the background
+            self.cache.refresh_in_background(cache_key, self._refresh_in_loop(fetch))
+            return entry.value
+
+        return await fetch()
+
+    async def _fetch_tournaments(self, cache_key: str, raw_key: str, entry: Optional[CacheEntry], age_group_id: int,
+                                 year: int, tournament_type: int = None) -> Optional[List[Dict[str, Any]]]:
+        """Fetch, or revalidate the cached page of, the tournaments of one year and cache them."""
+        raw_entry = await asyncio.to_thread(self.cache.get_entry, raw_key)
+        try:
+            content, validators = await self.web_scraper.fetch_tournaments_page(
+                age_group_id, year=year, tournament_type=tournament_type,
+                validators=raw_entry.validators if raw_entry is not None else None,
+            )
+        except ASYNC_FETCH_ERRORS as e:
+            logger.error("Error fetching tournaments for %s: %s", year, e)
+            return None
+        return await asyncio.to_thread(self.fetcher._store_tournaments, cache_key, raw_key, entry, raw_entry,
+                                       year, content, validators)
+
+    async def _get_tournament_matches(self, job: Tuple[int, Dict[str, Any]],
+                                      offline: bool = False) -> Optional[List[Match]]:
+        """Get the matches of one (year, tournament) job, from cache if possible."""
+        year, tournament = job
+        cache_key, raw_key = self.fetcher._matches_keys(int(tournament['tournament_id']))
+
+        if offline:
+            entry = await asyncio.to_thread(self.cache.get_entry, cache_key)
+            if entry is not None and entry.is_fresh():
+                return entry.value
+            return await asyncio.to_thread(self.fetcher._rebuild_tournament_matches, cache_key, raw_key,
+                                           tournament, fresh_only=False)
+
+        def fetch():
+            return self._coalesce(cache_key, lambda: self._fetch_tournament_matches(cache_key, raw_key, year, tournament))
+
+        matches = await asyncio.to_thread(self.cache.get, cache_key, refresh=self._refresh_in_loop(fetch))
+        if matches is not None:
+            return matches
+
+        matches = await asyncio.to_thread(self.fetcher._rebuild_tournament_matches, cache_key, raw_key,
+                                          tournament, fresh_only=True)
+        if matches is not None:
+            return matches
+        return await fetch()
+
+    async def _fetch_tournament_matches(self, cache_key: str, raw_key: str, year: int,
+                                        tournament: Dict[str, Any]) -> Optional[List[Match]]:
+        """Fetch the matches of one tournament from the API and cache both the payload and the matches."""
+        tournament_id = int(tournament['tournament_id'])
+        try:
+            # Decoded while the response downloads, keeping the payload to cache
+            raw_matches, content = await self.soap_client.get_tournament_matches_with_raw(tournament_id)
+        except ASYNC_FETCH_ERRORS as e:
+            logger.error("Error fetching matches for tournament %s: %s", tournament_id, e)
+            return None
+        return await asyncio.to_thread(self.fetcher._store_tournament_matches, cache_key, raw_key, year,
+                                       tournament, content, raw_matches)
+
+    async def get_tournaments(self, age_group_id: int, year: int,
+                              tournament_type: int = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the tournaments of one year, from cache if possible.
+
+        Returns:
+            List of tournaments (empty if the year has none), or None if the fetch failed
+        """
+        return await self._get_tournaments(age_group_id, year, tournament_type)
+
+    async def get_tournament_matches(self, year: int, tournament: Dict[str, Any]) -> Optional[List[Match]]:
+        """
+        Get the matches of one tournament, from cache if possible.
+
+        Returns:
+            List of matches (empty if the tournament has none), or None if the fetch failed
+        """
+        return await self._get_tournament_matches((year, tournament))
+
+    async def refresh_tournaments(self, age_group_id: int, year: int,
+                                  tournament_type: int = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Fetch, or revalidate, the tournaments of one year even if they are cached and fresh.
+
+        Returns:
+            List of tournaments (empty if the year has none), or None if the fetch failed
+        """
+        cache_key, raw_key = self.fetcher._tournaments_keys(age_group_id, year, tournament_type)
+        entry = await asyncio.to_thread(self.cache.get_entry, cache_key)
+        return await self._coalesce(cache_key, lambda: self._fetch_tournaments(
+            cache_key, raw_key, entry, age_group_id, year, tournament_type), force=True)
+
+    async def refresh_tournament_matches(self, year: int, tournament: Dict[str, Any]) -> Optional[List[Match]]:
+        """
+        Fetch the matches of a tournament even if they are cached and fresh.
+
+        Returns:
+            List of matches (empty if the tournament has none), or None if the fetch failed
+        """
+        cache_key, raw_key = self.fetcher._matches_keys(int(tournament['tournament_id']))
+        return await self._coalesce(
+            cache_key, lambda: self._fetch_tournament_matches(cache_key, raw_key, year, tournament), force=True)
+
+    async def tournaments_entry(self, age_group_id: int, year: int,
+                                tournament_type: int = None) -> Optional[CacheEntry]:
+        """Get the cache entry of the tournaments of one year, even if it has expired."""
+        return await asyncio.to_thread(self.fetcher.tournaments_entry, age_group_id, year, tournament_type)
+
+    async def matches_entry(self, tournament_id: int) -> Optional[CacheEntry]:
+        """Get the cache entry of the matches of a tournament, even if it has expired."""
+        return await asyncio.to_thread(self.fetcher.matches_entry, tournament_id)
+
+    async def get_year_matches(self, age_group_id: int, year: int, tournament_type: int = None
+                               ) -> Tuple[Optional[List[Dict[str, Any]]], List[Optional[List[Match]]]]:
+        """
+        Get the tournaments of one year and the matches of each of them, from cache if possible.
+
+        Returns:
+            The same as MatchFetcher.get_year_matches
+        """
+        tournaments = await self._get_tournaments(age_group_id, year, tournament_type)
+        if not tournaments:
+            return tournaments, []
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(tournament: Dict[str, Any]) -> Optional[List[Match]]:
+            async with semaphore:
+                return await self._get_tournament_matches((year, tournament))
+
+        return tournaments, list(await asyncio.gather(*(bounded(tournament) for tournament in tournaments)))
+
+    async def get_matches_for_years(self, age_group_id: int, start_year: int, end_year: int,
+                                    tournament_type: int = None, offline: bool = False) -> Dict[str, Any]:
+        """
+        Fetch all matches for a given age group between specified years.
+
+        Takes the same arguments and returns the same result as
+        MatchFetcher.get_matches_for_years. Cancelling the call cancels every
+        fetch still running.
+        """
+        failures = []
+        years = list(range(end_year, start_year - 1, -1))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(fetch: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+            async with semaphore:
+                return await fetch(*args, **kwargs)
+
+        logger.info("Fetching tournaments for %d years...", len(years))
+        year_tournaments = await asyncio.gather(*(
+            bounded(self._get_tournaments, age_group_id, year, tournament_type, offline=offline)
+            for year in years
+        ))
+        tournaments_by_year = MatchFetcher._collect_tournaments(years, year_tournaments, failures)
+
+        # Fetch the matches of every tournament of every year in one batch
+        jobs = MatchFetcher._match_jobs(years, tournaments_by_year)
+        tournament_matches = await asyncio.gather(*(
+            bounded(self._get_tournament_matches, job, offline=offline) for job in jobs
+        ))
+        return MatchFetcher._build_result(years, tournaments_by_year, jobs, tournament_matches, failures)
+
+    async def iter_matches(self, age_group_id: int, start_year: int, end_year: int, tournament_type: int = None,
+                           offline: bool = False, failures: Optional[List[Dict[str, Any]]] = None
+                           ) -> AsyncIterator[Tuple[int, Dict[str, Any], List[Match]]]:
+        """
+        Stream the matches of an age group between specified years, one tournament at a time.
+
+        The async generator counterpart of MatchFetcher.iter_matches. Up to
+        max_concurrency tournaments are fetched at once, in order: the next one
+        is started as each is yielded, so fetches run ahead of the consumer by
+        at most max_concurrency tournaments. Closing the generator early
+        cancels the fetches still running.
+        """
+        failures = failures if failures is not None else []
+        years = list(range(end_year, start_year - 1, -1))
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(fetch: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+            async with semaphore:
+                return await fetch(*args, **kwargs)
+
+        year_tournaments = await asyncio.gather(*(
+            bounded(self._get_tournaments, age_group_id, year, tournament_type, offline=offline)
+            for year in years
+        ))
+        jobs = iter(MatchFetcher._match_jobs(years, MatchFetcher._collect_tournaments(years, year_tournaments, failures)))
+        window = deque(
+            (job, asyncio.ensure_future(self._get_tournament_matches(job, offline=offline)))
+            for job in islice(jobs, self.max_concurrency)
+        )
+        try:
+            while window:
+                (year, tournament), task = window.popleft()
+                matches = await task
+                for job in islice(jobs, 1):
+                    window.append((job, asyncio.ensure_future(self._get_tournament_matches(job, offline=offline))))
+                if matches is None:
+                    failures.append(MatchFetcher._match_failure(year, tournament))
+                else:
+                    yield year, tournament, matches
+        finally:
+            for _, task in window:
+                task.cancel()
+
+    async def wait_for_refreshes(self) -> None:
+        """Wait until all background refreshes of stale entries have finished, without blocking the loop."""
+        await asyncio.get_running_loop().run_in_executor(None, self.cache.wait_for_refreshes)
+
+    assemble_result = staticmethod(MatchFetcher.assemble_result)
+
+    def filter_team_matches(self, matches: List[Match], team_id: Union[int, str]) -> List[Match]:
+        """Filter matches to only include those involving a specific team, as MatchFetcher.filter_team_matches."""
+        return self.fetcher.filter_team_matches(matches, team_id)
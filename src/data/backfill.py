@@ -0,0 +1,147 @@
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.api.http_transport import HttpTransport
+from src.api.ksi_client import KSIClient, SOAP_URL
+from src.api.resilience import AdaptiveRateLimiter, RequestBudget, Resilience, RetryPolicy
+from src.api.web_scraper import KSIWebScraper, TOURNAMENTS_URL
+from src.const import AgeGroup, TournamentType
+from src.data.match import Match
+from src.data.match_fetcher import MatchFetcher
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BackfillUnit:
+    """One season of one age group and tournament type, the unit of work handed to a process."""
+    age_group_id: int
+    tournament_type: int
+    year: int
+
+
+@dataclass(frozen=True)
+class BackfillConfig:
+    """Everything a worker process needs to build its own fetcher."""
+    cache_dir: str = "cache"
+    requests_per_second: float = 2.0
+    max_requests_per_second: Optional[float] = None
+    latency_target: Optional[float] = 2.0
+    max_attempts: int = 4
+    workers: int = 1
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    soap_url: str = SOAP_URL
+    tournaments_url: str = TOURNAMENTS_URL
+    budget_dir: Optional[str] = None
+    request_budget: Optional[int] = None
+
+
+def plan_units(age_group_ids: Iterable[int], tournament_types: Iterable[int],
+               start_year: int, end_year: int) -> List[BackfillUnit]:
+    """Every (age group, tournament type, year) to backfill, newest year first."""
+    return [
+        BackfillUnit(age_group_id, tournament_type, year)
+        for year in range(end_year, start_year - 1, -1)
+        for age_group_id in age_group_ids
+        for tournament_type in tournament_types
+    ]
+
+
+# The fetcher of a worker process, created once by _init_worker
+_fetcher: Optional[MatchFetcher] = None
+
+
+def _init_worker(config: BackfillConfig) -> None:
+    """Build the transport, clients and fetcher of a worker process."""
+    global _fetcher
+    budget = RequestBudget(config.budget_dir, config.request_budget) if config.request_budget is not None else None
+    resilience = Resilience(AdaptiveRateLimiter(config.requests_per_second, max_rate=config.max_requests_per_second,
+                                                latency_target=config.latency_target),
+                            RetryPolicy(max_attempts=max(1, config.max_attempts)), budget=budget)
+    transport = HttpTransport(pool_maxsize=max(config.workers, 10), connect_timeout=config.connect_timeout,
+                              read_timeout=config.read_timeout, resilience=resilience)
+    _fetcher = MatchFetcher(KSIClient(transport, base_url=config.soap_url),
+                            KSIWebScraper(transport, base_url=config.tournaments_url),
+                            max_workers=config.workers, cache_dir=config.cache_dir)
+
+
+def _backfill_unit(unit: BackfillUnit) -> Tuple[Optional[List[Dict[str, Any]]], List[Optional[List[Match]]]]:
+    """
+    Fetch one unit in a worker process.
+
+    Returns:
+        The unit's tournaments (None if the list could not be fetched) and the
+        matches of each of them (None for those that could not be fetched)
+    """
+    return _fetcher.get_year_matches(unit.age_group_id, unit.year, unit.tournament_type)
+
+
+def backfill(units: List[BackfillUnit], processes: int = 4, config: BackfillConfig = BackfillConfig()
+             ) -> Dict[Tuple[int, int], Dict[str, Any]]:
+    """
+    Fetch many seasons at once, sharding the units across a pool of processes.
+
+    Each process has its own fetcher and connection pool, and all of them share
+    the disk cache, so units already cached cost no requests and a tournament
+    wanted by two processes is fetched once. config.requests_per_second and
+    config.max_requests_per_second are rates of all processes together, and at
+    most config.request_budget requests, retries included, are sent in total.
+    Units that fail, or fail to run at all, are reported as failures instead
+    of aborting the backfill.
+
+    Args:
+        units: Units to fetch, as planned by plan_units
+        processes: Number of worker processes
+        config: Fetcher settings of the workers
+
+    Returns:
+        Dictionary mapping (age group ID, tournament type) to a result in the
+        format of MatchFetcher.get_matches_for_years, covering the years of its units
+    """
+    processes = max(1, min(processes, len(units) or 1))
+    with tempfile.TemporaryDirectory(prefix='ksi-budget-') as budget_dir:
+        max_rate = config.max_requests_per_second
+        worker_config = replace(config, requests_per_second=config.requests_per_second / processes,
+                                max_requests_per_second=max_rate / processes if max_rate is not None else None,
+                                budget_dir=config.budget_dir or budget_dir)
+        outcomes: Dict[BackfillUnit, Tuple[Optional[List[Dict[str, Any]]], List[Optional[List[Match]]]]] = {}
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(worker_config,)) as pool:
+            futures = {pool.submit(_backfill_unit, unit): unit for unit in units}
+            for done, future in enumerate(as_completed(futures), 1):
+                unit = futures[future]
+                try:
+                    outcomes[unit] = future.result()
+                except Exception as e:
+                    logger.error("Error backfilling %s: %s", unit, e)
+                    outcomes[unit] = (None, [])
+                metrics.inc('backfill_units_total', status='failed' if outcomes[unit][0] is None else 'ok')
+                logger.info("Backfilled %d/%d: %s, %s, %d", done, len(units), AgeGroup.get_name(unit.age_group_id),
+                            TournamentType.get_name(unit.tournament_type), unit.year)
+        if config.request_budget is not None:
+            budget = RequestBudget(worker_config.budget_dir, config.request_budget)
+            logger.info("Used %d of %d requests", min(budget.used, budget.limit), budget.limit)
+            budget.close()
+    return _merge(units, outcomes)
+
+
+def _merge(units: List[BackfillUnit], outcomes: Dict[BackfillUnit, Tuple]) -> Dict[Tuple[int, int], Dict[str, Any]]:
+    """Assemble the outcomes of the units into one result per age group and tournament type."""
+    years_by_group: Dict[Tuple[int, int], List[int]] = {}
+    for unit in units:
+        years_by_group.setdefault((unit.age_group_id, unit.tournament_type), []).append(unit.year)
+
+    results = {}
+    for (age_group_id, tournament_type), years in years_by_group.items():
+        years = sorted(set(years), reverse=True)
+        group_outcomes = [outcomes[BackfillUnit(age_group_id, tournament_type, year)] for year in years]
+        # Units are ordered by year like the result, and each unit's matches by tournament
+        results[(age_group_id, tournament_type)] = MatchFetcher.assemble_result(
+            years, [tournaments for tournaments, _ in group_outcomes],
+            [matches for _, unit_matches in group_outcomes for matches in unit_matches])
+    return results
@@ -1,51 +1,532 @@
 from diskcache import Cache
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import os
 import json
-from typing import Any, Optional
+import logging
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.data.serializers import CompactSerializer, is_serialized
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Time to live of entries that never expire
+PERMANENT = float('inf')
+
+# Prefix of the keys of leases taken by processes fetching a key
+LEASE_PREFIX = "lease:"
+
+
+@dataclass
+class CacheEntry:
+    """A cached value with its expiry time and the HTTP validators it was fetched with."""
+    value: Any
+    expires_at: Optional[float] = None  # Unix time, None if the entry never expires
+    validators: Dict[str, str] = field(default_factory=dict)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        """Check if the entry has not expired yet."""
+        if self.expires_at is None:
+            return True
+        return (now if now is not None else time.time()) < self.expires_at
+
+
+def estimate_size(value: Any, depth: int = 2, sample: int = 8) -> int:
+    """
+    Estimate the memory used by a cached value in bytes.
+
+    Containers are measured from a sample of their items, which is exact
+    enough for the homogeneous lists of matches and tournaments we cache.
+    """
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        if value:
+            sampled = list(value.items())[:sample]
+            per_item = sum(estimate_size(k, depth - 1) + estimate_size(v, depth - 1) for k, v in sampled)
+            size += int(per_item / len(sampled) * len(value))
+    elif isinstance(value, (list, tuple)):
+        if value:
+            sampled = value[:sample]
+            per_item = sum(estimate_size(item, depth - 1) for item in sampled)
+            size += int(per_item / len(sampled) * len(value))
+    elif hasattr(value, '__slots__'):
+        size += sum(sys.getsizeof(getattr(value, name, None)) for name in value.__slots__)
+    return size
+
+
+class MemoryCache:
+    """Thread-safe in-memory LRU cache bounded by entry count and estimated size."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the memory cache.
+
+        Args:
+            max_entries: Maximum number of entries kept
+            max_bytes: Maximum estimated size of all entries in bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[str, Tuple[CacheEntry, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        entry_size = estimate_size(entry.value)
+        with self._lock:
+            self._remove(key)
+            if self.max_entries <= 0 or entry_size > self.max_bytes:
+                return
+            self._entries[key] = (entry, entry_size)
+            self.size += entry_size
+            # Evict least recently used entries until both bounds are met
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def _remove(self, key: str) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
 
 class CacheManager:
     """Manages caching of API responses and web scraping results."""
     
-    def __init__(self, cache_dir: str = "cache", ttl_days: int = 1):
+    def __init__(self, cache_dir: str = "cache", ttl_days: int = 1, retention_days: int = 30,
+                 stale_while_revalidate: float = 0, refresh_workers: int = 2,
+                 memory_max_entries: int = 256, memory_max_mb: float = 64, serializer: Any = None,
+                 lease_seconds: float = 120):
         """
         Initialize the cache manager.
         
         Args:
             cache_dir: Directory to store cache files
             ttl_days: Number of days before cache entries expire
+            retention_days: Number of days expired entries are kept for revalidation
+            stale_while_revalidate: Seconds after expiry during which an entry is still
+                served while it is refreshed in the background (0 disables this)
+            refresh_workers: Number of background threads refreshing stale entries
+            memory_max_entries: Maximum number of entries kept in memory in front of
+                the disk cache (0 disables the memory tier)
+            memory_max_mb: Maximum estimated size of the entries kept in memory
+            serializer: Object with dumps/loads used to store values on disk
+                (default: CompactSerializer)
+            lease_seconds: Seconds after which the lease of a process fetching a key
+                expires, in case the process died without releasing it. Leases are
+                renewed every third of this while their fetch is still running.
         """
         self.cache = Cache(cache_dir)
+        self.serializer = serializer or CompactSerializer()
+        self.memory = MemoryCache(memory_max_entries, int(memory_max_mb * 1024 * 1024))
+        self._stats = {'memory_hits': 0, 'memory_misses': 0, 'disk_hits': 0, 'disk_misses': 0}
+        self._stats_lock = threading.Lock()
         self.ttl = ttl_days * 24 * 60 * 60  # Convert days to seconds
+        self.retention = retention_days * 24 * 60 * 60
+        self.stale_while_revalidate = stale_while_revalidate
+        self.refresh_workers = refresh_workers
+        self._refresh_executor: Optional[ThreadPoolExecutor] = None
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self.lease_seconds = lease_seconds
+        self._held_leases: Dict[str, str] = {}
+        self._lease_lock = threading.Lock()
+        self._lease_keeper: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """
+        Get a cache entry, even if it has expired.
+
+        Expired entries are kept for retention_days so their value and
+        validators can be used to revalidate them.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cache entry if found, None otherwise
+        """
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count('memory_hits')
+            return entry
+        self._count('memory_misses')
+
+        start = time.perf_counter()
+        try:
+            entry = self.cache.get(key)
+        except Exception as e:
+            logger.error("Error reading from cache: %s", e)
+            return None
+        if entry is None:
+            self._count('disk_misses')
+            return None
+        self._count('disk_hits')
+
+        entry = self._decode_entry(entry)
+        metrics.observe('cache_read_seconds', time.perf_counter() - start, tier='disk')
+        if entry is None:
+            return None
+        self.memory.set(key, entry)
+        return entry
+
+    def get_fresh_disk_entry(self, key: str) -> Optional[CacheEntry]:
+        """Get a fresh entry from the disk tier, which other processes write to, updating the memory tier."""
+        try:
+            stored = self.cache.get(key)
+        except Exception as e:
+            logger.error("Error reading from cache: %s", e)
+            return None
+        entry = self._decode_entry(stored) if stored is not None else None
+        if entry is None or not entry.is_fresh():
+            return None
+        self.memory.set(key, entry)
+        return entry
+
+    def _decode_entry(self, stored: Any) -> Optional[CacheEntry]:
+        """Turn an entry read from disk into a CacheEntry with a deserialized value."""
+        if not isinstance(stored, CacheEntry):
+            # Value written by an earlier version, expired by diskcache itself
+            return CacheEntry(stored)
+        if not is_serialized(stored.value):
+            return stored
+        try:
+            value = self.serializer.loads(stored.value)
+        except Exception as e:
+            logger.error("Error deserializing cache entry: %s", e)
+            return None
+        return CacheEntry(value, stored.expires_at, stored.validators)
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            self._stats[counter] += 1
+        tier = counter.split('_')[0]
+        metrics.inc('cache_lookups_total', tier=tier, result='hit' if counter.endswith('hits') else 'miss')
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get hit and miss counters of the memory and disk tiers.
+
+        Returns:
+            Dictionary with memory_hits, memory_misses, disk_hits, disk_misses,
+            memory_entries and memory_bytes (estimated)
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['memory_entries'] = len(self.memory)
+        stats['memory_bytes'] = self.memory.size
+        return stats
     
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: str, refresh: Optional[Callable[[], Any]] = None) -> Optional[Any]:
         """
         Get a value from cache.
         
         Args:
             key: Cache key
+            refresh: Function fetching and storing a new value for the key. If given
+                and the entry expired less than stale_while_revalidate seconds ago,
+                the stale value is returned and refresh runs in the background.
             
         Returns:
-            Cached value if found and not expired, None otherwise
+            Cached value if found and not expired (or servable stale), None otherwise
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        if entry.is_fresh():
+            return entry.value
+        if refresh is not None and self.is_servable_stale(entry):
+            self.refresh_in_background(key, refresh)
+            return entry.value
+        return None
+
+    def is_servable_stale(self, entry: CacheEntry) -> bool:
+        """Check if an expired entry is within the stale-while-revalidate window."""
+        if self.stale_while_revalidate <= 0 or entry.expires_at is None:
+            return False
+        return time.time() < entry.expires_at + self.stale_while_revalidate
+
+    def refresh_in_background(self, key: str, refresh: Callable[[], Any]) -> bool:
+        """
+        Run refresh for a key in a background thread, unless it is already being refreshed.
+
+        Args:
+            key: Cache key being refreshed
+            refresh: Function fetching and storing a new value for the key
+
+        Returns:
+            True if a refresh was started, False if one was already running
         """
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=self.refresh_workers, thread_name_prefix='cache-refresh')
+        self._refresh_executor.submit(self._run_refresh, key, refresh)
+        return True
+
+    def _run_refresh(self, key: str, refresh: Callable[[], Any]) -> None:
         try:
-            return self.cache.get(key)
+            refresh()
         except Exception as e:
-            print(f"Error reading from cache: {str(e)}")
-            return None
+            logger.error("Error refreshing cache entry %s: %s", key, e)
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    def wait_for_refreshes(self) -> None:
+        """Block until all background refreshes have finished."""
+        with self._refresh_lock:
+            executor, self._refresh_executor = self._refresh_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
     
-    def set(self, key: str, value: Any) -> None:
+    def acquire_lease(self, key: str) -> Optional[str]:
+        """
+        Take the lease on fetching a key, shared by all processes using the cache directory.
+
+        The lease is renewed in the background until it is released, so it only
+        expires if this process dies, however long the fetch takes.
+
+        Returns:
+            Token to release the lease with, or None if another fetch holds it
+        """
+        token = f"{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}"
+        try:
+            if not self.cache.add(LEASE_PREFIX + key, token, expire=self.lease_seconds):
+                return None
+        except Exception as e:
+            # Fetching twice is better than not fetching at all
+            logger.error("Error taking cache lease: %s", e)
+            return token
+        with self._lease_lock:
+            self._held_leases[key] = token
+            if self._lease_keeper is None:
+                self._lease_keeper = threading.Thread(target=self._keep_leases, name='cache-lease-keeper',
+                                                      daemon=True)
+                self._lease_keeper.start()
+        return token
+
+    def release_lease(self, key: str, token: str) -> None:
+        """Release a lease taken with acquire_lease, unless it expired and was taken by someone else."""
+        with self._lease_lock:
+            if self._held_leases.get(key) == token:
+                del self._held_leases[key]
+        try:
+            with self.cache.transact():
+                if self.cache.get(LEASE_PREFIX + key) == token:
+                    self.cache.delete(LEASE_PREFIX + key)
+        except Exception as e:
+            logger.error("Error releasing cache lease: %s", e)
+
+    def renew_lease(self, key: str, token: str) -> bool:
+        """
+        Extend a lease taken with acquire_lease by lease_seconds from now.
+
+        Returns:
+            False if the lease expired and was taken by someone else in the meantime
+        """
+        try:
+            with self.cache.transact():
+                if self.cache.get(LEASE_PREFIX + key) != token:
+                    return False
+                self.cache.touch(LEASE_PREFIX + key, expire=self.lease_seconds)
+                return True
+        except Exception as e:
+            logger.error("Error renewing cache lease: %s", e)
+            return True
+
+    def _keep_leases(self) -> None:
+        """Renew the leases held by this process until the manager is closed."""
+        while not self._closed.wait(self.lease_seconds / 3):
+            with self._lease_lock:
+                held = list(self._held_leases.items())
+            for key, token in held:
+                if not self.renew_lease(key, token):
+                    logger.warning("Lease on %s expired while it was being fetched", key)
+                    with self._lease_lock:
+                        if self._held_leases.get(key) == token:
+                            del self._held_leases[key]
+
+    def is_leased(self, key: str) -> bool:
+        """Check if some process holds the lease on fetching a key."""
+        try:
+            return LEASE_PREFIX + key in self.cache
+        except Exception:
+            return False
+
+    def coalesce(self, key: str, fetch: Callable[[], Any], force: bool = False) -> Any:
+        """
+        Run fetch for a key once, however many threads and processes need it at the same time.
+
+        Threads of this process asking for a key that is already being fetched
+        wait for that fetch and share its result. Processes sharing the cache
+        directory take turns through a lease: while another process fetches
+        the key, this one waits and uses the fresh entry it stored, and only
+        fetches itself if that process failed.
+
+        Args:
+            key: Cache key fetch stores its value under
+            fetch: Function fetching and storing the value of the key
+            force: Fetch even if a fresh entry is already stored when the lease is
+                taken. A fetch of another process that was waited for is still used.
+
+        Returns:
+            The result of fetch, or the value another process stored
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            metrics.inc('cache_coalesced_total', scope='thread')
+            return future.result()
+
+        try:
+            result = self._fetch_with_lease(key, fetch, force)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _fetch_with_lease(self, key: str, fetch: Callable[[], Any], force: bool) -> Any:
+        delay = 0.05
+        while True:
+            token = self.acquire_lease(key)
+            if token is not None:
+                try:
+                    # The previous holder may have stored the key just before we took over
+                    entry = None if force else self.get_fresh_disk_entry(key)
+                    return entry.value if entry is not None else fetch()
+                finally:
+                    self.release_lease(key, token)
+
+            # Another process is fetching the key, wait for it to store it
+            while self.is_leased(key):
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+            entry = self.get_fresh_disk_entry(key)
+            if entry is not None:
+                metrics.inc('cache_coalesced_total', scope='process')
+                return entry.value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None,
+            validators: Optional[Dict[str, str]] = None) -> None:
         """
         Store a value in cache.
         
         Args:
             key: Cache key
             value: Value to cache
+            ttl: Seconds until the entry expires, PERMANENT to never expire
+                (default: the manager's ttl)
+            validators: HTTP validators (ETag, Last-Modified, content hash) of the value
         """
+        if ttl is None:
+            ttl = self.ttl
+        if ttl == PERMANENT:
+            entry = CacheEntry(value, None, validators or {})
+            expire = None
+        else:
+            entry = CacheEntry(value, time.time() + ttl, validators or {})
+            expire = ttl + self.retention
+        # Write through to both tiers
+        self.memory.set(key, entry)
         try:
-            self.cache.set(key, value, expire=self.ttl)
+            with metrics.timer('cache_write_seconds'):
+                data = self.serializer.dumps(value)
+                self.cache.set(key, CacheEntry(data, entry.expires_at, entry.validators), expire=expire)
+            metrics.inc('cache_write_bytes_total', len(data))
         except Exception as e:
-            print(f"Error writing to cache: {str(e)}")
+            logger.error("Error writing to cache: %s", e)
+
+    def migrate(self, serializer: Any = None) -> Dict[str, int]:
+        """
+        Rewrite every entry on disk with a serializer, keeping its expiry and validators.
+
+        Entries written by earlier versions, before values were wrapped in
+        CacheEntry or serialized, are converted as well.
+
+        Args:
+            serializer: Serializer to rewrite entries with (default: this manager's)
+
+        Returns:
+            Dictionary with the number of entries migrated and failed, and the
+            total size of the rewritten values in bytes before and after
+        """
+        if serializer is not None:
+            self.serializer = serializer
+        result = {'migrated': 0, 'failed': 0, 'bytes_before': 0, 'bytes_after': 0}
+        now = time.time()
+
+        for key in list(self.cache.iterkeys()):
+            if isinstance(key, str) and key.startswith(LEASE_PREFIX):
+                continue
+            try:
+                stored, expire_time = self.cache.get(key, expire_time=True)
+            except Exception as e:
+                logger.error("Error reading cache entry %s: %s", key, e)
+                result['failed'] += 1
+                continue
+            if stored is None:
+                continue
+
+            entry = self._decode_entry(stored)
+            if entry is None:
+                result['failed'] += 1
+                continue
+            if not isinstance(stored, CacheEntry) and expire_time is not None:
+                # Earlier versions relied on diskcache's expiry, which becomes the entry's own
+                entry.expires_at = expire_time
+                expire_time = expire_time + self.retention
+
+            data = self.serializer.dumps(entry.value)
+            before = stored.value if isinstance(stored, CacheEntry) else stored
+            result['bytes_before'] += len(before) if isinstance(before, bytes) else len(pickle.dumps(before))
+            result['bytes_after'] += len(data)
+
+            expire = None if expire_time is None else max(expire_time - now, 0)
+            self.cache.set(key, CacheEntry(data, entry.expires_at, entry.validators), expire=expire)
+            result['migrated'] += 1
+
+        self.memory.clear()
+        return result
     
     def build_key(self, *args: Any, **kwargs: Any) -> str:
         """
@@ -66,14 +547,23 @@ class CacheManager:
     
     def clear(self) -> None:
         """Clear all cached data."""
+        self.memory.clear()
         self.cache.clear()
     
     def clear_expired(self) -> None:
-        """Remove expired entries from cache."""
+        """Remove entries that expired more than retention_days ago."""
         self.cache.expire()
     
+    def close(self) -> None:
+        """Wait for background refreshes to finish and close the disk cache."""
+        self.wait_for_refreshes()
+        self._closed.set()
+        if self._lease_keeper is not None:
+            self._lease_keeper.join()
+        self.cache.close()
+
     def __enter__(self):
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.cache.close() 
\ No newline at end of file
+        self.close() 
\ No newline at end of file
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from src.const import TournamentStatus
+from src.data.cache_manager import PERMANENT
+from src.data.match import Match
+
+
+class CachePolicy:
+    """
+    Chooses how long cached tournament data stays valid.
+
+    Finished tournaments whose matches all have results, and every tournament
+    of a past season, cannot change any more and are cached permanently.
+    Tournaments in progress are refreshed on a short interval and anything in
+    between falls back to the default time to live. Empty results are cached
+    for negative_ttl, so lookups that found nothing are retried now and then
+    instead of on every run.
+    """
+
+    def __init__(self, default_ttl: float, live_ttl: float = 60 * 60, negative_ttl: float = 6 * 60 * 60,
+                 now: Callable[[], datetime] = datetime.now):
+        """
+        Initialize the cache policy.
+
+        Args:
+            default_ttl: Seconds before entries that may still change expire
+            live_ttl: Seconds before entries of tournaments in progress expire
+            negative_ttl: Seconds before cached empty results expire
+            now: Function returning the current time
+        """
+        self.default_ttl = default_ttl
+        self.live_ttl = live_ttl
+        self.negative_ttl = negative_ttl
+        self.now = now
+
+    def _is_past_season(self, year: int) -> bool:
+        return year < self.now().year
+
+    def _is_finished(self, tournament: Dict[str, Any], year: int) -> bool:
+        return TournamentStatus.is_finished(tournament.get('status')) or self._is_past_season(year)
+
+    def tournaments_ttl(self, tournaments: List[Dict[str, Any]], year: int) -> float:
+        """
+        Time to live of a year's tournament list.
+
+        Args:
+            tournaments: Tournaments scraped for the year
+            year: Season of the tournaments
+
+        Returns:
+            Seconds until the entry expires, or PERMANENT
+        """
+        # No tournaments are added to or removed from a season that is over
+        if self._is_past_season(year):
+            return PERMANENT
+        return self.default_ttl
+
+    def matches_ttl(self, tournament: Dict[str, Any], matches: List[Match], year: int) -> float:
+        """
+        Time to live of a tournament's matches.
+
+        Args:
+            tournament: Tournament the matches belong to
+            matches: Matches of the tournament
+            year: Season of the tournament
+
+        Returns:
+            Seconds until the entry expires, or PERMANENT
+        """
+        if self._is_past_season(year):
+            # Matches of a past season still unplayed were cancelled and will never get a result
+            return PERMANENT
+        if self._is_finished(tournament, year):
+            if all(match.is_played for match in matches):
+                return PERMANENT
+            # Results of the last matches may still be entered after the tournament ends
+            return self.default_ttl
+        return self.live_ttl
+
+    def next_change(self, tournament: Dict[str, Any], matches: List[Match], year: int,
+                    result_delay: timedelta = timedelta(hours=2)) -> Optional[datetime]:
+        """
+        When a tournament's matches are next expected to change.
+
+        That is when the result of its earliest unplayed match should have
+        been entered: result_delay after the match starts, or now if that
+        time has passed. Finished tournaments and past seasons have no
+        expected change, the results still missing there may never come.
+
+        Args:
+            tournament: Tournament the matches belong to
+            matches: Matches of the tournament
+            year: Season of the tournament
+            result_delay: Time from the start of a match until its result is expected
+
+        Returns:
+            Expected time of the next change, or None if none is expected
+        """
+        if self._is_finished(tournament, year):
+            return None
+        dates = [match.date for match in matches if not match.is_played and match.date is not None]
+        if not dates:
+            return None
+        return max(min(dates) + result_delay, self.now())
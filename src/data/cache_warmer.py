@@ -0,0 +1,253 @@
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.const import AgeGroup, TournamentType
+from src.data.match import Match
+from src.data.match_fetcher import MatchFetcher
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _enum_value(enum, value: Any) -> int:
+    """Accept an enum member name such as "FIFTH_FLOKKUR" or a plain KSÍ ID."""
+    if isinstance(value, str) and not value.isdigit():
+        return enum[value.upper()].value
+    return int(value)
+
+
+@dataclass(frozen=True)
+class WarmTarget:
+    """An age group, tournament type and range of seasons to keep cached."""
+    age_group_id: int
+    tournament_type: int
+    start_year: int
+    end_year: int
+
+    @classmethod
+    def from_config(cls, item: Dict[str, Any]) -> 'WarmTarget':
+        """Create a target from one entry of the targets list of a warm config."""
+        end_year = int(item.get('end_year', datetime.now().year))
+        return cls(
+            age_group_id=_enum_value(AgeGroup, item['age_group']),
+            tournament_type=_enum_value(TournamentType, item.get('tournament_type', TournamentType.ISLANDSMOT.value)),
+            start_year=int(item.get('start_year', end_year)),
+            end_year=end_year,
+        )
+
+    @property
+    def years(self) -> List[int]:
+        return list(range(self.end_year, self.start_year - 1, -1))
+
+
+def load_warm_config(path: str) -> Dict[str, Any]:
+    """
+    Read a cache warming config.
+
+    Example:
+        {
+            "requests_per_second": 0.5,
+            "lead_minutes": 15,
+            "targets": [
+                {"age_group": "FIFTH_FLOKKUR", "tournament_type": "ISLANDSMOT",
+                 "start_year": 2024, "end_year": 2025},
+                {"age_group": 4, "tournament_type": 2340}
+            ]
+        }
+
+    start_year defaults to end_year, which defaults to the current year.
+
+    Returns:
+        The config, with targets turned into WarmTargets
+    """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    config['targets'] = [WarmTarget.from_config(item) for item in config.get('targets', [])]
+    return config
+
+
+class CacheWarmer:
+    """
+    Keeps the cache of configured age groups and seasons warm ahead of demand.
+
+    After one pass fetching everything that is missing, every tournament is
+    scheduled for a refresh at the earlier of when its matches are expected
+    to change (the result of its next unplayed match) and shortly before its
+    cache entry expires. Finished tournaments cached permanently are never
+    refreshed. Refreshes run one at a time, earliest first, through the
+    fetcher's rate limiter, so warming never sends more than its configured
+    rate however many tournaments are due at once.
+    """
+
+    def __init__(self, fetcher: MatchFetcher, targets: List[WarmTarget], lead_time: float = 15 * 60,
+                 min_interval: float = 10 * 60, result_delay: float = 2 * 60 * 60,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize the cache warmer.
+
+        Args:
+            fetcher: Fetcher whose cache is warmed, preferably with a low request rate
+            targets: Age groups, tournament types and seasons to keep cached
+            lead_time: Seconds before an entry expires that it is refreshed
+            min_interval: Minimum seconds between refreshes of the same tournament,
+                for results that are overdue
+            result_delay: Seconds from the start of a match until its result is expected
+            clock: Function returning the current Unix time
+        """
+        self.fetcher = fetcher
+        self.targets = targets
+        self.lead_time = lead_time
+        self.min_interval = min_interval
+        self.result_delay = timedelta(seconds=result_delay)
+        self.clock = clock
+        # Heap of (due time, sequence number, job), jobs being ('tournaments', target, year)
+        # or ('matches', year, tournament)
+        self._queue: List[Tuple[float, int, Tuple]] = []
+        self._scheduled: Dict[Tuple, float] = {}
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    def _job_key(self, job: Tuple) -> Tuple:
+        if job[0] == 'tournaments':
+            _, target, year = job
+            return ('tournaments', target.age_group_id, target.tournament_type, year)
+        return ('matches', int(job[2]['tournament_id']))
+
+    def _schedule(self, job: Tuple, due: Optional[float]) -> None:
+        """Schedule a job at a time, replacing an earlier schedule of the same job. None unschedules it."""
+        key = self._job_key(job)
+        if due is None:
+            self._scheduled.pop(key, None)
+            return
+        self._scheduled[key] = due
+        # Replaced schedules stay in the heap and are skipped when popped
+        heapq.heappush(self._queue, (due, next(self._sequence), job))
+
+    def _due_before_expiry(self, expires_at: Optional[float]) -> Optional[float]:
+        return expires_at - self.lead_time if expires_at is not None else None
+
+    def _schedule_tournaments(self, target: WarmTarget, year: int) -> None:
+        entry = self.fetcher.tournaments_entry(target.age_group_id, year, target.tournament_type)
+        due = self._due_before_expiry(entry.expires_at) if entry is not None else self.clock()
+        if due is not None:
+            due = max(due, self.clock() + self.min_interval)
+        self._schedule(('tournaments', target, year), due)
+
+    def _schedule_matches(self, year: int, tournament: Dict[str, Any], matches: Optional[List[Match]]) -> None:
+        """Schedule the next refresh of a tournament from its matches and cache entry."""
+        now = self.clock()
+        if matches is None:
+            # The fetch failed, try again later
+            self._schedule(('matches', year, tournament), now + self.min_interval)
+            return
+
+        candidates = []
+        change = self.fetcher.cache_policy.next_change(tournament, matches, year, self.result_delay)
+        if change is not None:
+            candidates.append(change.timestamp())
+        entry = self.fetcher.matches_entry(int(tournament['tournament_id']))
+        if entry is not None and entry.expires_at is not None:
+            candidates.append(entry.expires_at - self.lead_time)
+        due = max(min(candidates), now + self.min_interval) if candidates else None
+        self._schedule(('matches', year, tournament), due)
+
+    def warm(self) -> Dict[str, int]:
+        """
+        Fetch everything missing from the cache and schedule refreshes of all tournaments.
+
+        Returns:
+            Dictionary with the number of tournaments found, matches found and
+            failed fetches
+        """
+        totals = {'tournaments': 0, 'matches': 0, 'failures': 0}
+        for target in self.targets:
+            logger.info("Warming %s, %s, %d-%d", AgeGroup.get_name(target.age_group_id),
+                        TournamentType.get_name(target.tournament_type), target.start_year, target.end_year)
+            result = self.fetcher.get_matches_for_years(target.age_group_id, target.start_year, target.end_year,
+                                                        tournament_type=target.tournament_type)
+            failed = {(failure['year'], failure['tournament_id']) for failure in result['failures']}
+            for year in target.years:
+                self._schedule_tournaments(target, year)
+                tournaments = result['tournaments_by_year'].get(year, [])
+                matches_by_tournament = {}
+                for match in result['matches_by_year'].get(year, []):
+                    matches_by_tournament.setdefault(match.tournament_id, []).append(match)
+                for tournament in tournaments:
+                    tournament_id = int(tournament['tournament_id'])
+                    matches = None if (year, tournament_id) in failed else matches_by_tournament.get(tournament_id, [])
+                    self._schedule_matches(year, tournament, matches)
+                totals['tournaments'] += len(tournaments)
+            totals['matches'] += result['total_matches']
+            totals['failures'] += len(result['failures'])
+        return totals
+
+    def next_due(self) -> Optional[float]:
+        """Unix time the next refresh is due, None if nothing is scheduled."""
+        while self._queue:
+            due, _, job = self._queue[0]
+            if self._scheduled.get(self._job_key(job)) == due:
+                return due
+            heapq.heappop(self._queue)
+        return None
+
+    def _refresh(self, job: Tuple) -> None:
+        if job[0] == 'tournaments':
+            _, target, year = job
+            tournaments = self.fetcher.refresh_tournaments(target.age_group_id, year, target.tournament_type)
+            self._schedule_tournaments(target, year)
+            for tournament in tournaments or []:
+                if self._job_key(('matches', year, tournament)) not in self._scheduled:
+                    # A tournament added since the last refresh
+                    self._schedule(('matches', year, tournament), self.clock())
+        else:
+            _, year, tournament = job
+            self._schedule_matches(year, tournament, self.fetcher.refresh_tournament_matches(year, tournament))
+        metrics.inc('cache_warm_refreshes_total', kind=job[0])
+
+    def run_pending(self) -> int:
+        """
+        Run every refresh that is due, earliest first.
+
+        Returns:
+            Number of refreshes run
+        """
+        count = 0
+        while True:
+            due = self.next_due()
+            if due is None or due > self.clock():
+                return count
+            _, _, job = heapq.heappop(self._queue)
+            del self._scheduled[self._job_key(job)]
+            logger.debug("Refreshing %s %s", job[0], self._job_key(job)[1:])
+            self._refresh(job)
+            count += 1
+
+    def run(self, stop: Optional[threading.Event] = None, max_sleep: float = 60.0) -> None:
+        """
+        Warm the cache and keep refreshing it until stop is set.
+
+        Args:
+            stop: Event ending the loop when set (default: run forever)
+            max_sleep: Maximum seconds to sleep between checks for due refreshes
+        """
+        stop = stop or threading.Event()
+        totals = self.warm()
+        logger.info("Cache warm: %d tournaments, %d matches, %d failed fetches, %d refreshes scheduled",
+                    totals['tournaments'], totals['matches'], totals['failures'], len(self))
+        while not stop.is_set():
+            refreshed = self.run_pending()
+            if refreshed:
+                logger.info("Refreshed %d cache entries", refreshed)
+            due = self.next_due()
+            delay = max_sleep if due is None else min(max(due - self.clock(), 0), max_sleep)
+            stop.wait(delay)
+        self.fetcher.cache.wait_for_refreshes()
@@ -0,0 +1,121 @@
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """Convert an id or score from the API to int, None if missing or invalid."""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    """Parse an ISO date from the API or a cached dict, None if missing or invalid."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern a name so every match of a team or tournament shares one string."""
+    return sys.intern(value) if value else value
+
+
+# Version of the conversion in Match.from_raw, bump when the derived fields change
+# so cached matches are rebuilt from the cached raw SOAP payloads
+CONVERTER_VERSION = 1
+
+
+@dataclass(frozen=True, slots=True)
+class Match:
+    """A single match, with ids and scores as ints and the date parsed once at ingest."""
+    match_id: Optional[int]
+    date: Optional[datetime]
+    home_team_id: Optional[int]
+    away_team_id: Optional[int]
+    home_team_name: Optional[str]
+    away_team_name: Optional[str]
+    home_score: Optional[int]
+    away_score: Optional[int]
+    venue: Optional[str]
+    is_played: bool
+    tournament_id: int
+    tournament_name: str
+
+    @classmethod
+    def from_raw(cls, raw_match: Dict[str, Any], tournament: Dict[str, Any]) -> 'Match':
+        """
+        Create a match from a MotLeikur record of the SOAP API.
+
+        Args:
+            raw_match: Match record from KSIClient.get_tournament_matches
+            tournament: Tournament the match belongs to, as returned by KSIWebScraper
+
+        Returns:
+            The match
+        """
+        home_score = raw_match.get('UrslitHeima')
+        away_score = raw_match.get('UrslitUti')
+        return cls(
+            match_id=_to_int(raw_match.get('LeikurNumer')),
+            date=_to_datetime(raw_match.get('LeikDagur')),
+            home_team_id=_to_int(raw_match.get('FelagHeimaNumer')),
+            away_team_id=_to_int(raw_match.get('FelagUtiNumer')),
+            home_team_name=_intern(raw_match.get('FelagHeimaNafn')),
+            away_team_name=_intern(raw_match.get('FelagUtiNafn')),
+            home_score=_to_int(home_score),
+            away_score=_to_int(away_score),
+            venue=_intern(raw_match.get('VollurNafn')),
+            is_played=bool(home_score and away_score),
+            tournament_id=int(tournament['tournament_id']),
+            tournament_name=_intern(tournament['name']),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Match':
+        """Create a match from the dict shape produced by to_dict."""
+        return cls(
+            match_id=_to_int(data.get('match_id')),
+            date=_to_datetime(data.get('date')),
+            home_team_id=_to_int(data.get('home_team_id')),
+            away_team_id=_to_int(data.get('away_team_id')),
+            home_team_name=_intern(data.get('home_team_name')),
+            away_team_name=_intern(data.get('away_team_name')),
+            home_score=_to_int(data.get('home_score')),
+            away_score=_to_int(data.get('away_score')),
+            venue=_intern(data.get('venue')),
+            is_played=bool(data.get('is_played')),
+            tournament_id=int(data['tournament_id']),
+            tournament_name=_intern(data.get('tournament_name')),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the match to the dict shape used before Match existed (ids and dates as strings)."""
+        return {
+            'match_id': str(self.match_id) if self.match_id is not None else None,
+            'date': self.date.isoformat() if self.date else None,
+            'home_team_id': str(self.home_team_id) if self.home_team_id is not None else None,
+            'away_team_id': str(self.away_team_id) if self.away_team_id is not None else None,
+            'home_team_name': self.home_team_name,
+            'away_team_name': self.away_team_name,
+            'home_score': self.home_score,
+            'away_score': self.away_score,
+            'venue': self.venue,
+            'is_played': self.is_played,
+            'tournament_id': self.tournament_id,
+            'tournament_name': self.tournament_name,
+        }
+
+    def involves(self, team_id: int) -> bool:
+        """Check if a team played in the match."""
+        return team_id == self.home_team_id or team_id == self.away_team_id
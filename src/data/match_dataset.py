@@ -0,0 +1,290 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.data.match import Match
+from src.data.match_fetcher import MatchFetcher
+from src.data.match_index import MatchIndex
+from src.data.match_table import FAIRNESS, RESULTS, MatchTable
+from src.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _LoadedTournament:
+    """A tournament held in memory, with when its cached matches expire."""
+    year: int
+    tournament: Dict[str, Any]
+    matches: List[Match]
+    expires_at: Optional[float]
+
+
+def _add_counts(total: Dict[str, int], counts: Dict[str, int]) -> None:
+    for name, count in counts.items():
+        total[name] = total.get(name, 0) + count
+
+
+class MatchSnapshot:
+    """
+    Immutable, query-ready view of the matches of one age group and tournament type.
+
+    The table and index are built once per snapshot, and the grouped counts of
+    each team are computed on first use and kept until the snapshot is replaced.
+    """
+
+    def __init__(self, tournaments: Iterable[_LoadedTournament], failures: List[Dict[str, Any]]):
+        # Newest year first, like get_matches_for_years
+        self.tournaments = sorted(tournaments, key=lambda t: -t.year)
+        self.failures = failures
+        matches: List[Match] = []
+        years: List[int] = []
+        self.index = MatchIndex()
+        self.year_totals: Dict[int, int] = defaultdict(int)
+        for loaded in self.tournaments:
+            matches.extend(loaded.matches)
+            years.extend([loaded.year] * len(loaded.matches))
+            self.index.add_matches(loaded.matches, loaded.year)
+            self.year_totals[loaded.year] += len(loaded.matches)
+        self.table = MatchTable(matches, years)
+        self.fairness_by_year = self.table.fairness_counts(by='year')
+        self._breakdowns: Dict[Optional[int], Tuple[Dict, Optional[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def _breakdown(self, team_id: Optional[int]) -> Tuple[Dict, Optional[Dict]]:
+        """Fairness and result counts by (year, tournament) of a team, or of all matches."""
+        with self._lock:
+            breakdown = self._breakdowns.get(team_id)
+        if breakdown is None:
+            fairness = self.table.fairness_counts(team_id=team_id, by=('year', 'tournament'))
+            results = self.table.result_counts(team_id, by=('year', 'tournament')) if team_id else None
+            breakdown = (fairness, results)
+            with self._lock:
+                self._breakdowns[team_id] = breakdown
+        return breakdown
+
+    def stats(self, years: List[int], team_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Compute the breakdowns main prints for some of the snapshot's years.
+
+        Args:
+            years: Seasons to include
+            team_id: Team to list matches and count results for (default: all matches)
+
+        Returns:
+            JSON-serializable dict with total_matches, failures, a years dict with
+            each year's tournaments, and overall results of the team and fairness
+            of all matches
+        """
+        fairness_by, results_by = self._breakdown(team_id)
+        overall_fairness = dict.fromkeys(FAIRNESS, 0)
+        overall_results = dict.fromkeys(RESULTS, 0)
+        for year in years:
+            _add_counts(overall_fairness, self.fairness_by_year.get(year, {}))
+        by_year = {}
+        for year in sorted(years, reverse=True):
+            if team_id:
+                matches_by_tournament = defaultdict(list)
+                for match in self.index.for_team(team_id, year):
+                    matches_by_tournament[match.tournament_id].append(match)
+            else:
+                matches_by_tournament = {int(t.tournament['tournament_id']): t.matches
+                                         for t in self.tournaments if t.year == year and t.matches}
+
+            tournaments = []
+            for tournament_id, matches in matches_by_tournament.items():
+                entry = {
+                    'tournament_id': tournament_id,
+                    'name': matches[0].tournament_name,
+                    'fairness': fairness_by.get((year, tournament_id), dict.fromkeys(FAIRNESS, 0)),
+                }
+                if team_id:
+                    entry['results'] = results_by.get((year, tournament_id), dict.fromkeys(RESULTS, 0))
+                    _add_counts(overall_results, entry['results'])
+                    entry['matches'] = [match.to_dict()
+                                        for match in sorted(matches, key=lambda m: m.date or datetime.max)]
+                tournaments.append(entry)
+            by_year[str(year)] = {'total_matches': self.year_totals.get(year, 0), 'tournaments': tournaments}
+
+        overall = {'fairness': overall_fairness}
+        if team_id:
+            overall['results'] = overall_results
+        return {
+            'total_matches': sum(self.year_totals.get(year, 0) for year in years),
+            'failures': [failure for failure in self.failures if failure['year'] in years],
+            'years': by_year,
+            'overall': overall,
+        }
+
+    def matches(self, years: List[int], team_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Matches of some years, optionally only those a team played in, as dicts."""
+        selected = []
+        for year in sorted(years, reverse=True):
+            selected.extend(self.index.for_team(team_id, year) if team_id else self.index.for_year(year))
+        return [match.to_dict() for match in selected]
+
+
+class _Group:
+    """Everything loaded for one age group and tournament type."""
+
+    def __init__(self):
+        self.years: set = set()
+        self.tournaments_expire: Dict[int, Optional[float]] = {}
+        self.tournaments: Dict[int, _LoadedTournament] = {}
+        self.failures: List[Dict[str, Any]] = []
+        self.snapshot = MatchSnapshot([], [])
+
+
+class MatchDataset:
+    """
+    Matches of several age groups and tournament types kept resident in memory.
+
+    Years are loaded through the fetcher on first use. refresh reloads only
+    the tournament lists and tournaments whose cache entries have expired, and
+    rebuilds the snapshot of a group only if something was reloaded. Queries
+    read the current snapshot without locking.
+    """
+
+    def __init__(self, fetcher: MatchFetcher, clock=time.time):
+        """
+        Initialize the dataset.
+
+        Args:
+            fetcher: Fetcher to load matches with, normally sharing the cache of other runs
+            clock: Function returning the current Unix time
+        """
+        self.fetcher = fetcher
+        self.clock = clock
+        self._groups: Dict[Tuple[int, int], _Group] = {}
+        self._lock = threading.RLock()
+
+    def groups(self) -> List[Dict[str, Any]]:
+        """Age groups, tournament types and years loaded, with their number of matches."""
+        return [
+            {'age_group': age_group_id, 'tournament_type': tournament_type, 'years': sorted(group.years),
+             'matches': len(group.snapshot.table)}
+            for (age_group_id, tournament_type), group in list(self._groups.items())
+        ]
+
+    def snapshot(self, age_group_id: int, tournament_type: int, years: List[int]) -> MatchSnapshot:
+        """
+        Get the snapshot of an age group and tournament type, loading missing years first.
+
+        Args:
+            age_group_id: Age group ID
+            tournament_type: Tournament type ID
+            years: Seasons the caller needs
+
+        Returns:
+            Snapshot holding at least the given years
+        """
+        group = self._groups.get((age_group_id, tournament_type))
+        if group is not None and group.years.issuperset(years):
+            return group.snapshot
+        with self._lock:
+            group = self._groups.setdefault((age_group_id, tournament_type), _Group())
+            missing = sorted(set(years) - group.years)
+            if missing:
+                self._load(group, age_group_id, tournament_type, missing[0], missing[-1])
+            return group.snapshot
+
+    def _load(self, group: _Group, age_group_id: int, tournament_type: int, start_year: int, end_year: int) -> None:
+        with metrics.timer('dataset_load_seconds'):
+            result = self.fetcher.get_matches_for_years(age_group_id, start_year, end_year,
+                                                        tournament_type=tournament_type)
+        failed_lists = {failure['year'] for failure in result['failures'] if failure['tournament_id'] is None}
+        failed = {(failure['year'], failure['tournament_id']) for failure in result['failures']}
+        now = self.clock()
+        for year in range(start_year, end_year + 1):
+            if year in failed_lists:
+                group.tournaments_expire[year] = now
+                continue
+            entry = self.fetcher.tournaments_entry(age_group_id, year, tournament_type)
+            group.tournaments_expire[year] = entry.expires_at if entry is not None else now
+
+            matches_by_tournament = defaultdict(list)
+            for match in result['matches_by_year'].get(year, []):
+                matches_by_tournament[match.tournament_id].append(match)
+            for tournament in result['tournaments_by_year'].get(year, []):
+                tournament_id = int(tournament['tournament_id'])
+                if (year, tournament_id) in failed:
+                    group.tournaments[tournament_id] = _LoadedTournament(year, tournament, [], now)
+                else:
+                    self._set_tournament(group, year, tournament, matches_by_tournament.get(tournament_id, []))
+        group.failures = [failure for failure in group.failures if failure['year'] not in range(start_year, end_year + 1)]
+        group.failures.extend(result['failures'])
+        group.snapshot = MatchSnapshot(group.tournaments.values(), list(group.failures))
+        # Queries check the years without locking, publish them only once the snapshot holds them
+        group.years = group.years | set(range(start_year, end_year + 1))
+
+    def _set_tournament(self, group: _Group, year: int, tournament: Dict[str, Any], matches: List[Match]) -> None:
+        tournament_id = int(tournament['tournament_id'])
+        entry = self.fetcher.matches_entry(tournament_id)
+        group.tournaments[tournament_id] = _LoadedTournament(
+            year, tournament, matches, entry.expires_at if entry is not None else None)
+
+    def refresh(self) -> int:
+        """
+        Reload the expired tournament lists and tournaments of every group.
+
+        Returns:
+            Number of tournament lists and tournaments reloaded
+        """
+        reloaded = 0
+        with self._lock:
+            for (age_group_id, tournament_type), group in self._groups.items():
+                changed = self._refresh_group(group, age_group_id, tournament_type)
+                if changed:
+                    group.snapshot = MatchSnapshot(group.tournaments.values(), list(group.failures))
+                    reloaded += changed
+        if reloaded:
+            metrics.inc('dataset_reloads_total', reloaded)
+        return reloaded
+
+    def _is_expired(self, expires_at: Optional[float], now: float) -> bool:
+        return expires_at is not None and expires_at <= now
+
+    def _refresh_group(self, group: _Group, age_group_id: int, tournament_type: int) -> int:
+        now = self.clock()
+        changed = 0
+        for year in sorted(group.years):
+            if not self._is_expired(group.tournaments_expire.get(year), now):
+                continue
+            tournaments = self.fetcher.get_tournaments(age_group_id, year, tournament_type)
+            if tournaments is None:
+                continue
+            entry = self.fetcher.tournaments_entry(age_group_id, year, tournament_type)
+            group.tournaments_expire[year] = entry.expires_at if entry is not None else None
+            group.failures = [f for f in group.failures if not (f['year'] == year and f['tournament_id'] is None)]
+            changed += 1
+            for tournament in tournaments:
+                tournament_id = int(tournament['tournament_id'])
+                if tournament_id not in group.tournaments:
+                    # A tournament added since the year was loaded
+                    group.tournaments[tournament_id] = _LoadedTournament(year, tournament, [], now)
+
+        for tournament_id, loaded in list(group.tournaments.items()):
+            if not self._is_expired(loaded.expires_at, now):
+                continue
+            matches = self.fetcher.get_tournament_matches(loaded.year, loaded.tournament)
+            if matches is None:
+                continue
+            self._set_tournament(group, loaded.year, loaded.tournament, matches)
+            group.failures = [f for f in group.failures if f['tournament_id'] != tournament_id]
+            changed += 1
+        return changed
+
+    def run_refreshes(self, stop: threading.Event, interval: float = 60.0) -> None:
+        """Refresh the dataset every interval seconds until stop is set."""
+        while not stop.wait(interval):
+            try:
+                reloaded = self.refresh()
+            except Exception as e:
+                logger.error("Error refreshing dataset: %s", e)
+                continue
+            if reloaded:
+                logger.info("Reloaded %d tournament lists and tournaments", reloaded)
@@ -1,120 +1,529 @@
-from typing import List, Dict, Any
+import logging
+from collections import deque
+from itertools import islice
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import ParseError
+import requests
 from src.api.ksi_client import KSIClient
-from src.api.web_scraper import KSIWebScraper
-from src.data.cache_manager import CacheManager
-from time import sleep
+from src.api.soap_decoder import decode_soap_records
+from src.api.web_scraper import KSIWebScraper, TOURNAMENTS_PARSER_VERSION
+from src.api.resilience import AdaptiveRateLimiter, BudgetExhaustedError, CircuitOpenError, Resilience, RetryPolicy
+from src.data.cache_manager import CacheManager, CacheEntry, PERMANENT
+from src.data.cache_policy import CachePolicy
+from src.data.match import Match, CONVERTER_VERSION
+from src.data.match_index import MatchIndex
+from src.metrics import metrics
 from datetime import datetime
+import time
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean a fetch failed, as opposed to KSÍ having no data
+FETCH_ERRORS = (requests.RequestException, ParseError, CircuitOpenError, BudgetExhaustedError)
 
 class MatchFetcher:
     """Class for fetching and processing football matches."""
     
-    def __init__(self, soap_client: KSIClient, web_scraper: KSIWebScraper, cache_ttl_days: int = 1):
+    def __init__(self, soap_client: KSIClient, web_scraper: KSIWebScraper, cache_ttl_days: int = 1,
+                 max_workers: int = 1, requests_per_second: float = 2.0, burst: int = 1,
+                 max_requests_per_second: Optional[float] = None, latency_target: Optional[float] = 2.0,
+                 max_attempts: int = 4,
+                 live_ttl_minutes: float = 60, negative_ttl_hours: float = 6,
+                 stale_while_revalidate_minutes: float = 0, cache_dir: str = "cache"):
+        """
+        Initialize the match fetcher.
+
+        Args:
+            soap_client: Client for the KSÍ SOAP API
+            web_scraper: Scraper for the KSÍ website
+            cache_ttl_days: Number of days before cache entries expire
+            max_workers: Number of tournaments fetched concurrently (1 fetches sequentially)
+            requests_per_second: Maximum sustained rate of requests sent to KSÍ
+            burst: Number of requests that may be sent back to back before rate limiting
+            max_requests_per_second: Rate the limiter may grow to while KSÍ responds quickly
+                (default: twice requests_per_second). The rate is halved whenever KSÍ throttles us.
+            latency_target: Seconds a response may take before it counts as KSÍ being overloaded
+                and the rate is halved (None: only 429 and 503 responses do)
+            max_attempts: Number of times a request is sent before its failure is reported
+            live_ttl_minutes: Minutes before cached data of tournaments in progress expires
+            negative_ttl_hours: Hours before cached "no data" results expire
+            stale_while_revalidate_minutes: Minutes after expiry during which cached data is
+                still returned immediately while it is refreshed in the background (0 disables this)
+            cache_dir: Directory of the disk cache
+        """
         self.soap_client = soap_client
         self.web_scraper = web_scraper
-        self.cache = CacheManager(ttl_days=cache_ttl_days)
+        self.cache = CacheManager(cache_dir=cache_dir, ttl_days=cache_ttl_days,
+                                  stale_while_revalidate=stale_while_revalidate_minutes * 60)
+        self.cache_policy = CachePolicy(default_ttl=self.cache.ttl, live_ttl=live_ttl_minutes * 60,
+                                        negative_ttl=negative_ttl_hours * 60 * 60)
+        self.max_workers = max(1, max_workers)
+        self.resilience = self._install_resilience(
+            AdaptiveRateLimiter(requests_per_second, capacity=burst, max_rate=max_requests_per_second,
+                                latency_target=latency_target),
+            RetryPolicy(max_attempts=max(1, max_attempts)),
+        )
+        self.rate_limiter = self.resilience.rate_limiter
+
+    def _install_resilience(self, rate_limiter: AdaptiveRateLimiter, retry: RetryPolicy) -> Resilience:
+        """
+        Get the resilience layer of the clients' transports.
+
+        Transports that have none are given one with the given rate limiter and
+        retry policy, so the requests of both clients share one rate.
+        """
+        transports = [getattr(client, 'transport', None) for client in (self.soap_client, self.web_scraper)]
+        transports = [transport for transport in transports if transport is not None]
+        resilience = next((transport.resilience for transport in transports if transport.resilience is not None),
+                          None) or Resilience(rate_limiter, retry)
+        for transport in transports:
+            if transport.resilience is None:
+                transport.resilience = resilience
+        return resilience
 
-    def _convert_match_data(self, raw_match: Dict[str, Any], tournament) -> Dict[str, Any]:
+    def _convert_match_data(self, raw_match: Dict[str, Any], tournament) -> Match:
         """Convert raw match data from SOAP API to standardized format."""
-        return {
-            'match_id': raw_match.get('LeikurNumer', None),
-            'date': raw_match.get('LeikDagur', None),
-            'home_team_id': raw_match.get('FelagHeimaNumer', None),
-            'away_team_id': raw_match.get('FelagUtiNumer', None),
-            'home_team_name': raw_match.get('FelagHeimaNafn', None),
-            'away_team_name': raw_match.get('FelagUtiNafn', None),
-            'home_score': int(raw_match.get('UrslitHeima', 0)) if raw_match.get('UrslitHeima') else None,
-            'away_score': int(raw_match.get('UrslitUti', 0)) if raw_match.get('UrslitUti') else None,
-            'venue': raw_match.get('VollurNafn', None),
-            'is_played': bool(raw_match.get('UrslitHeima') and raw_match.get('UrslitUti')),
-            'tournament_id': int(tournament['tournament_id']),
-            'tournament_name': tournament['name'],
-        }
+        return Match.from_raw(raw_match, tournament)
+
+    def _convert_matches(self, raw_matches: List[Dict[str, Any]], tournament: Dict[str, Any]) -> List[Match]:
+        """Convert all matches of a tournament, recording the time taken."""
+        with metrics.timer('convert_seconds'):
+            matches = [self._convert_match_data(raw_match, tournament) for raw_match in raw_matches]
+        metrics.inc('convert_rows_total', len(matches))
+        return matches
     
-    def get_matches_for_years(self, age_group_id: int, start_year: int, end_year: int, tournament_type: int = None) -> Dict[str, Any]:
+    def _map(self, func: Callable[[Any], Any], items: List[Any]) -> Iterator[Any]:
+        """
+        Apply func to every item, concurrently when max_workers > 1, keeping input order.
+
+        At most max_workers items are in flight: the next one is submitted as
+        each result is yielded, and closing the iterator early submits no more.
+        """
+        if self.max_workers > 1 and len(items) > 1:
+            remaining = iter(items)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                window = deque(executor.submit(func, item) for item in islice(remaining, self.max_workers))
+                try:
+                    while window:
+                        result = window.popleft().result()
+                        for item in islice(remaining, 1):
+                            window.append(executor.submit(func, item))
+                        yield result
+                finally:
+                    for future in window:
+                        future.cancel()
+        else:
+            for item in items:
+                yield func(item)
+
+    @staticmethod
+    def _remaining_ttl(entry: CacheEntry) -> float:
+        """Time to live left on a cache entry, for derived entries rebuilt from it."""
+        if entry.expires_at is None:
+            return PERMANENT
+        return max(entry.expires_at - time.time(), 0)
+
+    def _tournaments_keys(self, age_group_id: int, year: int, tournament_type: int = None) -> Tuple[str, str]:
+        """Cache keys of the parsed tournaments of one year and of the page they were parsed from."""
+        cache_key = self.cache.build_key("tournaments", age_group=age_group_id, year=year,
+                                         tournament_type=tournament_type, version=TOURNAMENTS_PARSER_VERSION)
+        raw_key = self.cache.build_key("raw", "tournaments", age_group=age_group_id, year=year,
+                                       tournament_type=tournament_type)
+        return cache_key, raw_key
+
+    def _matches_keys(self, tournament_id: int) -> Tuple[str, str]:
+        """Cache keys of the converted matches of a tournament and of the SOAP payload they were converted from."""
+        cache_key = self.cache.build_key("matches", tournament_id=tournament_id, version=CONVERTER_VERSION)
+        raw_key = self.cache.build_key("raw", "MotLeikir", tournament_id=tournament_id)
+        return cache_key, raw_key
+
+    def _get_tournaments(self, age_group_id: int, year: int, tournament_type: int = None,
+                         offline: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the tournaments of one year, from cache if possible.
+
+        Returns:
+            List of tournaments (empty if the year has none), or None if the fetch failed
+        """
+        cache_key, raw_key = self._tournaments_keys(age_group_id, year, tournament_type)
+        entry = self.cache.get_entry(cache_key)
+        if entry is not None and entry.is_fresh():
+            return entry.value
+
+        if offline:
+            return self._rebuild_tournaments(cache_key, raw_key)
+
+        # Other threads and processes wanting the same list share one fetch
+        def fetch():
+            return self.cache.coalesce(cache_key, lambda: self._fetch_tournaments(
+                cache_key, raw_key, entry, age_group_id, year, tournament_type))
+
+        if entry is not None and self.cache.is_servable_stale(entry):
+            # Serve the stale list and revalidate it in the background
+            self.cache.refresh_in_background(cache_key, fetch)
+            return entry.value
+
+        return fetch()
+
+    def _rebuild_tournaments(self, cache_key: str, raw_key: str) -> Optional[List[Dict[str, Any]]]:
+        """Rebuild the tournaments of one year from the cached page, without the network."""
+        raw_entry = self.cache.get_entry(raw_key)
+        if raw_entry is None:
+            logger.warning("No cached page for %s", cache_key)
+            return None
+        tournaments = self.web_scraper.parse_tournaments_page(raw_entry.value) if raw_entry.value else []
+        self.cache.set(cache_key, tournaments, ttl=self._remaining_ttl(raw_entry))
+        return tournaments
+
+    def _fetch_tournaments(self, cache_key: str, raw_key: str, entry: Optional[CacheEntry], age_group_id: int,
+                           year: int, tournament_type: int = None) -> Optional[List[Dict[str, Any]]]:
+        """Fetch, or revalidate the cached page of, the tournaments of one year and cache them."""
+        raw_entry = self.cache.get_entry(raw_key)
+        try:
+            content, validators = self.web_scraper.fetch_tournaments_page(
+                age_group_id, year=year, tournament_type=tournament_type,
+                validators=raw_entry.validators if raw_entry is not None else None,
+            )
+        except FETCH_ERRORS as e:
+            logger.error("Error fetching tournaments for %s: %s", year, e)
+            return None
+        return self._store_tournaments(cache_key, raw_key, entry, raw_entry, year, content, validators)
+
+    def _store_tournaments(self, cache_key: str, raw_key: str, entry: Optional[CacheEntry],
+                           raw_entry: Optional[CacheEntry], year: int, content: Optional[bytes],
+                           validators: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Parse and cache a fetched tournament list page, or renew the cached one if it was unchanged."""
+        if content is None and entry is not None:
+            # Page unchanged, keep the parsed tournaments and only renew their expiry
+            tournaments = entry.value
+        else:
+            if content is None:
+                content = raw_entry.value if raw_entry is not None else b''
+            tournaments = self.web_scraper.parse_tournaments_page(content) if content else []
+
+        if tournaments:
+            ttl = self.cache_policy.tournaments_ttl(tournaments, year)
+        else:
+            # Remember that the year has no tournaments, for a shorter time
+            ttl = self.cache_policy.negative_ttl
+        if content is not None:
+            self.cache.set(raw_key, content, ttl=ttl, validators=validators)
+        elif raw_entry is not None:
+            self.cache.set(raw_key, raw_entry.value, ttl=ttl, validators=validators)
+        self.cache.set(cache_key, tournaments, ttl=ttl)
+
+        return tournaments
+
+    def _get_tournament_matches(self, job: Tuple[int, Dict[str, Any]], offline: bool = False) -> Optional[List[Match]]:
+        """
+        Get the matches of one (year, tournament) job, from cache if possible.
+
+        Matches missing from the cache, or cached by an older converter version,
+        are rebuilt from the cached raw SOAP payload when there is one.
+
+        Returns:
+            List of matches (empty if the tournament has none), or None if the fetch failed
+        """
+        year, tournament = job
+        cache_key, raw_key = self._matches_keys(int(tournament['tournament_id']))
+
+        if offline:
+            entry = self.cache.get_entry(cache_key)
+            if entry is not None and entry.is_fresh():
+                return entry.value
+            return self._rebuild_tournament_matches(cache_key, raw_key, tournament, fresh_only=False)
+
+        # Other threads and processes wanting the same tournament share one fetch
+        def fetch():
+            return self.cache.coalesce(
+                cache_key, lambda: self._fetch_tournament_matches(cache_key, raw_key, year, tournament))
+
+        matches = self.cache.get(cache_key, refresh=fetch)
+        if matches is not None:
+            return matches
+
+        matches = self._rebuild_tournament_matches(cache_key, raw_key, tournament, fresh_only=True)
+        if matches is not None:
+            return matches
+        return fetch()
+
+    def _rebuild_tournament_matches(self, cache_key: str, raw_key: str, tournament: Dict[str, Any],
+                                    fresh_only: bool) -> Optional[List[Match]]:
+        """Convert and cache the matches of a tournament from its cached SOAP payload, None if there is none."""
+        raw_entry = self.cache.get_entry(raw_key)
+        if raw_entry is None or (fresh_only and not raw_entry.is_fresh()):
+            return None
+        try:
+            raw_matches = decode_soap_records(raw_entry.value, 'MotLeikir')
+        except ParseError as e:
+            logger.error("Error decoding cached matches for tournament %s: %s", tournament['tournament_id'], e)
+            return None
+        matches = self._convert_matches(raw_matches, tournament)
+        self.cache.set(cache_key, matches, ttl=self._remaining_ttl(raw_entry))
+        return matches
+
+    def _fetch_tournament_matches(self, cache_key: str, raw_key: str, year: int,
+                                  tournament: Dict[str, Any]) -> Optional[List[Match]]:
+        """Fetch the matches of one tournament from the API and cache both the payload and the matches."""
+        tournament_id = int(tournament['tournament_id'])
+        try:
+            # Decoded while the response downloads, keeping the payload to cache
+            raw_matches, content = self.soap_client.get_tournament_matches_with_raw(tournament_id)
+        except FETCH_ERRORS as e:
+            logger.error("Error fetching matches for tournament %s: %s", tournament_id, e)
+            return None
+        return self._store_tournament_matches(cache_key, raw_key, year, tournament, content, raw_matches)
+
+    def _store_tournament_matches(self, cache_key: str, raw_key: str, year: int, tournament: Dict[str, Any],
+                                  content: bytes, raw_matches: List[Dict[str, Any]]) -> List[Match]:
+        """Convert and cache the matches of a fetched SOAP payload, caching the payload too."""
+        matches = self._convert_matches(raw_matches, tournament)
+        if matches:
+            ttl = self.cache_policy.matches_ttl(tournament, matches, year)
+        else:
+            # Remember that the tournament has no matches, for a shorter time
+            ttl = self.cache_policy.negative_ttl
+        self.cache.set(raw_key, content, ttl=ttl)
+        self.cache.set(cache_key, matches, ttl=ttl)
+
+        return matches
+
+    def get_tournaments(self, age_group_id: int, year: int, tournament_type: int = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the tournaments of one year, from cache if possible.
+
+        Returns:
+            List of tournaments (empty if the year has none), or None if the fetch failed
+        """
+        return self._get_tournaments(age_group_id, year, tournament_type)
+
+    def get_tournament_matches(self, year: int, tournament: Dict[str, Any]) -> Optional[List[Match]]:
+        """
+        Get the matches of one tournament, from cache if possible.
+
+        Returns:
+            List of matches (empty if the tournament has none), or None if the fetch failed
+        """
+        return self._get_tournament_matches((year, tournament))
+
+    def tournaments_entry(self, age_group_id: int, year: int, tournament_type: int = None) -> Optional[CacheEntry]:
+        """Get the cache entry of the tournaments of one year, even if it has expired."""
+        return self.cache.get_entry(self._tournaments_keys(age_group_id, year, tournament_type)[0])
+
+    def matches_entry(self, tournament_id: int) -> Optional[CacheEntry]:
+        """Get the cache entry of the matches of a tournament, even if it has expired."""
+        return self.cache.get_entry(self._matches_keys(tournament_id)[0])
+
+    def refresh_tournaments(self, age_group_id: int, year: int,
+                            tournament_type: int = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Fetch, or revalidate, the tournaments of one year even if they are cached and fresh.
+
+        Returns:
+            List of tournaments (empty if the year has none), or None if the fetch failed
+        """
+        cache_key, raw_key = self._tournaments_keys(age_group_id, year, tournament_type)
+        entry = self.cache.get_entry(cache_key)
+        return self.cache.coalesce(cache_key, lambda: self._fetch_tournaments(
+            cache_key, raw_key, entry, age_group_id, year, tournament_type), force=True)
+
+    def refresh_tournament_matches(self, year: int, tournament: Dict[str, Any]) -> Optional[List[Match]]:
+        """
+        Fetch the matches of a tournament even if they are cached and fresh.
+
+        Returns:
+            List of matches (empty if the tournament has none), or None if the fetch failed
+        """
+        cache_key, raw_key = self._matches_keys(int(tournament['tournament_id']))
+        return self.cache.coalesce(
+            cache_key, lambda: self._fetch_tournament_matches(cache_key, raw_key, year, tournament), force=True)
+
+    def get_year_matches(self, age_group_id: int, year: int, tournament_type: int = None
+                         ) -> Tuple[Optional[List[Dict[str, Any]]], List[Optional[List[Match]]]]:
+        """
+        Get the tournaments of one year and the matches of each of them, from cache if possible.
+
+        The matches are fetched concurrently when the fetcher was created with
+        max_workers > 1.
+
+        Returns:
+            The tournaments (None if the list could not be fetched) and the matches
+            of each of them, in the same order (None for those that could not be fetched)
+        """
+        tournaments = self._get_tournaments(age_group_id, year, tournament_type)
+        if not tournaments:
+            return tournaments, []
+        return tournaments, list(self._map(lambda tournament: self._get_tournament_matches((year, tournament)),
+                                           tournaments))
+
+    def get_matches_for_years(self, age_group_id: int, start_year: int, end_year: int, tournament_type: int = None,
+                              offline: bool = False) -> Dict[str, Any]:
         """
         Fetch all matches for a given age group between specified years.
+
+        Tournament lists and tournament matches are fetched concurrently when the
+        fetcher was created with max_workers > 1. Results are always assembled in
+        the same order as a sequential fetch.
         
         Args:
             age_group_id: The ID of the age group to fetch matches for
             start_year: Start year (inclusive)
             end_year: End year (inclusive)
             tournament_type: Optional tournament type ID to filter by
+            offline: Never use the network. Tournaments and matches missing from the cache,
+                or cached by an older parser or converter version, are rebuilt from the
+                cached raw pages and SOAP payloads, even expired ones.
             
         Returns:
             Dictionary containing:
             - total_matches: Total number of matches found
             - matches_by_year: Dictionary of matches grouped by year
             - tournaments_by_year: Dictionary of tournaments grouped by year
+            - all_matches: List of all matches, newest year first
+            - index: MatchIndex over all_matches for lookups by team, tournament and year
+            - failures: List of fetches that failed and were not cached, each a dict
+              with year, tournament_id (None for a failed tournament list) and reason
         """
-        total_matches = 0
-        matches_by_year = {}
+        failures = []
+        years = list(range(end_year, start_year - 1, -1))
+
+        logger.info("Fetching tournaments for %d years...", len(years))
+        year_tournaments = self._map(
+            lambda year: self._get_tournaments(age_group_id, year, tournament_type, offline=offline),
+            years,
+        )
+        tournaments_by_year = self._collect_tournaments(years, year_tournaments, failures)
+
+        # Fetch the matches of every tournament of every year in one batch
+        jobs = self._match_jobs(years, tournaments_by_year)
+        tournament_matches = self._map(lambda job: self._get_tournament_matches(job, offline=offline), jobs)
+        return self._build_result(years, tournaments_by_year, jobs, tournament_matches, failures)
+
+    def iter_matches(self, age_group_id: int, start_year: int, end_year: int, tournament_type: int = None,
+                     offline: bool = False, failures: Optional[List[Dict[str, Any]]] = None
+                     ) -> Iterator[Tuple[int, Dict[str, Any], List[Match]]]:
+        """
+        Stream the matches of an age group between specified years, one tournament at a time.
+
+        Each tournament is yielded as soon as it has been fetched or read from the
+        cache, in the order of get_matches_for_years, and nothing is kept once it
+        has been yielded, so callers that aggregate or write out matches need
+        neither wait for the whole range nor hold it in memory. The tournament
+        lists of all years are fetched first.
+
+        Args:
+            age_group_id: The ID of the age group to fetch matches for
+            start_year: Start year (inclusive)
+            end_year: End year (inclusive)
+            tournament_type: Optional tournament type ID to filter by
+            offline: Never use the network, as in get_matches_for_years
+            failures: List that fetches which failed are appended to, in the format
+                of the failures of get_matches_for_years
+
+        Yields:
+            (year, tournament, matches) of every tournament whose matches could be
+            fetched, matches being empty if the tournament has none
+        """
+        failures = failures if failures is not None else []
+        years = list(range(end_year, start_year - 1, -1))
+        year_tournaments = self._map(
+            lambda year: self._get_tournaments(age_group_id, year, tournament_type, offline=offline),
+            years,
+        )
+        jobs = self._match_jobs(years, self._collect_tournaments(years, year_tournaments, failures))
+        tournament_matches = self._map(lambda job: self._get_tournament_matches(job, offline=offline), jobs)
+        for (year, tournament), matches in zip(jobs, tournament_matches):
+            if matches is None:
+                failures.append(self._match_failure(year, tournament))
+            else:
+                yield year, tournament, matches
+
+    @staticmethod
+    def assemble_result(years: List[int], year_tournaments: List[Optional[List[Dict[str, Any]]]],
+                        tournament_matches: List[Optional[List[Match]]]) -> Dict[str, Any]:
+        """
+        Assemble the result of get_matches_for_years from years fetched separately, e.g. by get_year_matches.
+
+        Args:
+            years: Seasons, newest first
+            year_tournaments: Tournaments of each year, None for years whose list could not be fetched
+            tournament_matches: Matches of every tournament of those years, ordered by year and
+                then by tournament, None for those that could not be fetched
+
+        Returns:
+            Dictionary in the format of get_matches_for_years
+        """
+        failures = []
+        tournaments_by_year = MatchFetcher._collect_tournaments(years, year_tournaments, failures)
+        jobs = MatchFetcher._match_jobs(years, tournaments_by_year)
+        return MatchFetcher._build_result(years, tournaments_by_year, jobs, tournament_matches, failures)
+
+    @staticmethod
+    def _collect_tournaments(years: List[int], year_tournaments: Iterable[Optional[List[Dict[str, Any]]]],
+                             failures: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        """Group the fetched tournament lists by year, recording the years whose fetch failed."""
         tournaments_by_year = {}
-        all_matches = []
-        
-        # Process each year in the range
-        for year in range(end_year, start_year - 1, -1):
-            print(f"\nProcessing {year} tournaments...")
-            
-            # Try to get tournaments from cache
-            cache_key = self.cache.build_key("tournaments", age_group=age_group_id, year=year, tournament_type=tournament_type)
-            tournaments = self.cache.get(cache_key)
-            
+        for year, tournaments in zip(years, year_tournaments):
             if tournaments is None:
-                # Not in cache, fetch from API
-                tournaments = self.web_scraper.get_tournaments_in_age_group(age_group_id, year=year, tournament_type=tournament_type)
-                if tournaments:
-                    # Store in cache
-                    self.cache.set(cache_key, tournaments)
-            
-            if tournaments:
-                print(f"Found {len(tournaments)} tournaments in {year}")
-                tournaments_by_year[year] = tournaments
-                
+                failures.append({'year': year, 'tournament_id': None, 'reason': 'tournament list fetch failed'})
+            elif tournaments:
+                logger.info("Found %d tournaments in %s", len(tournaments), year)
                 # All tournaments are already filtered by type in the web scraper
-                regular_tournaments = tournaments
-                
-                print(f"Processing {len(regular_tournaments)} tournaments...")
-                year_matches = []
-                
-                # Check each tournament for matches
-                for i, tournament in enumerate(regular_tournaments, 1):
-                    tournament_id = int(tournament['tournament_id'])
-                    print(f"\rChecking tournament {i}/{len(regular_tournaments)}: {tournament['name']}", end='')
-                    
-                    # Try to get matches from cache
-                    cache_key = self.cache.build_key("matches", tournament_id=tournament_id)
-                    matches = self.cache.get(cache_key)
-                    
-                    if matches is None:
-                        # Not in cache, fetch from API
-                        raw_matches = self.soap_client.get_tournament_matches(tournament_id)
-                        if raw_matches:
-                            matches = [self._convert_match_data(raw_match, tournament) for raw_match in raw_matches]
-                            self.cache.set(cache_key, matches)
-                            
-                            # Add a small delay between API calls
-                            sleep(0.5)
-                    
-                    if matches:
-                        year_matches.extend(matches)
-                        total_matches += len(matches)
-                
-                matches_by_year[year] = year_matches
-                all_matches += year_matches
-
-                print(f"\nFound {len(year_matches)} matches in {year}")
+                tournaments_by_year[year] = tournaments
             else:
-                print(f"No tournaments found for {year}")
-                matches_by_year[year] = []
+                logger.info("No tournaments found for %s", year)
+        return tournaments_by_year
+
+    @staticmethod
+    def _match_jobs(years: List[int],
+                    tournaments_by_year: Dict[int, List[Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """(year, tournament) pairs of every tournament to fetch matches for, newest year first."""
+        jobs = [
+            (year, tournament)
+            for year in years
+            for tournament in tournaments_by_year.get(year, [])
+        ]
+        logger.info("Processing %d tournaments...", len(jobs))
+        return jobs
+
+    @staticmethod
+    def _match_failure(year: int, tournament: Dict[str, Any]) -> Dict[str, Any]:
+        return {'year': year, 'tournament_id': int(tournament['tournament_id']), 'reason': 'match fetch failed'}
+
+    @staticmethod
+    def _build_result(years: List[int], tournaments_by_year: Dict[int, List[Dict[str, Any]]],
+                      jobs: List[Tuple[int, Dict[str, Any]]], tournament_matches: Iterable[Optional[List[Match]]],
+                      failures: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Assemble the result of get_matches_for_years from the matches of every job."""
+        total_matches = 0
+        matches_by_year = {year: [] for year in years}
+        index = MatchIndex()
+
+        # Jobs are ordered newest year first, so the index holds matches in all_matches order
+        for i, ((year, tournament), matches) in enumerate(zip(jobs, tournament_matches), 1):
+            logger.debug("Checking tournament %d/%d: %s", i, len(jobs), tournament['name'])
+            if matches is None:
+                failures.append(MatchFetcher._match_failure(year, tournament))
+            elif matches:
+                matches_by_year[year].extend(matches)
+                index.add_matches(matches, year)
+                total_matches += len(matches)
+
+        for year in years:
+            if year in tournaments_by_year:
+                logger.info("Found %d matches in %s", len(matches_by_year[year]), year)
         
         return {
             'total_matches': total_matches,
             'matches_by_year': matches_by_year,
             'tournaments_by_year': tournaments_by_year,
-            'all_matches': all_matches,
+            'all_matches': index.matches,
+            'index': index,
+            'failures': failures,
         }
     
-    def filter_team_matches(self, matches: List[Dict[str, Any]], team_id: str) -> List[Dict[str, Any]]:
+    def filter_team_matches(self, matches: List[Match], team_id: Union[int, str]) -> List[Match]:
         """
         Filter matches to only include those involving a specific team.
         
@@ -125,7 +534,5 @@ class MatchFetcher:
         Returns:
             List of matches involving the specified team
         """
-        return [
-            match for match in matches
-            if team_id in [str(match.get('home_team_id')), str(match.get('away_team_id'))]
-        ] 
\ No newline at end of file
+        team_id = int(team_id)
+        return [match for match in matches if match.involves(team_id)]
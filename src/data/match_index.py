@@ -0,0 +1,91 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.data.match import Match
+
+
+class MatchIndex:
+    """
+    Index from teams, team pairs, tournaments and years to positions in a list of matches.
+
+    Matches are appended a tournament at a time and every lookup key is updated as
+    they are added, so finding a team's matches costs the same regardless of how
+    many other matches have been fetched.
+    """
+
+    def __init__(self):
+        self.matches: List[Match] = []
+        self._by_team: Dict[int, List[int]] = defaultdict(list)
+        self._by_team_year: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._by_pair: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._by_tournament: Dict[int, List[int]] = defaultdict(list)
+        self._by_year: Dict[int, List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    @staticmethod
+    def _pair_key(team_a: int, team_b: int) -> Tuple[int, int]:
+        return (team_a, team_b) if team_a <= team_b else (team_b, team_a)
+
+    def add_matches(self, matches: Iterable[Match], year: int) -> None:
+        """
+        Append matches to the index.
+
+        Args:
+            matches: Matches to add, typically all matches of one tournament
+            year: Season the matches belong to
+        """
+        for match in matches:
+            position = len(self.matches)
+            self.matches.append(match)
+            self._by_tournament[match.tournament_id].append(position)
+            self._by_year[year].append(position)
+
+            teams = {match.home_team_id, match.away_team_id}
+            teams.discard(None)
+            for team_id in teams:
+                self._by_team[team_id].append(position)
+                self._by_team_year[(team_id, year)].append(position)
+            if len(teams) == 2:
+                self._by_pair[self._pair_key(match.home_team_id, match.away_team_id)].append(position)
+
+    def _select(self, positions: Optional[List[int]]) -> List[Match]:
+        if not positions:
+            return []
+        return [self.matches[position] for position in positions]
+
+    def team_positions(self, team_id: int, year: Optional[int] = None) -> List[int]:
+        """Positions of a team's matches, optionally within one season."""
+        if year is None:
+            return self._by_team.get(team_id, [])
+        return self._by_team_year.get((team_id, year), [])
+
+    def for_team(self, team_id: int, year: Optional[int] = None) -> List[Match]:
+        """
+        Get the matches a team played in.
+
+        Args:
+            team_id: ID of the team
+            year: Optional season to restrict the matches to
+
+        Returns:
+            List of matches, in the order they were added
+        """
+        return self._select(self.team_positions(int(team_id), year))
+
+    def for_pair(self, team_a: int, team_b: int) -> List[Match]:
+        """Get the matches played between two teams."""
+        return self._select(self._by_pair.get(self._pair_key(int(team_a), int(team_b))))
+
+    def for_tournament(self, tournament_id: int) -> List[Match]:
+        """Get the matches of a tournament."""
+        return self._select(self._by_tournament.get(int(tournament_id)))
+
+    def for_year(self, year: int) -> List[Match]:
+        """Get the matches of a season."""
+        return self._select(self._by_year.get(year))
+
+    def team_ids(self) -> List[int]:
+        """IDs of all teams with at least one match in the index."""
+        return list(self._by_team)
@@ -0,0 +1,287 @@
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.const import TournamentStatus
+from src.data.match import Match
+from src.data.match_fetcher import FETCH_ERRORS, MatchFetcher
+from src.metrics import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs
+    import pyarrow.parquet as pq
+except ImportError:  # Optional, only needed to export and read match datasets
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Tables of a store, each a directory of files partitioned by the fields of PARTITION_SCHEMA
+MATCHES, TOURNAMENTS, STANDINGS = 'matches', 'tournaments', 'standings'
+FORMATS = {'parquet': 'parquet', 'arrow': 'arrow'}
+
+if pa is not None:
+    PARTITION_SCHEMA = pa.schema([
+        ('year', pa.int16()),
+        ('age_group_id', pa.int32()),
+        ('tournament_type', pa.int32()),
+    ])
+    # Columns of Match, in field order
+    MATCH_SCHEMA = pa.schema([
+        ('match_id', pa.int64()),
+        ('date', pa.timestamp('ms')),
+        ('home_team_id', pa.int32()),
+        ('away_team_id', pa.int32()),
+        ('home_team_name', pa.string()),
+        ('away_team_name', pa.string()),
+        ('home_score', pa.int16()),
+        ('away_score', pa.int16()),
+        ('venue', pa.string()),
+        ('is_played', pa.bool_()),
+        ('tournament_id', pa.int32()),
+        ('tournament_name', pa.string()),
+    ])
+    # Tournaments as returned by KSIWebScraper, without the year, which is a partition field
+    TOURNAMENT_SCHEMA = pa.schema([
+        ('tournament_id', pa.int32()),
+        ('name', pa.string()),
+        ('url', pa.string()),
+        ('status', pa.string()),
+        ('category', pa.string()),
+        ('age_group', pa.string()),
+        ('gender', pa.string()),
+    ])
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def matches_table(matches: List[Match]) -> 'pa.Table':
+    """Build an Arrow table of matches with the columns of MATCH_SCHEMA."""
+    return pa.Table.from_arrays(
+        [pa.array([getattr(match, field.name) for match in matches], type=field.type) for field in MATCH_SCHEMA],
+        schema=MATCH_SCHEMA,
+    )
+
+
+def tournaments_table(tournaments: List[Dict[str, Any]]) -> 'pa.Table':
+    """Build an Arrow table of tournaments with the columns of TOURNAMENT_SCHEMA."""
+    columns = {field.name: [] for field in TOURNAMENT_SCHEMA}
+    for tournament in tournaments:
+        columns['tournament_id'].append(_to_int(tournament.get('tournament_id')))
+        for name in TOURNAMENT_SCHEMA.names[1:]:
+            columns[name].append(tournament.get(name))
+    return pa.table(columns, schema=TOURNAMENT_SCHEMA)
+
+
+def standings_table(tournament_id: int, standings: List[Dict[str, Any]]) -> 'pa.Table':
+    """
+    Build an Arrow table of the standings of a tournament.
+
+    The fields of the SOAP records are kept as they are, as int64 columns when
+    every value is an integer and as strings otherwise.
+    """
+    names = list(dict.fromkeys(name for row in standings for name in row))
+    columns = {'tournament_id': pa.array([tournament_id] * len(standings), pa.int32())}
+    for name in names:
+        values = [row.get(name) for row in standings]
+        ints = [_to_int(value) for value in values]
+        if all(i is not None or v in (None, '') for i, v in zip(ints, values)):
+            columns[name] = pa.array(ints, pa.int64())
+        else:
+            columns[name] = pa.array([None if v is None else str(v) for v in values], pa.string())
+    return pa.table(columns)
+
+
+class MatchStore:
+    """
+    Matches, tournaments and standings exported to a partitioned Parquet or Arrow IPC dataset.
+
+    Every table is a directory partitioned Hive style by year, age group and
+    tournament type (e.g. matches/year=2024/age_group_id=420/tournament_type=61/),
+    holding one file per tournament, or one per partition for the tournament
+    lists. Exporting again replaces the files of the tournaments exported and
+    adds those that are new. Files are written to a hidden temporary file and
+    renamed, so readers never see one half written.
+
+    Reads memory-map the files and only open the partitions and columns asked
+    for. Arrow IPC files are written uncompressed and are read without copying
+    or decoding; Parquet files are smaller but are decoded on every read.
+    """
+
+    def __init__(self, directory: str, format: Optional[str] = None):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Root directory of the dataset
+            format: 'parquet' or 'arrow' (Arrow IPC), a store holding one format
+                (default: the format of the files already in the directory, else parquet)
+        """
+        if pa is None:
+            raise ImportError("Exporting and reading match datasets requires the pyarrow package")
+        format = format or self._existing_format(directory) or 'parquet'
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(FORMATS)}")
+        self.directory = directory
+        self.format = format
+        self._filesystem = pyarrow.fs.LocalFileSystem(use_mmap=True)
+        self._partitioning = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+    @staticmethod
+    def _existing_format(directory: str) -> Optional[str]:
+        for _, _, files in os.walk(directory):
+            for name in files:
+                extension = os.path.splitext(name)[1][1:]
+                if not name.startswith('.') and extension in FORMATS.values():
+                    return next(format for format, ext in FORMATS.items() if ext == extension)
+        return None
+
+    def _path(self, table: str, year: int, age_group_id: int, tournament_type: int, name: str) -> str:
+        return os.path.join(self.directory, table, f"year={year}", f"age_group_id={age_group_id}",
+                            f"tournament_type={tournament_type}", f"{name}.{FORMATS[self.format]}")
+
+    def _write(self, table: str, year: int, age_group_id: int, tournament_type: int, name: str,
+               rows: 'pa.Table') -> None:
+        """Write the rows of one file of a table, replacing the file atomically."""
+        directory, file_name = os.path.split(self._path(table, year, age_group_id, tournament_type, name))
+        os.makedirs(directory, exist_ok=True)
+        # Hidden files are ignored by dataset discovery until renamed
+        temp_path = os.path.join(directory, f".{file_name}.{os.getpid()}.tmp")
+        if self.format == 'parquet':
+            pq.write_table(rows, temp_path, compression='zstd')
+        else:
+            with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, rows.schema) as writer:
+                writer.write_table(rows)
+        os.replace(temp_path, os.path.join(directory, file_name))
+        metrics.inc('export_rows_total', rows.num_rows, table=table)
+
+    def write_matches(self, year: int, age_group_id: int, tournament_type: int, tournament_id: int,
+                      matches: List[Match]) -> None:
+        """Write the matches of a tournament, replacing those exported before."""
+        self._write(MATCHES, year, age_group_id, tournament_type, f"tournament-{tournament_id}",
+                    matches_table(matches))
+
+    def write_tournaments(self, year: int, age_group_id: int, tournament_type: int,
+                          tournaments: List[Dict[str, Any]]) -> None:
+        """Write the tournament list of a year, replacing the one exported before."""
+        self._write(TOURNAMENTS, year, age_group_id, tournament_type, 'tournaments',
+                    tournaments_table(tournaments))
+
+    def write_standings(self, year: int, age_group_id: int, tournament_type: int, tournament_id: int,
+                        standings: List[Dict[str, Any]]) -> None:
+        """Write the standings of a tournament, replacing those exported before."""
+        self._write(STANDINGS, year, age_group_id, tournament_type, f"tournament-{tournament_id}",
+                    standings_table(tournament_id, standings))
+
+    def has_standings(self, year: int, age_group_id: int, tournament_type: int, tournament_id: int) -> bool:
+        return os.path.exists(self._path(STANDINGS, year, age_group_id, tournament_type,
+                                         f"tournament-{tournament_id}"))
+
+    def export(self, fetcher: MatchFetcher, age_group_id: int, start_year: int, end_year: int,
+               tournament_type: int, standings: bool = False, offline: bool = False) -> Dict[str, Any]:
+        """
+        Export the tournaments and matches of an age group between specified years.
+
+        Matches are streamed from the fetcher and written one tournament at a
+        time, so the whole range is never held in memory. Standings are fetched
+        for tournaments without exported standings and for those not finished yet.
+
+        Args:
+            fetcher: Fetcher to read the matches with, from its cache where possible
+            age_group_id: The ID of the age group to export
+            start_year: Start year (inclusive)
+            end_year: End year (inclusive)
+            tournament_type: Tournament type ID to export
+            standings: Also export the standings of every tournament
+            offline: Never use the network, as in MatchFetcher.get_matches_for_years
+
+        Returns:
+            Dictionary with the number of tournaments, matches and standings rows
+            exported, and the failures in the format of get_matches_for_years
+        """
+        failures: List[Dict[str, Any]] = []
+        totals = {'tournaments': 0, 'matches': 0, 'standings': 0}
+        years = set()
+        for year, tournament, matches in fetcher.iter_matches(age_group_id, start_year, end_year, tournament_type,
+                                                             offline=offline, failures=failures):
+            tournament_id = int(tournament['tournament_id'])
+            self.write_matches(year, age_group_id, tournament_type, tournament_id, matches)
+            years.add(year)
+            totals['tournaments'] += 1
+            totals['matches'] += len(matches)
+            if standings and not offline and (
+                    not TournamentStatus.is_finished(tournament.get('status'))
+                    or not self.has_standings(year, age_group_id, tournament_type, tournament_id)):
+                try:
+                    rows = fetcher.soap_client.get_tournament_standings(tournament_id)
+                except FETCH_ERRORS as e:
+                    logger.error("Error fetching standings for tournament %s: %s", tournament_id, e)
+                    failures.append({'year': year, 'tournament_id': tournament_id,
+                                     'reason': 'standings fetch failed'})
+                    continue
+                self.write_standings(year, age_group_id, tournament_type, tournament_id, rows)
+                totals['standings'] += len(rows)
+
+        # The lists were read by iter_matches, so these come from the cache
+        for year in sorted(years):
+            tournaments = fetcher.get_tournaments(age_group_id, year, tournament_type)
+            if tournaments is not None:
+                self.write_tournaments(year, age_group_id, tournament_type, tournaments)
+        return {**totals, 'failures': failures}
+
+    def dataset(self, table: str = MATCHES) -> 'ds.Dataset':
+        """Open a table of the store as a memory-mapped pyarrow dataset, discovering its files."""
+        path = os.path.join(self.directory, table)
+        fmt = 'parquet' if self.format == 'parquet' else 'ipc'
+        dataset = ds.dataset(path, format=fmt, partitioning=self._partitioning, filesystem=self._filesystem)
+        if table != STANDINGS:
+            return dataset
+        # Standings keep the fields of the SOAP records, which may differ between tournaments
+        schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+        if not schemas:
+            return dataset
+        schema = pa.unify_schemas(schemas + [PARTITION_SCHEMA], promote_options='permissive')
+        return ds.dataset(path, format=fmt, partitioning=self._partitioning, filesystem=self._filesystem,
+                          schema=schema)
+
+    def read(self, table: str = MATCHES, years: Optional[Iterable[int]] = None,
+             age_groups: Optional[Iterable[int]] = None, tournament_types: Optional[Iterable[int]] = None,
+             columns: Optional[List[str]] = None, team_id: Optional[int] = None) -> 'pa.Table':
+        """
+        Read a table, opening only the partitions and columns asked for.
+
+        Args:
+            table: MATCHES, TOURNAMENTS or STANDINGS
+            years: Seasons to read (default: all)
+            age_groups: Age group IDs to read (default: all)
+            tournament_types: Tournament type IDs to read (default: all)
+            columns: Columns to read, partition fields included (default: all)
+            team_id: Only read matches the team played in (matches only)
+
+        Returns:
+            Arrow table, empty if nothing has been exported to the table
+        """
+        if not os.path.isdir(os.path.join(self.directory, table)):
+            schema = {MATCHES: MATCH_SCHEMA, TOURNAMENTS: TOURNAMENT_SCHEMA}.get(table, pa.schema([]))
+            schema = pa.unify_schemas([schema, PARTITION_SCHEMA])
+            return schema.empty_table().select(columns) if columns else schema.empty_table()
+
+        condition = None
+        for name, values in (('year', years), ('age_group_id', age_groups), ('tournament_type', tournament_types)):
+            if values is not None:
+                condition = self._and(condition, ds.field(name).isin(list(values)))
+        if team_id is not None:
+            condition = self._and(condition, (ds.field('home_team_id') == team_id)
+                                  | (ds.field('away_team_id') == team_id))
+        with metrics.timer('export_read_seconds', table=table):
+            return self.dataset(table).to_table(columns=columns, filter=condition)
+
+    @staticmethod
+    def _and(condition: Optional['ds.Expression'], other: 'ds.Expression') -> 'ds.Expression':
+        return other if condition is None else condition & other
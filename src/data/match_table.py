@@ -0,0 +1,198 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.data.match import Match
+
+RESULTS = ('win', 'draw', 'loss', 'not_played')
+FAIRNESS = ('fair', 'uneven', 'devastating', 'not_played')
+
+WIN, DRAW, LOSS, NOT_PLAYED = range(4)
+FAIR, UNEVEN, DEVASTATING = range(3)
+
+GROUP_COLUMNS = ('year', 'tournament', 'team')
+
+# Sentinel for missing team ids in the integer columns
+NO_TEAM = -1
+
+GroupBy = Union[None, str, Sequence[str]]
+
+
+class MatchTable:
+    """
+    Columnar, NumPy-backed table of matches for computing statistics in batch.
+
+    Win/draw/loss and fairness buckets are computed once for every match when the
+    table is built. Counts for any grouping over year, tournament and team are
+    then produced with a single bincount instead of a Python loop per group.
+    """
+
+    def __init__(self, matches: Sequence[Match], years: Optional[Sequence[int]] = None):
+        """
+        Build the table.
+
+        Args:
+            matches: Matches to include
+            years: Season of each match (default: the year of the match date)
+        """
+        count = len(matches)
+        self.matches = matches
+        self.home_team_id = np.fromiter(
+            (NO_TEAM if m.home_team_id is None else m.home_team_id for m in matches), dtype=np.int64, count=count)
+        self.away_team_id = np.fromiter(
+            (NO_TEAM if m.away_team_id is None else m.away_team_id for m in matches), dtype=np.int64, count=count)
+        self.home_score = np.fromiter((m.home_score or 0 for m in matches), dtype=np.int64, count=count)
+        self.away_score = np.fromiter((m.away_score or 0 for m in matches), dtype=np.int64, count=count)
+        self.is_played = np.fromiter((m.is_played for m in matches), dtype=bool, count=count)
+        self.tournament_id = np.fromiter((m.tournament_id for m in matches), dtype=np.int64, count=count)
+        if years is None:
+            years = [m.date.year if m.date else 0 for m in matches]
+        self.year = np.asarray(years, dtype=np.int64).reshape(count)
+
+        # Result from the home team's perspective
+        home_result = np.select(
+            [self.home_score > self.away_score, self.home_score == self.away_score],
+            [WIN, DRAW],
+            default=LOSS,
+        )
+        self.home_result = np.where(self.is_played, home_result, NOT_PLAYED)
+        # The away team's result is the mirror image
+        self.away_result = np.where(self.is_played, 2 - home_result, NOT_PLAYED)
+
+        goal_diff = np.abs(self.home_score - self.away_score)
+        fairness = np.select([goal_diff <= 2, goal_diff <= 5], [FAIR, UNEVEN], default=DEVASTATING)
+        self.fairness = np.where(self.is_played, fairness, NOT_PLAYED)
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> 'MatchTable':
+        """Build a table of all_matches from the result of MatchFetcher.get_matches_for_years."""
+        matches: List[Match] = []
+        years: List[int] = []
+        for year, year_matches in result['matches_by_year'].items():
+            matches.extend(year_matches)
+            years.extend([year] * len(year_matches))
+        return cls(matches, years)
+
+    def __len__(self) -> int:
+        return len(self.matches)
+
+    def team_mask(self, team_id: int) -> np.ndarray:
+        """Boolean mask of the matches a team played in."""
+        return (self.home_team_id == team_id) | (self.away_team_id == team_id)
+
+    def for_team(self, team_id: int) -> List[Match]:
+        """Get the matches a team played in, in table order."""
+        return [self.matches[row] for row in np.flatnonzero(self.team_mask(int(team_id)))]
+
+    def _team_rows(self, team_id: Optional[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Rows of the table seen from each participating team.
+
+        Returns:
+            Tuple of match row indices, result codes and team ids. Without a team_id
+            every match appears twice, once for the home and once for the away team.
+        """
+        if team_id is not None:
+            rows = np.flatnonzero(self.team_mask(team_id))
+            is_home = self.home_team_id[rows] == team_id
+            results = np.where(is_home, self.home_result[rows], self.away_result[rows])
+            return rows, results, np.full(len(rows), team_id, dtype=np.int64)
+
+        rows = np.arange(len(self), dtype=np.int64)
+        return (
+            np.concatenate([rows, rows]),
+            np.concatenate([self.home_result, self.away_result]),
+            np.concatenate([self.home_team_id, self.away_team_id]),
+        )
+
+    def _group_columns(self, rows: np.ndarray, teams: Optional[np.ndarray], by: Sequence[str]) -> List[np.ndarray]:
+        columns = []
+        for name in by:
+            if name == 'year':
+                columns.append(self.year[rows])
+            elif name == 'tournament':
+                columns.append(self.tournament_id[rows])
+            elif name == 'team':
+                columns.append(teams)
+            else:
+                raise ValueError(f"Cannot group by {name}, expected one of {GROUP_COLUMNS}")
+        return columns
+
+    @staticmethod
+    def _count(codes: np.ndarray, labels: Sequence[str], columns: List[np.ndarray]) -> Dict[Any, Dict[str, int]]:
+        """Count codes per group in a single bincount."""
+        size = len(labels)
+        if not columns:
+            counts = np.bincount(codes, minlength=size)
+            return dict(zip(labels, counts.tolist()))
+
+        if len(codes) == 0:
+            return {}
+
+        # Combine the factorized columns into a single integer group code
+        combined = np.zeros(len(codes), dtype=np.int64)
+        column_values = []
+        for column in columns:
+            values, inverse = np.unique(column, return_inverse=True)
+            combined = combined * len(values) + inverse.reshape(-1)
+            column_values.append(values)
+        group_codes, inverse = np.unique(combined, return_inverse=True)
+        counts = np.bincount(inverse.reshape(-1) * size + codes, minlength=len(group_codes) * size)
+        counts = counts.reshape(len(group_codes), size)
+
+        # Decode the group codes back into the column values
+        keys = []
+        remaining = group_codes
+        for values in reversed(column_values):
+            keys.append(values[remaining % len(values)].tolist())
+            remaining = remaining // len(values)
+        keys.reverse()
+
+        grouped = {}
+        for key, row in zip(zip(*keys), counts.tolist()):
+            grouped[key[0] if len(key) == 1 else key] = dict(zip(labels, row))
+        return grouped
+
+    @staticmethod
+    def _normalize_by(by: GroupBy) -> Tuple[str, ...]:
+        if by is None:
+            return ()
+        if isinstance(by, str):
+            return (by,)
+        return tuple(by)
+
+    def result_counts(self, team_id: Optional[int] = None, by: GroupBy = None) -> Dict[Any, Any]:
+        """
+        Count wins, draws, losses and unplayed matches.
+
+        Args:
+            team_id: Team to count results for. Without it, results of every team
+                are counted, which is only meaningful when grouping by 'team'.
+            by: Column or columns to group by: 'year', 'tournament' and/or 'team'
+
+        Returns:
+            Counts keyed by result, or a dict of such counts keyed by group value
+            (a tuple of values when grouping by several columns)
+        """
+        by = self._normalize_by(by)
+        rows, results, teams = self._team_rows(team_id)
+        return self._count(results, RESULTS, self._group_columns(rows, teams, by))
+
+    def fairness_counts(self, team_id: Optional[int] = None, by: GroupBy = None) -> Dict[Any, Any]:
+        """
+        Count fair, uneven, devastating and unplayed matches.
+
+        Args:
+            team_id: Only count the matches this team played in
+            by: Column or columns to group by: 'year', 'tournament' and/or 'team'
+
+        Returns:
+            Counts keyed by fairness bucket, or a dict of such counts keyed by group value
+        """
+        by = self._normalize_by(by)
+        if team_id is None and 'team' not in by:
+            rows = np.arange(len(self), dtype=np.int64)
+            teams = None
+        else:
+            rows, _, teams = self._team_rows(team_id)
+        return self._count(self.fairness[rows], FAIRNESS, self._group_columns(rows, teams, by))
@@ -1,6 +1,7 @@
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Optional
 from datetime import datetime
+from src.data.match_store import MATCHES, STANDINGS, TOURNAMENTS, MatchStore
 
 class DataProcessor:
     """Process and clean data from the KSÍ API."""
@@ -35,6 +36,29 @@ class DataProcessor:
             df['DAGS'] = pd.to_datetime(df['DAGS'])
         return df
     
+    @staticmethod
+    def load_matches(directory: str, years: Optional[Iterable[int]] = None, age_groups: Optional[Iterable[int]] = None,
+                     tournament_types: Optional[Iterable[int]] = None, columns: Optional[List[str]] = None,
+                     team_id: Optional[int] = None, format: Optional[str] = None) -> pd.DataFrame:
+        """Load exported matches as a DataFrame, reading only the partitions and columns asked for."""
+        return MatchStore(directory, format).read(MATCHES, years, age_groups, tournament_types, columns,
+                                                  team_id).to_pandas()
+
+    @staticmethod
+    def load_tournaments(directory: str, years: Optional[Iterable[int]] = None,
+                         age_groups: Optional[Iterable[int]] = None, tournament_types: Optional[Iterable[int]] = None,
+                         format: Optional[str] = None) -> pd.DataFrame:
+        """Load exported tournament lists as a DataFrame."""
+        return MatchStore(directory, format).read(TOURNAMENTS, years, age_groups, tournament_types).to_pandas()
+
+    @staticmethod
+    def load_standings(directory: str, years: Optional[Iterable[int]] = None,
+                       age_groups: Optional[Iterable[int]] = None, tournament_types: Optional[Iterable[int]] = None,
+                       format: Optional[str] = None) -> pd.DataFrame:
+        """Load exported standings as a DataFrame, with readable column names like process_standings."""
+        df = MatchStore(directory, format).read(STANDINGS, years, age_groups, tournament_types).to_pandas()
+        return DataProcessor.process_standings(df)
+
     @staticmethod
     def calculate_team_stats(matches_df: pd.DataFrame) -> pd.DataFrame:
         """Calculate additional team statistics from matches data."""
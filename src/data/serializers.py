@@ -0,0 +1,223 @@
+import pickle
+import struct
+import sys
+import zlib
+from dataclasses import fields
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from src.data.match import Match
+
+try:
+    import msgpack
+except ImportError:  # Optional, pickle is used for the columns without it
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # Optional, zlib is used without it
+    zstandard = None
+
+# Header of every serialized value: magic, format version, payload kind, encoding, compression
+MAGIC = b'KSIC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>4sBBBB')
+
+# Payload kinds
+KIND_PICKLE = 0    # Any value, pickled as is
+KIND_MATCHES = 1   # List of Match records, stored as columns
+KIND_RECORDS = 2   # List of dicts sharing the same keys, stored as columns
+
+# Encodings of columnar payloads
+ENCODING_PICKLE = 0
+ENCODING_MSGPACK = 1
+
+# Compression codecs
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+COMPRESSION_NAMES = {'none': COMPRESSION_NONE, 'zlib': COMPRESSION_ZLIB, 'zstd': COMPRESSION_ZSTD}
+
+MATCH_FIELDS = [f.name for f in fields(Match)]
+MATCH_STRING_FIELDS = {'home_team_name', 'away_team_name', 'venue', 'tournament_name'}
+EPOCH = datetime(1970, 1, 1)
+
+
+def is_serialized(data: Any) -> bool:
+    """Check if a value was produced by one of the serializers in this module."""
+    return isinstance(data, bytes) and data[:len(MAGIC)] == MAGIC
+
+
+class PickleSerializer:
+    """Serializer pickling values as is, equivalent to diskcache's default storage."""
+
+    def dumps(self, value: Any) -> bytes:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        return HEADER.pack(MAGIC, FORMAT_VERSION, KIND_PICKLE, ENCODING_PICKLE, COMPRESSION_NONE) + payload
+
+    def loads(self, data: bytes) -> Any:
+        return loads(data)
+
+
+class CompactSerializer:
+    """
+    Serializer storing lists of matches and tournaments as compressed columns.
+
+    Column names are stored once instead of once per row, repeated team,
+    venue and tournament names are dictionary encoded and dates are stored as
+    integer seconds, dropping any fraction of a second (KSÍ gives match times
+    in whole minutes). Timezone-aware dates, which the columns cannot hold,
+    fall back to pickle. Columns are packed with msgpack when it is installed and
+    compressed with zstd when it is installed, otherwise pickle and zlib are used.
+    """
+
+    def __init__(self, compression: Optional[str] = None, level: Optional[int] = None):
+        """
+        Initialize the serializer.
+
+        Args:
+            compression: 'zstd', 'zlib' or 'none' (default: zstd if installed, else zlib)
+            level: Compression level (default: the codec's default)
+        """
+        if compression is None:
+            compression = 'zstd' if zstandard is not None else 'zlib'
+        if compression not in COMPRESSION_NAMES:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package")
+        self.compression = COMPRESSION_NAMES[compression]
+        self.level = level
+        self.encoding = ENCODING_MSGPACK if msgpack is not None else ENCODING_PICKLE
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            if _is_match_list(value):
+                kind, columns, encoding = KIND_MATCHES, _match_columns(value), self.encoding
+            elif _is_record_list(value):
+                kind, columns, encoding = KIND_RECORDS, _record_columns(value), self.encoding
+            else:
+                kind, columns, encoding = KIND_PICKLE, value, ENCODING_PICKLE
+        except (TypeError, ValueError, OverflowError):
+            # Values the columns cannot represent, such as timezone-aware or out of range dates
+            kind, columns, encoding = KIND_PICKLE, value, ENCODING_PICKLE
+
+        try:
+            payload = _encode(columns, encoding)
+        except (TypeError, ValueError, OverflowError):
+            # Values msgpack cannot represent
+            encoding = ENCODING_PICKLE
+            payload = _encode(columns, encoding)
+        payload = _compress(payload, self.compression, self.level)
+        return HEADER.pack(MAGIC, FORMAT_VERSION, kind, encoding, self.compression) + payload
+
+    def loads(self, data: bytes) -> Any:
+        return loads(data)
+
+
+def loads(data: bytes) -> Any:
+    """
+    Deserialize a value written by any serializer in this module.
+
+    Raises:
+        ValueError: If the data is not serialized or uses a newer format version
+    """
+    if not is_serialized(data):
+        raise ValueError("Data was not written by a cache serializer")
+    _, version, kind, encoding, compression = HEADER.unpack_from(data)
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Unsupported cache format version {version}")
+
+    payload = _decompress(data[HEADER.size:], compression)
+    columns = _decode(payload, encoding)
+    if kind == KIND_MATCHES:
+        return _matches_from_columns(columns)
+    if kind == KIND_RECORDS:
+        return _records_from_columns(columns)
+    return columns
+
+
+def _encode(value: Any, encoding: int) -> bytes:
+    if encoding == ENCODING_MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(payload: bytes, encoding: int) -> Any:
+    if encoding == ENCODING_MSGPACK:
+        if msgpack is None:
+            raise ImportError("Reading this cache entry requires the msgpack package")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    return pickle.loads(payload)
+
+
+def _compress(payload: bytes, compression: int, level: Optional[int]) -> bytes:
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=level or 3).compress(payload)
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(payload, 6 if level is None else level)
+    return payload
+
+
+def _decompress(payload: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise ImportError("Reading this cache entry requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(payload)
+    return payload
+
+
+def _is_match_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(item, Match) for item in value)
+
+
+def _is_record_list(value: Any) -> bool:
+    if not isinstance(value, list) or not value or not isinstance(value[0], dict):
+        return False
+    keys = list(value[0])
+    return all(isinstance(item, dict) and list(item) == keys for item in value)
+
+
+def _dictionary_encode(values: List[Optional[str]]) -> Dict[str, list]:
+    """Store each distinct string once and the column as indexes into them."""
+    distinct: Dict[Optional[str], int] = {}
+    codes = [distinct.setdefault(value, len(distinct)) for value in values]
+    return {'values': list(distinct), 'codes': codes}
+
+
+def _match_columns(matches: List[Match]) -> Dict[str, Any]:
+    """Columns of a list of matches, with dates truncated to whole seconds since the epoch."""
+    columns: Dict[str, Any] = {}
+    for name in MATCH_FIELDS:
+        values = [getattr(match, name) for match in matches]
+        if name == 'date':
+            values = [None if d is None else int((d - EPOCH).total_seconds()) for d in values]
+        elif name in MATCH_STRING_FIELDS:
+            values = _dictionary_encode(values)
+        columns[name] = values
+    return columns
+
+
+def _matches_from_columns(columns: Dict[str, Any]) -> List[Match]:
+    decoded = []
+    for name in MATCH_FIELDS:
+        values = columns[name]
+        if name == 'date':
+            values = [None if s is None else EPOCH + timedelta(seconds=s) for s in values]
+        elif name in MATCH_STRING_FIELDS:
+            names = [sys.intern(v) if v else v for v in values['values']]
+            values = [names[code] for code in values['codes']]
+        decoded.append(values)
+    return [Match(*row) for row in zip(*decoded)]
+
+
+def _record_columns(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    keys = list(records[0])
+    return {'keys': keys, 'columns': [[record[key] for record in records] for key in keys]}
+
+
+def _records_from_columns(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    keys = columns['keys']
+    return [dict(zip(keys, row)) for row in zip(*columns['columns'])]
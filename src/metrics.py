@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _prometheus_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Histogram:
+    """Cumulative histogram of observed values with fixed bucket bounds."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Number of observations at or below each bucket bound."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': {str(bound): count for bound, count in self.cumulative()},
+        }
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters, gauges and histograms, labelled like Prometheus metrics.
+
+    The fetch pipeline records into the process-wide registry `metrics`, which
+    is exported at the end of a run with to_json or to_prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Add value to a counter."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        """Set a gauge to value."""
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Record a value, typically a duration in seconds, in a histogram."""
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """Record the wall time of the with block in a histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name: str, **labels: Any) -> float:
+        """Current value of a counter, summed over all label values not given."""
+        wanted = set(_labels(labels))
+        with self._lock:
+            return sum(value for key, value in self._counters.get(name, {}).items() if wanted <= set(key))
+
+    def reset(self) -> None:
+        """Remove every recorded metric."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get every metric as plain data.
+
+        Returns:
+            Dictionary with counters, gauges and histograms, each mapping a metric
+            name to a list of {'labels': {...}, ...} series
+        """
+        with self._lock:
+            return {
+                'counters': {
+                    name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                'gauges': {
+                    name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                'histograms': {
+                    name: [{'labels': dict(key), **histogram.as_dict()} for key, histogram in series.items()]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+
+    def to_prometheus(self) -> str:
+        """Format every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f'# TYPE {name} counter')
+                lines.extend(f'{name}{_prometheus_labels(key)} {value}' for key, value in series.items())
+            for name, series in sorted(self._gauges.items()):
+                lines.append(f'# TYPE {name} gauge')
+                lines.extend(f'{name}{_prometheus_labels(key)} {value}' for key, value in series.items())
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f'# TYPE {name} histogram')
+                for key, histogram in series.items():
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{_prometheus_labels(key, (("le", str(bound)),))} {count}')
+                    lines.append(f'{name}_bucket{_prometheus_labels(key, (("le", "+Inf"),))} {histogram.count}')
+                    lines.append(f'{name}_sum{_prometheus_labels(key)} {histogram.sum}')
+                    lines.append(f'{name}_count{_prometheus_labels(key)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """Write the metrics to a file, in Prometheus text format if it ends in .prom, else as JSON."""
+        content = self.to_prometheus() if path.endswith('.prom') else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+# Registry the fetch pipeline records into
+metrics = Metrics()
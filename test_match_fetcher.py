@@ -1,12 +1,38 @@
-from src.api.ksi_client import KSIClient
-from src.api.web_scraper import KSIWebScraper
+import argparse
+import tempfile
+from src.api.fixtures import FixtureStore, RecordingTransport
+from src.api.http_transport import HttpTransport
+from src.api.ksi_client import KSIClient, SOAP_URL
+from src.api.standin_server import StandInServer
+from src.api.web_scraper import KSIWebScraper, TOURNAMENTS_URL
 from src.data.match_fetcher import MatchFetcher
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description='Exercise the KSÍ clients and MatchFetcher.')
+    parser.add_argument('--record', metavar='DIR', default=None,
+                      help='Save the responses from ksi.is to this fixture directory')
+    parser.add_argument('--replay', metavar='DIR', default=None,
+                      help='Replay responses from this fixture directory instead of calling ksi.is')
+    return parser.parse_args()
+
+def main(record_dir=None, replay_dir=None):
     # Initialize components
-    soap_client = KSIClient()
-    web_scraper = KSIWebScraper()
-    match_fetcher = MatchFetcher(soap_client, web_scraper)
+    transport = RecordingTransport(FixtureStore(record_dir)) if record_dir else HttpTransport()
+    server = None
+    cache_dir = "cache"
+    soap_url, tournaments_url = SOAP_URL, TOURNAMENTS_URL
+    if replay_dir:
+        server = StandInServer(FixtureStore(replay_dir)).start()
+        soap_url, tournaments_url = server.url_for(SOAP_URL), server.url_for(TOURNAMENTS_URL)
+        # Start from an empty cache so every request goes to the stand-in server
+        cache_dir = tempfile.mkdtemp(prefix='ksi-replay-cache-')
+    elif record_dir:
+        # Start from an empty cache so every response gets recorded
+        cache_dir = tempfile.mkdtemp(prefix='ksi-record-cache-')
+
+    soap_client = KSIClient(transport, base_url=soap_url)
+    web_scraper = KSIWebScraper(transport, base_url=tournaments_url)
+    match_fetcher = MatchFetcher(soap_client, web_scraper, cache_dir=cache_dir)
     
     # Test direct SOAP call first
     print("\nTesting direct SOAP call for matches...")
@@ -41,8 +67,14 @@ def main():
         print(f"- Total matches: {len(matches)}")
         if matches:
             print("\nFirst match data:")
-            for key, value in matches[0].items():
+            for key, value in matches[0].to_dict().items():
                 print(f"  {key}: {value}")
 
+    match_fetcher.cache.close()
+    transport.close()
+    if server is not None:
+        server.stop()
+
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    args = parse_args()
+    main(record_dir=args.record, replay_dir=args.replay)
@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api.fixtures import FixtureStore, fixture_key  # noqa: E402
+from src.api.http_transport import HttpTransport  # noqa: E402
+from src.api.ksi_client import KSIClient, SOAP_URL  # noqa: E402
+from src.api.standin_server import StandInServer  # noqa: E402
+
+
+def soap_matches(count: int) -> bytes:
+    """MotLeikir response body with count played matches."""
+    records = ''.join(
+        f'<MotLeikur><LeikurNumer>{i}</LeikurNumer><LeikDagur>2024-05-12T17:00:00</LeikDagur>'
+        f'<FelagHeimaNumer>170</FelagHeimaNumer><FelagUtiNumer>{i + 1}</FelagUtiNumer>'
+        f'<FelagHeimaNafn>Grótta</FelagHeimaNafn><FelagUtiNafn>Lið {i}</FelagUtiNafn>'
+        f'<UrslitHeima>{i % 4}</UrslitHeima><UrslitUti>1</UrslitUti></MotLeikur>'
+        for i in range(count)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?><soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+        '<soap:Body><MotLeikirResponse xmlns="http://www2.ksi.is/vefthjonustur/mot/"><MotLeikirSvar>'
+        f'<ArrayMotLeikir>{records}</ArrayMotLeikir><Villubod/></MotLeikirSvar></MotLeikirResponse>'
+        '</soap:Body></soap:Envelope>'
+    ).encode('utf-8')
+
+
+def record_matches(store: FixtureStore, client: KSIClient, tournament_id: int, count: int) -> None:
+    """Save the MotLeikir response of a tournament to a fixture store, as if client had recorded it from KSÍ."""
+    data, headers = client._soap_request(
+        'MotLeikir', f'<tns:MotLeikir><tns:MotNumer>{tournament_id}</tns:MotNumer></tns:MotLeikir>')
+    response = requests.Response()
+    response.status_code = 200
+    response.url = SOAP_URL
+    response.headers['Content-Type'] = 'text/xml; charset=utf-8'
+    response._content = soap_matches(count)
+    store.save(fixture_key('POST', SOAP_URL, headers, data), response, 'MotLeikir')
+
+
+@pytest.fixture
+def standin(tmp_path):
+    """Stand-in KSÍ server answering MotLeikir for tournament 1 with 20 matches after 200 ms."""
+    store = FixtureStore(str(tmp_path / 'fixtures'))
+    with HttpTransport() as transport:
+        record_matches(store, KSIClient(transport), 1, 20)
+    with StandInServer(store, latency=0.2) as server:
+        yield server
@@ -0,0 +1,49 @@
+import asyncio
+
+from src.api.async_ksi_client import AsyncKSIClient
+from src.api.async_transport import AsyncHttpTransport
+from src.api.async_web_scraper import AsyncKSIWebScraper
+from src.api.ksi_client import SOAP_URL
+from src.data.async_match_fetcher import AsyncMatchFetcher
+
+TOURNAMENT = {'tournament_id': '1', 'name': 'Íslandsmót', 'status': 'Í gangi'}
+
+
+def _fetcher(standin, transport, cache_dir):
+    return AsyncMatchFetcher(AsyncKSIClient(transport, base_url=standin.url_for(SOAP_URL)),
+                             AsyncKSIWebScraper(transport), requests_per_second=100, cache_dir=cache_dir)
+
+
+def test_concurrent_coroutines_send_one_request(standin, tmp_path):
+    async def run():
+        async with AsyncHttpTransport() as transport:
+            fetcher = _fetcher(standin, transport, str(tmp_path / 'cache'))
+            results = await asyncio.gather(*[fetcher.get_tournament_matches(2024, TOURNAMENT)] * 8)
+            fetcher.cache.close()
+            return transport.stats.requests, results
+
+    requests, results = asyncio.run(run())
+
+    assert requests == 1
+    assert [len(matches) for matches in results] == [20] * 8
+
+
+def test_cancelled_fetch_releases_its_lease(standin, tmp_path):
+    async def run():
+        async with AsyncHttpTransport() as transport:
+            fetcher = _fetcher(standin, transport, str(tmp_path / 'cache'))
+            cache_key, _ = fetcher.fetcher._matches_keys(1)
+            task = asyncio.ensure_future(fetcher.get_tournament_matches(2024, TOURNAMENT))
+            # The stand-in server answers after 200 ms, so the lease is held by now
+            await asyncio.sleep(0.1)
+            assert fetcher.cache.is_leased(cache_key)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            leased = fetcher.cache.is_leased(cache_key)
+            fetcher.cache.close()
+            return task.cancelled(), leased
+
+    cancelled, leased = asyncio.run(run())
+
+    assert cancelled
+    assert not leased
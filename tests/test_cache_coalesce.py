@@ -0,0 +1,100 @@
+import threading
+import time
+
+from src.api.http_transport import HttpTransport
+from src.api.ksi_client import KSIClient, SOAP_URL
+from src.api.web_scraper import KSIWebScraper
+from src.data.cache_manager import CacheManager
+from src.data.match_fetcher import MatchFetcher
+
+TOURNAMENT = {'tournament_id': '1', 'name': 'Íslandsmót', 'status': 'Í gangi'}
+
+
+def _fetcher(standin, cache_dir):
+    transport = HttpTransport()
+    return MatchFetcher(KSIClient(transport, base_url=standin.url_for(SOAP_URL)), KSIWebScraper(transport),
+                        requests_per_second=100, cache_dir=cache_dir)
+
+
+def _run_together(*targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_threads_send_one_request(standin, tmp_path):
+    fetcher = _fetcher(standin, str(tmp_path / 'cache'))
+    results = []
+
+    _run_together(*[lambda: results.append(fetcher.get_tournament_matches(2024, TOURNAMENT))] * 8)
+
+    assert fetcher.soap_client.transport.stats.requests == 1
+    assert [len(matches) for matches in results] == [20] * 8
+    fetcher.cache.close()
+
+
+def test_concurrent_processes_send_one_request(standin, tmp_path):
+    # Fetchers with their own cache managers only share the cache directory, like separate processes
+    fetchers = [_fetcher(standin, str(tmp_path / 'cache')) for _ in range(4)]
+    results = []
+
+    _run_together(*[lambda fetcher=fetcher: results.append(fetcher.get_tournament_matches(2024, TOURNAMENT))
+                    for fetcher in fetchers])
+
+    assert sum(fetcher.soap_client.transport.stats.requests for fetcher in fetchers) == 1
+    assert [len(matches) for matches in results] == [20] * 4
+    for fetcher in fetchers:
+        fetcher.cache.close()
+
+
+def test_lease_of_crashed_owner_expires(tmp_path):
+    crashed = CacheManager(cache_dir=str(tmp_path / 'cache'), lease_seconds=0.5)
+    assert crashed.acquire_lease('key') is not None
+    # Closing without releasing leaves the lease behind, as a process that died would
+    crashed.close()
+
+    cache = CacheManager(cache_dir=str(tmp_path / 'cache'))
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        cache.set('key', 'value')
+        return 'value'
+
+    start = time.monotonic()
+    assert cache.coalesce('key', fetch) == 'value'
+    assert calls == [1]
+    assert time.monotonic() - start >= 0.4
+    cache.close()
+
+
+def test_lease_is_renewed_while_fetching(tmp_path):
+    owner = CacheManager(cache_dir=str(tmp_path / 'cache'), lease_seconds=0.3)
+    waiter = CacheManager(cache_dir=str(tmp_path / 'cache'))
+    calls = []
+    results = {}
+
+    def slow_fetch():
+        calls.append('owner')
+        time.sleep(1.0)
+        owner.set('key', 'owner value')
+        return 'owner value'
+
+    def fetch():
+        calls.append('waiter')
+        waiter.set('key', 'waiter value')
+        return 'waiter value'
+
+    def wait_then_fetch():
+        # Ask for the key only after the lease would have expired without renewal
+        time.sleep(0.6)
+        results['waiter'] = waiter.coalesce('key', fetch)
+
+    _run_together(lambda: results.update(owner=owner.coalesce('key', slow_fetch)), wait_then_fetch)
+
+    assert calls == ['owner']
+    assert results == {'owner': 'owner value', 'waiter': 'owner value'}
+    owner.close()
+    waiter.close()
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.const import TournamentStatus
+from src.data.cache_manager import PERMANENT
+from src.data.cache_policy import CachePolicy
+from src.data.match import Match
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+
+def _policy():
+    return CachePolicy(default_ttl=24 * 60 * 60, live_ttl=60 * 60, now=lambda: NOW)
+
+
+def _match(played, date=NOW - timedelta(days=1)):
+    return Match(1, date, 170, 5, 'Grótta', 'Leiknir R.', 2 if played else None, 1 if played else None,
+                 None, played, 100, 'Íslandsmót')
+
+
+def test_finished_status_is_the_text_shown_by_ksi():
+    # PERMANENT cache entries depend on recognizing this text, a mismatch would cache live data forever
+    assert TournamentStatus.FINISHED.value == 'Lokið'
+
+
+@pytest.mark.parametrize('status', ['Lokið', 'lokið', ' Lokið ', 'LOKIÐ'])
+def test_finished_statuses_are_recognized(status):
+    assert TournamentStatus.is_finished(status)
+
+
+@pytest.mark.parametrize('status', ['Í gangi', 'Ekki hafið', '', None])
+def test_other_statuses_are_not_finished(status):
+    assert not TournamentStatus.is_finished(status)
+
+
+def test_tournament_lists_of_past_seasons_are_permanent():
+    policy = _policy()
+
+    assert policy.tournaments_ttl([{'status': 'Í gangi'}], 2023) == PERMANENT
+    assert policy.tournaments_ttl([{'status': 'Lokið'}], 2024) == policy.default_ttl
+
+
+def test_matches_ttl():
+    policy = _policy()
+    finished, live = {'status': 'Lokið'}, {'status': 'Í gangi'}
+
+    assert policy.matches_ttl(finished, [_match(True)], 2024) == PERMANENT
+    assert policy.matches_ttl(finished, [_match(True), _match(False)], 2024) == policy.default_ttl
+    assert policy.matches_ttl(live, [_match(True)], 2024) == policy.live_ttl
+    assert policy.matches_ttl(live, [_match(False)], 2023) == PERMANENT
+
+
+def test_next_change():
+    policy = _policy()
+    live = {'status': 'Í gangi'}
+    upcoming = NOW + timedelta(days=2)
+
+    assert policy.next_change(live, [_match(False, upcoming)], 2024) == upcoming + timedelta(hours=2)
+    assert policy.next_change(live, [_match(False)], 2024) == NOW
+    assert policy.next_change(live, [_match(True)], 2024) is None
+    # Results missing from a finished tournament may never come, so no change is expected
+    assert policy.next_change({'status': 'Lokið'}, [_match(False)], 2024) is None
+    assert policy.next_change(live, [_match(False)], 2023) is None
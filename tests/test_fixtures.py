@@ -0,0 +1,43 @@
+import os
+
+from conftest import soap_matches
+from src.api.fixtures import FixtureStore, RecordingTransport, fixture_key
+from src.api.ksi_client import KSIClient, SOAP_URL
+
+MOT_LEIKIR = '<tns:MotLeikir><tns:MotNumer>1</tns:MotNumer></tns:MotLeikir>'
+
+
+def _recording_client(standin, directory):
+    store = FixtureStore(directory)
+    transport = RecordingTransport(store)
+    return store, KSIClient(transport, base_url=standin.url_for(SOAP_URL))
+
+
+def test_streamed_response_is_recorded_once_read(standin, tmp_path):
+    store, client = _recording_client(standin, str(tmp_path / 'recorded'))
+    client.chunk_size = 256
+    records = client._iter_soap_request('MotLeikir', MOT_LEIKIR)
+
+    next(records)
+    assert len(store) == 0
+    assert len(list(records)) == 19
+
+    data, headers = client._soap_request('MotLeikir', MOT_LEIKIR)
+    fixture = store.load(fixture_key('POST', client.base_url, headers, data))
+    assert fixture['body'] == soap_matches(20)
+    assert fixture['action'] == 'MotLeikir'
+    assert not [name for name in os.listdir(store.directory) if name.endswith('.part')]
+    client.transport.close()
+
+
+def test_partly_read_stream_is_not_recorded(standin, tmp_path):
+    store, client = _recording_client(standin, str(tmp_path / 'recorded'))
+    client.chunk_size = 256
+    records = client._iter_soap_request('MotLeikir', MOT_LEIKIR)
+
+    next(records)
+    records.close()
+
+    assert len(store) == 0
+    assert os.listdir(store.directory) == []
+    client.transport.close()
@@ -0,0 +1,14 @@
+from conftest import soap_matches
+from src.api.http_transport import HttpTransport
+from src.api.ksi_client import KSIClient, SOAP_URL
+
+
+def test_matches_are_decoded_with_the_raw_payload(standin):
+    with HttpTransport() as transport:
+        client = KSIClient(transport, base_url=standin.url_for(SOAP_URL))
+        client.chunk_size = 256
+        matches, content = client.get_tournament_matches_with_raw(1)
+
+    assert content == soap_matches(20)
+    assert [match['LeikurNumer'] for match in matches] == [str(i) for i in range(20)]
+    assert transport.stats.requests == 1
@@ -0,0 +1,92 @@
+import struct
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.data import serializers
+from src.data.match import Match
+from src.data.serializers import (CompactSerializer, HEADER, KIND_MATCHES, KIND_PICKLE, KIND_RECORDS, PickleSerializer,
+                                  loads)
+
+
+def _matches(date=datetime(2024, 5, 12, 17, 0)):
+    return [
+        Match(1, date, 170, 5, 'Grótta', 'Leiknir R.', 8, 1, 'Vivaldivöllurinn', True, 100, 'Íslandsmót'),
+        Match(2, None, 5, 170, 'Leiknir R.', 'Grótta', None, None, None, False, 100, 'Íslandsmót'),
+    ]
+
+
+def _kind(data):
+    return HEADER.unpack_from(data)[2]
+
+
+@pytest.fixture(params=['zlib', 'none', 'zstd'])
+def serializer(request):
+    if request.param == 'zstd':
+        pytest.importorskip('zstandard')
+    return CompactSerializer(compression=request.param)
+
+
+def test_match_list_round_trip(serializer):
+    data = serializer.dumps(_matches())
+
+    assert _kind(data) == KIND_MATCHES
+    assert loads(data) == _matches()
+
+
+def test_match_list_round_trip_without_msgpack(serializer):
+    serializer.encoding = serializers.ENCODING_PICKLE
+
+    assert loads(serializer.dumps(_matches())) == _matches()
+
+
+def test_match_dates_are_truncated_to_seconds(serializer):
+    loaded = loads(serializer.dumps(_matches(datetime(2024, 5, 12, 17, 0, 30, 999999))))
+
+    assert loaded[0].date == datetime(2024, 5, 12, 17, 0, 30)
+
+
+def test_timezone_aware_dates_fall_back_to_pickle(serializer):
+    matches = _matches(datetime(2024, 5, 12, 17, 0, 0, 500, tzinfo=timezone(timedelta(hours=1))))
+    data = serializer.dumps(matches)
+
+    assert _kind(data) == KIND_PICKLE
+    assert loads(data) == matches
+
+
+def test_record_list_round_trip(serializer):
+    tournaments = [
+        {'name': 'Íslandsmót A', 'tournament_id': '1', 'year': '2024', 'status': 'Lokið'},
+        {'name': 'Íslandsmót B', 'tournament_id': '2', 'year': '2024', 'status': None},
+    ]
+    data = serializer.dumps(tournaments)
+
+    assert _kind(data) == KIND_RECORDS
+    assert loads(data) == tournaments
+
+
+@pytest.mark.parametrize('value', [[], {'a': 1}, [{'a': 1}, {'b': 2}], [_matches()[0], 'x'], None])
+def test_other_values_are_pickled(serializer, value):
+    data = serializer.dumps(value)
+
+    assert _kind(data) == KIND_PICKLE
+    assert loads(data) == value
+
+
+def test_pickle_serializer_round_trip():
+    assert loads(PickleSerializer().dumps(_matches())) == _matches()
+
+
+def test_newer_format_version_is_rejected():
+    data = bytearray(CompactSerializer(compression='zlib').dumps(_matches()))
+    magic, version, kind, encoding, compression = HEADER.unpack_from(data)
+    data[:HEADER.size] = HEADER.pack(magic, version + 1, kind, encoding, compression)
+
+    with pytest.raises(ValueError, match='version'):
+        loads(bytes(data))
+
+
+@pytest.mark.parametrize('data', [b'', b'not serialized', struct.pack('>4s', b'KSI')])
+def test_unserialized_data_is_rejected(data):
+    with pytest.raises(ValueError):
+        loads(data)